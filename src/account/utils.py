@@ -2,10 +2,10 @@ import os
 from datetime import timedelta
 
 import jwt
-from django.core.mail import send_mail
 from django.utils.timezone import now
 
 from account.models import AuthenticateToken, User
+from outbox.services import EmailOutboxService
 
 
 def generate_key(user: User, key_type: str) -> AuthenticateToken:
@@ -47,86 +47,29 @@ def get_key(user: User, key_type: str) -> AuthenticateToken:
     return token or generate_key(user=user, key_type=key_type)
 
 
-def send_verify_email(link: str, email: str, verify_type: str):
-    logo_url = "https://img.freepik.com/premium-vector/hand-drawn-cosmetic-brushes-gentle-brush-stroke-grunge-style-sketch-cosmetic-illustration_484720-4254.jpg?w=2000"
+VERIFY_EMAIL_SUBJECTS = {
+    "register": "Xác thực đăng ký tài khoản tại hệ thống Lades",
+    "reset_password": "Đặt lại mật khẩu tài khoản Lades",
+}
 
-    subjects = {
-        "register": "Xác thực đăng ký tài khoản tại hệ thống Lades",
-        "reset_password": "Đặt lại mật khẩu tài khoản Lades",
-    }
+VERIFY_EMAIL_MESSAGES = {
+    "register": "Vui lòng xác thực đăng ký tài khoản bằng cách nhấp vào link bên dưới để xác thực: {link}",
+    "reset_password": "Bạn đã yêu cầu đặt lại mật khẩu. Truy cập link sau để tiếp tục: {link}",
+}
 
-    messages = {
-        "register": f"Vui lòng xác thực đăng ký tài khoản bằng cách nhấp vào link bên dưới để xác thực: {link}",
-        "reset_password": f"Bạn đã yêu cầu đặt lại mật khẩu. Truy cập link sau để tiếp tục: {link}",
-    }
+VERIFY_EMAIL_TEMPLATES = {
+    "register": "emails/verify_register.html",
+    "reset_password": "emails/verify_reset_password.html",
+}
 
-    contents = {
-        "register": f"""
-            Cảm ơn bạn đã đăng ký tài khoản tại <strong>Lades</strong>.<br><br>
-            Vui lòng bấm vào đường dẫn bên dưới để xác nhận email và hoàn tất việc đăng ký.<br><br>
-            <a href="{link}" style="color:#006241; text-decoration:underline;">Xác thực địa chỉ email</a><br><br>
-            Sau khi hoàn thành đăng ký, bạn có thể mua sắm các sản phẩm và nhận ưu đãi hấp dẫn.<br><br>
-            Trân trọng,<br><strong>Lades System</strong>
-        """,
-        "reset_password": f"""
-            Chúng tôi đã nhận được yêu cầu <strong>đặt lại mật khẩu</strong> cho tài khoản tại <strong>Lades</strong>.<br><br>
-            Vui lòng nhấn vào nút bên dưới để tạo mật khẩu mới.<br><br>
-            <a href="{link}"
-               style="display:inline-block; padding:12px 24px; background-color:#006241;
-                      color:#ffffff; text-decoration:none; border-radius:4px;">
-               Đặt lại mật khẩu
-            </a><br><br>
-            Link này chỉ có hiệu lực trong một khoảng thời gian nhất định.<br>
-            Nếu bạn không yêu cầu đặt lại mật khẩu, vui lòng bỏ qua email này.<br><br>
-            Trân trọng,<br><strong>Lades System</strong>
-        """,
-    }
 
-    html_message = f"""
-    <!DOCTYPE html>
-    <html>
-    <body style="margin:0; padding:0; background-color:#ffffff; font-family: Arial, Helvetica, sans-serif;">
-        <table width="100%" cellpadding="0" cellspacing="0">
-        <tr>
-            <td align="center">
-            <table width="600" cellpadding="0" cellspacing="0" style="padding:40px 30px;">
-                <tr>
-                    <td align="center" style="padding-bottom:30px;">
-                        <img src="{logo_url}" alt="Lades" width="120" style="display:block;">
-                    </td>
-                </tr>
-                <tr>
-                    <td style="color:#333333; font-size:14px; padding-bottom:20px;">
-                        Xin chào bạn,
-                    </td>
-                </tr>
-                <tr>
-                    <td style="color:#333333; font-size:14px; line-height:1.6;">
-                        {contents[verify_type]}
-                    </td>
-                </tr>
-                <tr>
-                    <td style="padding:30px 0;"><hr style="border:none; border-top:1px solid #dddddd;"></td>
-                </tr>
-                <tr>
-                    <td style="padding-top:20px; font-size:12px; color:#999999; line-height:1.5;">
-                        Email này được gửi tự động, vui lòng không phản hồi.<br>
-                        © 2025 Lades. Bảo lưu mọi quyền.
-                    </td>
-                </tr>
-            </table>
-            </td>
-        </tr>
-        </table>
-    </body>
-    </html>
-    """
-
-    send_mail(
-        subject=subjects[verify_type],
-        message=messages[verify_type],
+def send_verify_email(link: str, email: str, verify_type: str):
+    EmailOutboxService().queue_email(
+        to_email=email,
+        subject=VERIFY_EMAIL_SUBJECTS[verify_type],
+        body=VERIFY_EMAIL_MESSAGES[verify_type].format(link=link),
+        template_name=VERIFY_EMAIL_TEMPLATES[verify_type],
+        context={"link": link},
+        layout="plain",
         from_email=os.environ.get("DEFAULT_FROM_EMAIL"),
-        recipient_list=[email],
-        html_message=html_message,
-        fail_silently=False,
     )
@@ -9,6 +9,25 @@ class AttachmentORM:
     def save_attachment(url: str, public_id: str, type: AttachmentType) -> Attachment:
         return Attachment.objects.create(url=url, public_id=public_id, type=type)
 
+    @staticmethod
+    def bulk_save_attachments(attachments: list[Attachment]) -> list[Attachment]:
+        """
+        Upsert attachments in one query. Re-uploads reuse the same `public_id`,
+        so conflicting rows are updated in place and keep their uid; the rows are
+        read back because `bulk_create` does not return the uid of updated rows.
+        """
+        Attachment.objects.bulk_create(
+            attachments,
+            update_conflicts=True,
+            unique_fields=["public_id"],
+            update_fields=["url", "type"],
+        )
+        saved = Attachment.objects.in_bulk(
+            [attachment.public_id for attachment in attachments],
+            field_name="public_id",
+        )
+        return [saved[attachment.public_id] for attachment in attachments]
+
     @staticmethod
     def get_attachment_by_uid(uid: UUID) -> Optional[Attachment]:
         return (
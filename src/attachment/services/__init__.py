@@ -1,12 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
 from uuid import UUID
 
 from cloudinary.uploader import destroy, upload
 
 from attachment.exceptions import AttachmentNotExists, UploadAttachmentFail
-from attachment.models import AttachmentType
+from attachment.models import Attachment, AttachmentType
 from attachment.orm.attachment import AttachmentORM
 
 
+ATTACHMENT_UPLOAD_MAX_WORKERS = 8
+
+
+def run_concurrently(func: Callable, items: list) -> list:
+    """
+    Map `func` over `items` on a bounded thread pool, keeping input order.
+    Only meant for network calls: workers must not touch the database.
+    """
+    if len(items) <= 1:
+        return [func(item) for item in items]
+
+    workers = min(ATTACHMENT_UPLOAD_MAX_WORKERS, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items))
+
+
 class AttachmentService:
     def __init__(self):
         self.orm = AttachmentORM()
@@ -31,6 +49,81 @@ class AttachmentService:
             url=url, public_id=uploaded_public_id, type=type
         )
 
+    @staticmethod
+    def upload_file(file, folder: str, public_id: str) -> Optional[dict]:
+        try:
+            attachment_info = upload(
+                file=file, folder=folder, public_id=public_id, overwrite=True
+            )
+        except Exception:
+            return None
+
+        if not attachment_info.get("secure_url") or not attachment_info.get(
+            "public_id"
+        ):
+            return None
+        return attachment_info
+
+    def upload_files(self, files: list[tuple[Any, str]], folder: str) -> list:
+        """
+        Upload `(file, public_id)` pairs to Cloudinary on a bounded thread pool.
+        Returns the upload result of each file in input order, `None` on failure.
+        """
+        return run_concurrently(
+            lambda item: self.upload_file(item[0], folder, item[1]), files
+        )
+
+    def upload_attachments(
+        self, files: list[tuple[Any, str]], folder: str, type: AttachmentType
+    ) -> list[Attachment]:
+        """
+        Upload every file concurrently and save them with one INSERT. All or
+        nothing: if any upload or the INSERT fails, files already on Cloudinary
+        are removed before `UploadAttachmentFail` is raised.
+        """
+        if not files:
+            return []
+
+        uploaded = self.upload_files(files, folder=folder)
+        succeeded = [info for info in uploaded if info]
+        if len(succeeded) != len(uploaded):
+            self.destroy_files([info["public_id"] for info in succeeded])
+            raise UploadAttachmentFail
+
+        try:
+            return self.save_attachments(succeeded, type=type)
+        except Exception:
+            self.destroy_files([info["public_id"] for info in succeeded])
+            raise
+
+    @staticmethod
+    def destroy_file(public_id: str) -> None:
+        try:
+            destroy(public_id)
+        except Exception:
+            pass
+
+    def destroy_files(self, public_ids: list[str]) -> None:
+        run_concurrently(self.destroy_file, public_ids)
+
+    def discard_attachments(self, attachments: list[Attachment]) -> None:
+        """
+        Remove uploaded files whose rows are being rolled back by the caller.
+        """
+        self.destroy_files([attachment.public_id for attachment in attachments])
+
+    def save_attachments(
+        self, uploaded: list[dict], type: AttachmentType
+    ) -> list[Attachment]:
+        return self.orm.bulk_save_attachments(
+            [
+                Attachment(
+                    url=info["secure_url"], public_id=info["public_id"], type=type
+                )
+                for info in uploaded
+            ]
+        )
+
     def delete_attachment(self, uid: UUID):
         attachment = self.orm.get_attachment_by_uid(uid=uid)
 
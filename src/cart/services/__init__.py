@@ -5,11 +5,13 @@ from cart.exceptions import CartItemDoesNotExists
 from cart.models import CartItem
 from cart.orm.cart import CartORM
 from cart.schemas import CartItemRequestSchema
+from product.services.stock import ProductStockService
 
 
 class CartService:
     def __init__(self):
         self.orm = CartORM()
+        self.stock_service = ProductStockService()
         
     def add_item_to_cart(self, user: User, payload: CartItemRequestSchema):
         cart = self.orm.get_or_create_cart(user=user)
@@ -29,4 +31,6 @@ class CartService:
 
     def get_cart_items(self, user: User):
         cart = self.orm.get_or_create_cart(user=user)
-        return self.orm.get_cart_items(cart=cart)
+        cart_items = list(self.orm.get_cart_items(cart=cart))
+        self.stock_service.fill_total_stock(item.product for item in cart_items)
+        return cart_items
@@ -1,3 +1,4 @@
+from ninja.errors import HttpError
 from pydantic import BaseModel
 
 from account.models import User
@@ -12,6 +13,7 @@ from chat.utils import MessageType
 from router.authenticate import AuthBear
 from router.authorize import IsAdmin
 from router.controller import Controller, api, get, post
+from router.paginate import paginate
 from router.types import AuthenticatedRequest
 
 
@@ -85,6 +87,29 @@ class ChatAPI(Controller):
             target_user=target_user,
         )
 
+    @get("/{user_uid}/messages/history", response=MessageSchema, paginate=True)
+    @paginate
+    def get_message_history(
+        self,
+        request: AuthenticatedRequest,
+        user_uid: str,
+    ):
+        user = request.user
+        target_user = None
+
+        if user.is_staff:
+            target_user = User.objects.filter(uid=user_uid).first()
+            if not target_user:
+                raise HttpError(404, "User not found")
+        else:
+            if str(user.uid) != user_uid:
+                raise HttpError(403, "Permission denied")
+
+        return self.service.get_message_history(
+            user=user,
+            target_user=target_user,
+        )
+
     @post("/{user_uid}/mark-read")
     def mark_as_read(
         self,
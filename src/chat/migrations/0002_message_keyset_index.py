@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["conversation", "created_at", "uid"],
+                name="chat_messag_convers_68563e_idx",
+            ),
+        ),
+    ]
@@ -40,6 +40,9 @@ class Message(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["conversation", "created_at", "uid"])]
+
     def __str__(self):
         return f"{self.sender.name}: {self.content[:20]}"
 
@@ -47,6 +47,12 @@ class ChatORM:
     def get_messages(conversation: Conversation):
         return conversation.messages.all().order_by("created_at")
 
+    @staticmethod
+    def get_message_history(conversation: Conversation):
+        return (
+            conversation.messages.select_related("sender").all().order_by("-created_at")
+        )
+
     @staticmethod
     def mark_messages_as_read(conversation: Conversation, user: User):
         return (
@@ -1,5 +1,5 @@
 from account.models import User
-from chat.models import Conversation
+from chat.models import Conversation, Message
 from chat.orm.chat import ChatORM
 from chat.orm.notification import NotificationORM
 from chat.utils import MessageType, NotificationType
@@ -49,6 +49,19 @@ class ChatService:
 
         return self.orm.get_messages(conversation)
 
+    def get_message_history(self, user: User, target_user: User = None):
+        if user.is_staff:
+            if not target_user:
+                raise ValueError("Admin must provide target_user")
+            conversation = self.orm.get_conversation_by_user(target_user)
+        else:
+            conversation = self.orm.get_conversation_by_user(user)
+
+        if not conversation:
+            return Message.objects.none()
+
+        return self.orm.get_message_history(conversation)
+
     def mark_as_read(self, user: User, target_user: User = None):
         if user.is_staff:
             if not target_user:
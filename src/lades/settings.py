@@ -57,6 +57,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Third party apps
     "ninja_extra",
     "corsheaders",
@@ -71,6 +72,7 @@ INSTALLED_APPS = [
     "product",
     "order",
     "chat",
+    "outbox",
 ]
 
 MIDDLEWARE = [
@@ -125,6 +127,11 @@ ASGI_APPLICATION = "lades.asgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Minimum pg_trgm similarity for fuzzy product search (`%` operator)
+PRODUCT_SEARCH_SIMILARITY_THRESHOLD = float(
+    os.getenv("PRODUCT_SEARCH_SIMILARITY_THRESHOLD", "0.3")
+)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -135,6 +142,9 @@ DATABASES = {
         "PORT": os.environ.get("POSTGRES_PORT"),
         "OPTIONS": {
             "sslmode": "disable",
+            "options": (
+                f"-c pg_trgm.similarity_threshold={PRODUCT_SEARCH_SIMILARITY_THRESHOLD}"
+            ),
         },
     }
 }
@@ -198,6 +208,10 @@ LOGIN_URL = "/admin/login/"
 
 STATIC_URL = "/static/"
 STATIC_ROOT = "/var/www/lades/static/"
+
+# Generated files (verify code batch PDFs, ...)
+MEDIA_URL = "/media/"
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/var/www/lades/media/")
 FIXTURE_DIRS = "fixtures"
 
 
@@ -218,6 +232,28 @@ CLOUDINARY_STORAGE = {
     "API_SECRET": os.getenv("CLOUDINARY_API_SECRET"),
 }
 
+# IP geolocation: local range table built by `manage.py build_geoip_table`,
+# with ip-api.com as fallback
+GEOIP_TABLE_PATH = os.getenv("GEOIP_TABLE_PATH")
+GEOIP_HTTP_FALLBACK = os.getenv("GEOIP_HTTP_FALLBACK", "True") == "True"
+
+# Verify codes end with a short HMAC so forged codes are rejected without a
+# database query. Unsigned codes printed before that are still looked up
+# while VERIFY_CODE_ACCEPT_UNSIGNED is on.
+VERIFY_CODE_SIGNING_KEY = os.getenv("VERIFY_CODE_SIGNING_KEY", SECRET_KEY)
+VERIFY_CODE_ACCEPT_UNSIGNED = os.getenv("VERIFY_CODE_ACCEPT_UNSIGNED", "True") == "True"
+
+# Raw verify code scans kept after `manage.py rollup_scans` has counted them
+SCAN_RAW_RETENTION_DAYS = int(os.getenv("SCAN_RAW_RETENTION_DAYS", "90"))
+
+# Checkout stock handling: "lock" (SELECT ... FOR UPDATE on every product) or
+# "conditional" (guarded UPDATE per product, fails fast when out of stock)
+ORDER_STOCK_MODE = os.getenv("ORDER_STOCK_MODE", "lock")
+
+# Seconds a Redis stock reservation of a flash-sale product is held before
+# `manage.py reconcile_stock_reservations` gives it back
+STOCK_RESERVATION_TTL = int(os.getenv("STOCK_RESERVATION_TTL", "600"))
+
 # Email
 EMAIL_BACKEND = os.getenv("EMAIL_BACKEND")
 EMAIL_HOST = os.getenv("EMAIL_HOST")
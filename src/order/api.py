@@ -4,6 +4,7 @@ from ninja import Query
 
 from account.schemas.account import MessageResponseSchema
 from order.schemas import (
+    BulkPrintOrderSchema,
     ConfirmResponseSchema,
     DiscountRequestSchema,
     DiscountResponseSchema,
@@ -20,6 +21,7 @@ from router.authenticate import AuthBear
 from router.authorize import IsAdmin, IsUser
 from router.controller import Controller, api, get, post, put
 from router.paginate import paginate
+from router.streaming import stream_file
 from router.types import AuthenticatedRequest
 from utils.success_message import SuccessMessage
 
@@ -33,6 +35,24 @@ class OrderAPI(Controller):
     def create_order(self, request: AuthenticatedRequest, payload: OrderRequestSchema):
         return self.service.create_order(user=request.user, payload=payload)
 
+    @post("/print", permissions=[IsAdmin()])
+    def print_orders(self, payload: BulkPrintOrderSchema):
+        """
+        One A6 shipping label per selected order, in a single PDF. The PDF is
+        built in full before the first byte is sent, then streamed from a
+        temporary file. Orders are marked printed only once the whole file has
+        been sent; an interrupted download leaves them unprinted.
+        """
+        output, order_uids = self.service.print_orders(payload=payload)
+        response = stream_file(
+            output,
+            filename="shipping_labels.pdf",
+            content_type="application/pdf",
+            on_finish=lambda: self.service.mark_orders_printed(uids=order_uids),
+        )
+        response["X-Printed-Orders"] = str(len(order_uids))
+        return response
+
     @put("/{uid}", response=MessageResponseSchema)
     def update_order_status(self, uid: UUID, payload: UpdateOrderStatusSchema):
         self.service.update_order_status(uid=uid, payload=payload)
@@ -36,3 +36,15 @@ class DiscountNotExistsOrExpired(APIException):
     error_code = HTTPStatus.BAD_REQUEST
     message_code = "DISCOUNT_NOT_EXISTS_OR_EXPIRED"
     message = "Mã giảm giá không tồn tại hoặc đã hết hạn"
+
+
+class StockReservationUnavailable(APIException):
+    error_code = HTTPStatus.SERVICE_UNAVAILABLE
+    message_code = "STOCK_RESERVATION_UNAVAILABLE"
+    message = "Hệ thống đang bận, vui lòng thử lại sau"
+
+
+class OrderPrintSelectionRequired(APIException):
+    error_code = HTTPStatus.BAD_REQUEST
+    message_code = "ORDER_PRINT_SELECTION_REQUIRED"
+    message = "Vui lòng chọn đơn hàng hoặc trạng thái đơn hàng cần in"
@@ -0,0 +1,127 @@
+import statistics
+import threading
+import time
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import override_settings
+
+from account.models import ShippingInfo, User
+from order.models import Order
+from order.orm.order import OrderORM
+from order.schemas import OrderRequestSchema
+from order.utils import StockMode
+from product.exceptions import ProductOutOfStock
+from product.models import Brand, Product
+from product.orm.stock import ProductStockORM
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare checkout throughput of the locking and the conditional stock "
+        "modes with concurrent buy-now orders on one hot product, and with its "
+        "stock split into --buckets rows. Creates its "
+        "own fixtures and deletes them afterwards; run it against PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--orders", type=int, default=50, help="Per worker")
+        parser.add_argument(
+            "--stock",
+            type=int,
+            default=None,
+            help="Initial stock of the hot product (default: enough for all orders)",
+        )
+        parser.add_argument(
+            "--buckets",
+            type=int,
+            default=0,
+            help="Also run with the stock split across this many buckets",
+        )
+
+    def handle(self, *args, **options):
+        workers, orders = options["workers"], options["orders"]
+        stock = options["stock"] or workers * orders
+
+        suffix = uuid4().hex[:8]
+        brand = Brand.objects.create(name=f"Benchmark {suffix}")
+        product = Product.objects.create(
+            code=f"BENCH-{suffix}",
+            name="Benchmark product",
+            origin_price=100000,
+            sale_price=90000,
+            quantity_in_stock=stock,
+            brand=brand,
+        )
+        user = User.objects.create(
+            email=f"benchmark-{suffix}@example.com", name="Benchmark", password="-"
+        )
+        shipping_info = ShippingInfo.objects.create(
+            user=user,
+            name="Benchmark",
+            phone="0900000000",
+            address="1 Benchmark Street, Ha Noi",
+        )
+        payload = OrderRequestSchema(
+            source="buy_now",
+            order_items=[{"product_uid": product.uid, "quantity": 1}],
+            shipping_info_uid=shipping_info.uid,
+            payment_method="banking",
+        )
+
+        try:
+            for mode in StockMode:
+                Product.objects.filter(uid=product.uid).update(quantity_in_stock=stock)
+                with override_settings(ORDER_STOCK_MODE=mode):
+                    self.run_mode(mode.value, user, payload, workers, orders)
+                Order.objects.filter(user=user).delete()
+
+            if options["buckets"]:
+                ProductStockORM.set_stock(
+                    product, total=stock, bucket_count=options["buckets"]
+                )
+                self.run_mode(
+                    f"{options['buckets']} buckets", user, payload, workers, orders
+                )
+                Order.objects.filter(user=user).delete()
+        finally:
+            user.delete()
+            brand.delete()
+
+    def run_mode(self, label, user, payload, workers, orders):
+        latencies, failures = [], []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                for _ in range(orders):
+                    started = time.perf_counter()
+                    try:
+                        OrderORM.create_order(user=user, payload=payload)
+                    except ProductOutOfStock:
+                        with lock:
+                            failures.append(time.perf_counter() - started)
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        self.stdout.write(
+            f"{label:<12} {len(latencies) / elapsed:8.1f} orders/s  "
+            f"p50 {statistics.median(latencies or [0]) * 1000:7.1f} ms  "
+            f"p95 {p95 * 1000:7.1f} ms  "
+            f"out of stock {len(failures)}"
+        )
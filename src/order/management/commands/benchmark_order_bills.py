@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from order.models import Order, OrderItem
+from order.utils import OrderBillEngine, get_order_bill_engine
+from product.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure shipping bill rendering in bills per second: a fresh engine "
+        "per bill (fonts, styles and logo loaded every time, as before), the "
+        "shared engine, and many bills as pages of one PDF. Needs no database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bills", type=int, default=200)
+        parser.add_argument("--items", type=int, default=5, help="Lines per bill")
+
+    def handle(self, *args, **options):
+        order = Order(
+            code="BENCHMARK000000000001",
+            name="Nguyễn Văn A",
+            phone="0900000000",
+            address="1 Benchmark Street, Phường 1, Quận Phú Nhuận, TP. Hồ Chí Minh",
+            payment_method="cod",
+            total_amount=1250000,
+        )
+        order_items = [
+            OrderItem(
+                order=order,
+                product=Product(name=f"Sản phẩm mẫu số {index}"),
+                price=250000,
+                quantity=index,
+            )
+            for index in range(1, options["items"] + 1)
+        ]
+        bill = (order, order_items)
+        bills = options["bills"]
+
+        engine = get_order_bill_engine()
+        for label, render in [
+            ("engine per bill", lambda: OrderBillEngine().render([bill])),
+            ("shared engine", lambda: engine.render([bill])),
+        ]:
+            render()
+            started = time.perf_counter()
+            for _ in range(bills):
+                render()
+            self.report(label, bills, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        engine.render([bill] * bills)
+        self.report("one PDF, page per bill", bills, time.perf_counter() - started)
+
+    def report(self, label, bills, elapsed):
+        self.stdout.write(
+            f"{label:<24} {bills / elapsed:8.1f} bills/s "
+            f"{elapsed / bills * 1000:8.2f} ms/bill"
+        )
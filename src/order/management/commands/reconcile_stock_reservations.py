@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from order.services import StockReservationService
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply committed Redis stock reservations to Product.quantity_in_stock, "
+        "release expired ones and resync the Redis counters. Meant to run every "
+        "minute from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        result = StockReservationService().reconcile(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Applied {applied}, committed {committed}, released {released} "
+                "reservations; synced {synced} products".format(**result)
+            )
+        )
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="shipping_method",
+            field=models.CharField(
+                choices=[
+                    ("standard", "Giao thường"),
+                    ("express", "Hỏa tốc"),
+                    ("save", "Tiết kiệm"),
+                ],
+                default="standard",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("PAID", "Paid"),
+                    ("UNPAID", "UnPaid"),
+                ],
+                db_index=True,
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["created_at", "uid"], name="order_order_created_02ee0b_idx"
+            ),
+        ),
+    ]
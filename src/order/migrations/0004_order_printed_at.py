@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0003_stock_reservation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="printed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -109,6 +109,7 @@ class Order(models.Model):
     name = models.CharField(max_length=100)
     phone = models.CharField(max_length=20)
     address = models.CharField(max_length=255)
+    printed_at = models.DateTimeField(null=True, blank=True)
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
     discount = models.ForeignKey(
@@ -125,6 +126,7 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["created_at", "uid"])]
 
     def set_status(self, new_status: str, save: bool = True) -> None:
         try:
@@ -181,6 +183,41 @@ class OrderItem(models.Model):
         return f"{self.order.code} - {self.product} x {self.quantity}"
 
 
+class StockReservation(models.Model):
+    """
+    Stock of a reservation-enabled product taken by a committed order. Rows with
+    no `applied_at` are still to be deducted from `Product.quantity_in_stock`
+    by the reconciler.
+    """
+
+    uid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    token = models.UUIDField(db_index=True)
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="stock_reservations",
+        to_field="uid",
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="stock_reservations",
+        to_field="uid",
+    )
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(applied_at__isnull=True),
+                name="stock_reservation_unapplied",
+            )
+        ]
+
+
 class Payment(models.Model):
     uid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     order = models.OneToOneField(
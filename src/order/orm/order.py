@@ -1,8 +1,11 @@
 import os
+import tempfile
+from typing import Optional
 from uuid import UUID
 
-from django.db import transaction
-from django.db.models import Prefetch, Q
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Prefetch, Q, Value, When
 from django.utils.timezone import now
 
 from account.models import ShippingInfo, User
@@ -13,6 +16,7 @@ from order.exceptions import (
     ShippingInfoDoesNotExists,
 )
 from order.models import Discount, Order, OrderItem, Payment, ShippingMethod
+from order.orm.reservation import StockReservationORM
 from order.schemas import (
     DiscountRequestSchema,
     OrderRequestSchema,
@@ -20,19 +24,35 @@ from order.schemas import (
     SearchFilterSortSchema,
 )
 from order.utils import (
+    StockMode,
     build_sepay_qr_url,
     generate_code,
     generate_order_bill,
+    get_order_bill_engine,
     send_order_confirmation_email,
 )
 from product.exceptions import ProductDoesNotExists, ProductOutOfStock
 from product.models import Product, ProductImage
+from product.orm.stock import ProductStockORM
 
 
 class OrderORM:
     @staticmethod
-    @transaction.atomic
     def create_order(user: User, payload: OrderRequestSchema):
+        reservation_tokens: list[UUID] = []
+        try:
+            return OrderORM.place_order(user, payload, reservation_tokens)
+        except Exception:
+            # Give reserved stock back now instead of when it expires
+            for token in reservation_tokens:
+                StockReservationORM.release_stock_reservation(token)
+            raise
+
+    @staticmethod
+    @transaction.atomic
+    def place_order(
+        user: User, payload: OrderRequestSchema, reservation_tokens: list[UUID]
+    ):
         # ================================
         # 1. GET ITEMS
         # ================================
@@ -67,38 +87,64 @@ class OrderORM:
         # ================================
         # 3. PREPARE & LOCK PRODUCTS
         # ================================
+        # Conditional mode reads products without locking them; the stock
+        # check below is then only a fast path and the guarded decrement at the
+        # end of the transaction is authoritative
+        lock_products = settings.ORDER_STOCK_MODE != StockMode.CONDITIONAL
         if payload.source == "buy_now":
-            product_uids = [item.product_uid for item in buy_items]
+            lines = [(item.product_uid, item.quantity) for item in buy_items]
         else:
-            product_uids = [cart_item.product.uid for cart_item in cart_items]
+            lines = [
+                (cart_item.product.uid, cart_item.quantity) for cart_item in cart_items
+            ]
 
-        products = Product.objects.select_for_update().in_bulk(
-            product_uids,
-            field_name="uid",
+        product_uids = [product_uid for product_uid, _ in lines]
+        products_queryset = Product.objects.filter(
+            stock_reservation_enabled=False, stock_bucket_count=0
         )
+        if lock_products:
+            products_queryset = products_queryset.select_for_update()
+        products = products_queryset.in_bulk(product_uids, field_name="uid")
+
+        # Reservation-enabled products are never locked: their stock is
+        # arbitrated by the Redis counters. Neither are bucketed ones, only the
+        # bucket their stock is taken from
+        unlocked_uids = [uid for uid in product_uids if uid not in products]
+        if unlocked_uids:
+            products.update(
+                Product.objects.filter(
+                    Q(stock_reservation_enabled=True) | Q(stock_bucket_count__gt=0)
+                ).in_bulk(unlocked_uids, field_name="uid")
+            )
 
-        if payload.source == "buy_now":
-            for item in buy_items:
-                product = products.get(item.product_uid)
-                if not product:
-                    raise ProductDoesNotExists
+        # The same product may appear on several lines; stock is checked and
+        # deducted for the total
+        stock_deductions: dict[UUID, int] = {}
+        reserved_quantities: dict[UUID, int] = {}
+        bucket_deductions: dict[UUID, int] = {}
+        for product_uid, quantity in lines:
+            if product_uid not in products:
+                raise ProductDoesNotExists
 
-                if item.quantity <= 0:
-                    raise ProductOutOfStock
+            if quantity <= 0:
+                raise ProductOutOfStock
 
-                if item.quantity > product.quantity_in_stock:
-                    raise ProductOutOfStock
-        else:
-            for cart_item in cart_items:
-                product = products.get(cart_item.product.uid)
-                if not product:
-                    raise ProductDoesNotExists
+            if products[product_uid].stock_reservation_enabled:
+                quantities = reserved_quantities
+            elif products[product_uid].stock_bucket_count:
+                quantities = bucket_deductions
+            else:
+                quantities = stock_deductions
+            quantities[product_uid] = quantities.get(product_uid, 0) + quantity
 
-                if cart_item.quantity <= 0:
-                    raise ProductOutOfStock
+        for product_uid, quantity in stock_deductions.items():
+            if quantity > products[product_uid].quantity_in_stock:
+                raise ProductOutOfStock
 
-                if cart_item.quantity > product.quantity_in_stock:
-                    raise ProductOutOfStock
+        reservation_token = None
+        if reserved_quantities:
+            reservation_token = StockReservationORM.reserve_stock(reserved_quantities)
+            reservation_tokens.append(reservation_token)
 
         # ================================
         # 4. CREATE ORDER
@@ -120,31 +166,29 @@ class OrderORM:
         # ================================
         # 5. CREATE ORDER ITEMS + DEDUCT STOCK
         # ================================
-        if payload.source == "buy_now":
-            for item in buy_items:
-                product = products[item.product_uid]
-
-                OrderItem.objects.create(
+        order_items = OrderItem.objects.bulk_create(
+            [
+                OrderItem(
                     order=order,
-                    product=product,
-                    price=product.sale_price,
-                    quantity=item.quantity,
+                    product=products[product_uid],
+                    price=products[product_uid].sale_price,
+                    quantity=quantity,
                 )
-                product.quantity_in_stock -= item.quantity
-                product.save(update_fields=["quantity_in_stock"])
-        else:
-            for cart_item in cart_items:
-                product = products[cart_item.product.uid]
+                for product_uid, quantity in lines
+            ]
+        )
+        if lock_products:
+            OrderORM.deduct_stock(stock_deductions)
 
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    price=product.sale_price,
-                    quantity=cart_item.quantity,
-                )
-                product.quantity_in_stock -= cart_item.quantity
-                product.save(update_fields=["quantity_in_stock"])
+        if reservation_token:
+            StockReservationORM.create_stock_reservations(
+                order=order, token=reservation_token, quantities=reserved_quantities
+            )
+            transaction.on_commit(
+                lambda: StockReservationORM.commit_stock_reservation(reservation_token)
+            )
 
+        if payload.source != "buy_now":
             CartItem.objects.filter(uid__in=[item.uid for item in cart_items]).delete()
 
         # ================================
@@ -152,7 +196,7 @@ class OrderORM:
         # ================================
         discount = None
         discount_amount = 0
-        subtotal = sum(item.total_price for item in order.items.all())
+        subtotal = sum(item.total_price for item in order_items)
         if payload.discount_code:
             discount = (
                 Discount.objects.select_for_update()
@@ -187,6 +231,8 @@ class OrderORM:
         order.save(
             update_fields=["discount", "discount_amount", "total_amount", "updated_at"]
         )
+        # Read by the confirmation email instead of querying the items again
+        order.order_items = order_items
 
         # ================================
         # 8. CREATE PAYMENT
@@ -203,6 +249,7 @@ class OrderORM:
         # 9. PAYMENT METHOD LOGIC
         # ================================
         if payload.payment_method == "cod":
+            # Queued in the outbox, sent once committed by the outbox worker
             send_order_confirmation_email(order=order, email=user.email)
 
         elif payload.payment_method == "banking":
@@ -217,8 +264,83 @@ class OrderORM:
         else:
             raise ValueError("Unsupported payment method")
 
+        # ================================
+        # 10. CONDITIONAL & BUCKET STOCK DECREMENT
+        # ================================
+        # Last statements of the transaction: product and bucket rows stay
+        # locked only until the commit right after
+        if not lock_products:
+            OrderORM.decrement_stock_if_available(stock_deductions)
+        for product_uid in sorted(bucket_deductions):
+            ProductStockORM.decrement_bucket_stock(
+                product_uid=product_uid,
+                bucket_count=products[product_uid].stock_bucket_count,
+                quantity=bucket_deductions[product_uid],
+            )
+
         return order
 
+    @staticmethod
+    def deduct_stock(quantities: dict[UUID, int]) -> None:
+        """
+        Deduct stock of every ordered product in one statement. The rows are
+        already locked and checked by `create_order`; the `quantity_in_stock`
+        guard only makes a violated invariant fail loudly.
+        """
+        if not quantities:
+            return
+
+        if connection.vendor != "postgresql":
+            # Same single statement without `UPDATE ... FROM` (tests on SQLite)
+            guard = Q()
+            for uid, quantity in quantities.items():
+                guard |= Q(uid=uid, quantity_in_stock__gte=quantity)
+            updated = Product.objects.filter(guard).update(
+                quantity_in_stock=F("quantity_in_stock")
+                - Case(
+                    *[
+                        When(uid=uid, then=Value(quantity))
+                        for uid, quantity in quantities.items()
+                    ],
+                    output_field=IntegerField(),
+                )
+            )
+        else:
+            quote = connection.ops.quote_name
+            values = ", ".join(["(%s::uuid, %s::integer)"] * len(quantities))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {quote(Product._meta.db_table)} AS product "
+                    "SET quantity_in_stock = product.quantity_in_stock - v.quantity "
+                    f"FROM (VALUES {values}) AS v (uid, quantity) "
+                    "WHERE product.uid = v.uid "
+                    "AND product.quantity_in_stock >= v.quantity",
+                    [
+                        param
+                        for uid, quantity in quantities.items()
+                        for param in (str(uid), quantity)
+                    ],
+                )
+                updated = cursor.rowcount
+
+        if updated != len(quantities):
+            raise ProductOutOfStock
+
+    @staticmethod
+    def decrement_stock_if_available(quantities: dict[UUID, int]) -> None:
+        """
+        `UPDATE ... SET quantity_in_stock = quantity_in_stock - n WHERE uid = ...
+        AND quantity_in_stock >= n`, one product at a time in uid order so two
+        checkouts never wait on each other's rows crosswise. Fails fast on the
+        first product short of stock; the caller's transaction undoes the rest.
+        """
+        for uid in sorted(quantities):
+            updated = Product.objects.filter(
+                uid=uid, quantity_in_stock__gte=quantities[uid]
+            ).update(quantity_in_stock=F("quantity_in_stock") - quantities[uid])
+            if not updated:
+                raise ProductOutOfStock
+
     @staticmethod
     def update_order_status(order: Order, payload: UpdateOrderStatusSchema):
         order.set_status(payload.status)
@@ -331,7 +453,53 @@ class OrderORM:
     @staticmethod
     def print_order(order: Order):
         order_items = order.items.select_related("product").all()
-        return generate_order_bill(order=order, order_items=order_items)
+        response = generate_order_bill(order=order, order_items=order_items)
+        OrderORM.mark_orders_printed(uids=[order.uid])
+        return response
+
+    @staticmethod
+    def get_orders_to_print(
+        order_uids: Optional[list[UUID]],
+        status: Optional[str],
+        only_unprinted: bool,
+        limit: int,
+    ) -> list[Order]:
+        """
+        Matching orders, oldest first, with their items and products: one query
+        for the orders and one for all of their items.
+        """
+        orders = Order.objects.all()
+        if order_uids is not None:
+            orders = orders.filter(uid__in=order_uids)
+        if status:
+            orders = orders.filter(status=status)
+        if only_unprinted:
+            orders = orders.filter(printed_at__isnull=True)
+        return list(
+            orders.order_by("created_at", "uid").prefetch_related(
+                Prefetch(
+                    "items",
+                    queryset=OrderItem.objects.select_related("product"),
+                    to_attr="bill_items",
+                )
+            )[:limit]
+        )
+
+    @staticmethod
+    def print_orders(orders: list[Order]):
+        """
+        Render the bills of `orders` as pages of one PDF into a temporary file.
+        Reportlab keeps every page in memory until the document is saved (about
+        12 KB per bill), which `ORDER_BULK_PRINT_LIMIT` bounds.
+        """
+        return get_order_bill_engine().render(
+            [(order, order.bill_items) for order in orders],
+            output=tempfile.TemporaryFile(),
+        )
+
+    @staticmethod
+    def mark_orders_printed(uids: list[UUID]) -> int:
+        return Order.objects.filter(uid__in=uids).update(printed_at=now())
 
     @staticmethod
     def create_discount(payload: DiscountRequestSchema):
@@ -94,7 +94,7 @@ class PaymentORM:
                 paid_at=paid_at,
                 raw_payload=raw_payload,
             )
-        send_order_confirmation_email(order=order, email=order.user.email)
+            send_order_confirmation_email(order=order, email=order.user.email)
         return payment, order
 
     @staticmethod
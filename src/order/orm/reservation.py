@@ -0,0 +1,161 @@
+import logging
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from order.exceptions import StockReservationUnavailable
+from order.models import Order, StockReservation
+from order.reservation import (
+    StockNotMirrored,
+    StockShortage,
+    get_stock_reservation_engine,
+)
+from product.exceptions import ProductOutOfStock
+from product.models import Product
+
+
+logger = logging.getLogger("django")
+
+
+class StockReservationORM:
+    @staticmethod
+    def reserve_stock(quantities: dict[UUID, int]) -> UUID:
+        """
+        Reserve stock of reservation-enabled products in Redis, mirroring their
+        counters from the database on first use.
+        """
+        engine = get_stock_reservation_engine()
+        try:
+            try:
+                return engine.reserve(quantities)
+            except StockNotMirrored:
+                StockReservationORM.mirror_stock(list(quantities), only_if_missing=True)
+            return engine.reserve(quantities)
+        except StockShortage:
+            raise ProductOutOfStock
+        except (StockNotMirrored, RedisError):
+            logger.exception("Stock reservation failed")
+            raise StockReservationUnavailable
+
+    @staticmethod
+    def commit_stock_reservation(token: UUID) -> None:
+        try:
+            if not get_stock_reservation_engine().commit(token):
+                logger.warning(f"Stock reservation {token} expired before commit")
+        except RedisError:
+            # The reconciler finds the committed rows and forgets it later
+            logger.exception(f"Committing stock reservation {token} failed")
+
+    @staticmethod
+    def release_stock_reservation(token: UUID) -> None:
+        try:
+            get_stock_reservation_engine().release(token)
+        except RedisError:
+            logger.exception(f"Releasing stock reservation {token} failed")
+
+    @staticmethod
+    def create_stock_reservations(
+        order: Order, token: UUID, quantities: dict[UUID, int]
+    ) -> list[StockReservation]:
+        return StockReservation.objects.bulk_create(
+            [
+                StockReservation(
+                    order=order, token=token, product_id=product_uid, quantity=quantity
+                )
+                for product_uid, quantity in quantities.items()
+            ]
+        )
+
+    @staticmethod
+    def get_committed_tokens(tokens: list[UUID]) -> set[UUID]:
+        return set(
+            StockReservation.objects.filter(token__in=tokens)
+            .values_list("token", flat=True)
+            .distinct()
+        )
+
+    @staticmethod
+    def get_reservation_enabled_product_uids() -> list[UUID]:
+        return list(
+            Product.objects.filter(stock_reservation_enabled=True).values_list(
+                "uid", flat=True
+            )
+        )
+
+    @staticmethod
+    def get_reservable_stock(product_uids: list[UUID]) -> dict[UUID, int]:
+        """
+        Database stock minus committed reservations not applied to it yet.
+        """
+        rows = (
+            Product.objects.filter(uid__in=product_uids)
+            .annotate(
+                unapplied=Coalesce(
+                    Sum(
+                        "stock_reservations__quantity",
+                        filter=Q(stock_reservations__applied_at__isnull=True),
+                    ),
+                    0,
+                )
+            )
+            .values_list("uid", "quantity_in_stock", "unapplied")
+        )
+        return {uid: stock - unapplied for uid, stock, unapplied in rows}
+
+    @staticmethod
+    def mirror_stock(product_uids: list[UUID], only_if_missing: bool = False) -> int:
+        """
+        Rebuild the Redis counters of `product_uids` from the database. The
+        version is read before the database so a commit landing in between
+        makes the resync skip the product until the next run.
+        """
+        engine = get_stock_reservation_engine()
+        versions = {uid: engine.get_version(uid) for uid in product_uids}
+        synced = 0
+        for uid, base in StockReservationORM.get_reservable_stock(product_uids).items():
+            synced += engine.resync(uid, base, versions[uid], only_if_missing)
+        return synced
+
+    @staticmethod
+    def forget_stock(product_uid: UUID) -> None:
+        try:
+            get_stock_reservation_engine().forget(product_uid)
+        except RedisError:
+            logger.exception(f"Dropping the stock counter of {product_uid} failed")
+            raise StockReservationUnavailable
+
+    @staticmethod
+    @transaction.atomic
+    def apply_stock_reservations(limit: int) -> int:
+        """
+        Deduct up to `limit` committed reservations from `quantity_in_stock`.
+        Rows locked by a concurrent reconciler are skipped.
+        """
+        reservations = list(
+            StockReservation.objects.select_for_update(skip_locked=True)
+            .filter(applied_at__isnull=True)
+            .order_by("created_at")[:limit]
+        )
+        if not reservations:
+            return 0
+
+        quantities: dict[UUID, int] = {}
+        for reservation in reservations:
+            quantities[reservation.product_id] = (
+                quantities.get(reservation.product_id, 0) + reservation.quantity
+            )
+        for product_uid in sorted(quantities):
+            Product.objects.filter(uid=product_uid).update(
+                quantity_in_stock=Greatest(
+                    F("quantity_in_stock") - quantities[product_uid], Value(0)
+                )
+            )
+
+        StockReservation.objects.filter(
+            uid__in=[reservation.uid for reservation in reservations]
+        ).update(applied_at=timezone.now())
+        return len(reservations)
@@ -0,0 +1,206 @@
+import time
+from functools import lru_cache
+from typing import Optional
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+
+STOCK_KEY_PREFIX = "lades:stock:"
+STOCK_RESERVATION_EXPIRY_KEY = f"{STOCK_KEY_PREFIX}reservations"
+
+# KEYS: available_1, pending_1, ..., available_n, pending_n, reservation, expiry
+# ARGV: token, expires_at, n, product_1, quantity_1, ..., product_n, quantity_n
+# Returns {1, 0} when reserved, {0, i} when product i is short of stock and
+# {-1, i} when product i has no counter yet. All or nothing.
+RESERVE_SCRIPT = """
+local n = tonumber(ARGV[3])
+for i = 1, n do
+    local available = redis.call('GET', KEYS[2 * i - 1])
+    if not available then
+        return {-1, i}
+    end
+    if tonumber(available) < tonumber(ARGV[3 + 2 * i]) then
+        return {0, i}
+    end
+end
+for i = 1, n do
+    local quantity = ARGV[3 + 2 * i]
+    redis.call('DECRBY', KEYS[2 * i - 1], quantity)
+    redis.call('INCRBY', KEYS[2 * i], quantity)
+    redis.call('HSET', KEYS[2 * n + 1], ARGV[2 + 2 * i], quantity)
+end
+redis.call('ZADD', KEYS[2 * n + 2], ARGV[2], ARGV[1])
+return {1, 0}
+"""
+
+# KEYS: reservation, expiry
+# ARGV: token, key prefix, restock ("1" to give the stock back, "0" on commit)
+# Commits bump the product version, which `RESYNC_SCRIPT` uses as a fence.
+FINISH_SCRIPT = """
+local items = redis.call('HGETALL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if #items == 0 then
+    return 0
+end
+for i = 1, #items, 2 do
+    local key = ARGV[2] .. items[i]
+    if redis.call('EXISTS', key .. ':pending') == 1 then
+        redis.call('DECRBY', key .. ':pending', items[i + 1])
+    end
+    if ARGV[3] == '1' then
+        if redis.call('EXISTS', key .. ':available') == 1 then
+            redis.call('INCRBY', key .. ':available', items[i + 1])
+        end
+    else
+        redis.call('INCR', key .. ':version')
+    end
+end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+# KEYS: available, pending, version
+# ARGV: base stock, version read before the base, only_if_missing
+# Sets available = base - pending unless a commit landed since the version was
+# read (the base may then miss it). Returns 1 when the counter is in place.
+RESYNC_SCRIPT = """
+if ARGV[3] == '1' and redis.call('EXISTS', KEYS[1]) == 1 then
+    return 1
+end
+if (redis.call('GET', KEYS[3]) or '0') ~= ARGV[2] then
+    return 0
+end
+local pending = tonumber(redis.call('GET', KEYS[2]) or '0')
+redis.call('SET', KEYS[1], math.max(tonumber(ARGV[1]) - pending, 0))
+return 1
+"""
+
+
+class StockShortage(Exception):
+    def __init__(self, product_uid: UUID):
+        super().__init__(product_uid)
+        self.product_uid = product_uid
+
+
+class StockNotMirrored(Exception):
+    def __init__(self, product_uid: UUID):
+        super().__init__(product_uid)
+        self.product_uid = product_uid
+
+
+def get_product_key(product_uid, name: str) -> str:
+    return f"{STOCK_KEY_PREFIX}{product_uid}:{name}"
+
+
+class StockReservationEngine:
+    """
+    Per-product Redis counters in front of `Product.quantity_in_stock`:
+
+    - `available`: stock that can still be reserved
+    - `pending`: reserved by checkouts whose order is not committed yet
+    - `version`: bumped on every commit, fences `resync`
+
+    Every change is a Lua script, so concurrent checkouts contend on Redis
+    instead of PostgreSQL row locks. The database stays the source of truth:
+    counters are rebuilt from it by `resync`. Pass any redis-py compatible
+    client (e.g. fakeredis) to use another server.
+    """
+
+    def __init__(self, client=None):
+        self.client = client or get_redis_connection("default")
+        self.reserve_script = self.client.register_script(RESERVE_SCRIPT)
+        self.finish_script = self.client.register_script(FINISH_SCRIPT)
+        self.resync_script = self.client.register_script(RESYNC_SCRIPT)
+
+    def reserve(self, quantities: dict[UUID, int], ttl: Optional[int] = None) -> UUID:
+        """
+        Reserve every quantity or none. Raises `StockShortage` or
+        `StockNotMirrored` for the first product that cannot be reserved.
+        """
+        token = uuid4()
+        product_uids = sorted(quantities)
+        keys, args = [], []
+        for product_uid in product_uids:
+            keys += [
+                get_product_key(product_uid, "available"),
+                get_product_key(product_uid, "pending"),
+            ]
+            args += [str(product_uid), quantities[product_uid]]
+        keys += [self.get_reservation_key(token), STOCK_RESERVATION_EXPIRY_KEY]
+
+        expires_at = time.time() + (ttl or settings.STOCK_RESERVATION_TTL)
+        status, index = self.reserve_script(
+            keys=keys, args=[str(token), expires_at, len(product_uids), *args]
+        )
+        if status == 0:
+            raise StockShortage(product_uids[index - 1])
+        if status == -1:
+            raise StockNotMirrored(product_uids[index - 1])
+        return token
+
+    def commit(self, token: UUID) -> bool:
+        """
+        The order holding the reservation is committed: forget it without giving
+        the stock back. False when the reservation was already released.
+        """
+        return bool(self.finish(token, restock=False))
+
+    def release(self, token: UUID) -> bool:
+        return bool(self.finish(token, restock=True))
+
+    def finish(self, token: UUID, restock: bool) -> int:
+        return self.finish_script(
+            keys=[self.get_reservation_key(token), STOCK_RESERVATION_EXPIRY_KEY],
+            args=[str(token), STOCK_KEY_PREFIX, "1" if restock else "0"],
+        )
+
+    def get_version(self, product_uid: UUID) -> str:
+        version = self.client.get(get_product_key(product_uid, "version"))
+        return version.decode() if version else "0"
+
+    def resync(
+        self,
+        product_uid: UUID,
+        base: int,
+        version: str,
+        only_if_missing: bool = False,
+    ) -> bool:
+        return bool(
+            self.resync_script(
+                keys=[
+                    get_product_key(product_uid, "available"),
+                    get_product_key(product_uid, "pending"),
+                    get_product_key(product_uid, "version"),
+                ],
+                args=[base, version, "1" if only_if_missing else "0"],
+            )
+        )
+
+    def forget(self, product_uid: UUID) -> None:
+        """
+        Drop the `available` counter so the next reservation mirrors it from
+        the database again. `pending` and `version` stay for the reservations
+        still in flight.
+        """
+        self.client.delete(get_product_key(product_uid, "available"))
+
+    def get_available(self, product_uid: UUID) -> Optional[int]:
+        available = self.client.get(get_product_key(product_uid, "available"))
+        return int(available) if available is not None else None
+
+    def get_expired_tokens(self, limit: int, now: Optional[float] = None) -> list:
+        tokens = self.client.zrangebyscore(
+            STOCK_RESERVATION_EXPIRY_KEY, "-inf", now or time.time(), 0, limit
+        )
+        return [UUID(token.decode()) for token in tokens]
+
+    @staticmethod
+    def get_reservation_key(token: UUID) -> str:
+        return f"{STOCK_KEY_PREFIX}reservation:{token}"
+
+
+@lru_cache(maxsize=1)
+def get_stock_reservation_engine() -> StockReservationEngine:
+    return StockReservationEngine()
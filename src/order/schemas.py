@@ -87,6 +87,12 @@ class UpdateOrderStatusSchema(Schema):
     status: OrderStatus
 
 
+class BulkPrintOrderSchema(Schema):
+    order_uids: Optional[List[UUID]] = None
+    status: Optional[OrderStatus] = None
+    only_unprinted: bool = False
+
+
 class DiscountRequestSchema(Schema):
     name: str
     code: str
@@ -4,11 +4,18 @@ from datetime import datetime, date, time
 from django.utils import timezone
 
 from account.models import User
-from order.exceptions import OrderDoesNotExists, DiscountNotExistsOrExpired
+from order.exceptions import (
+    OrderDoesNotExists,
+    DiscountNotExistsOrExpired,
+    OrderPrintSelectionRequired,
+)
 from order.models import Order
 from order.orm.order import OrderORM
 from order.orm.payment import PaymentORM
+from order.orm.reservation import StockReservationORM
+from order.reservation import get_stock_reservation_engine
 from order.schemas import (
+    BulkPrintOrderSchema,
     DiscountRequestSchema,
     OrderRequestSchema,
     UpdateOrderStatusSchema,
@@ -18,6 +25,9 @@ from order.schemas import (
 from order.utils import PaymentStatus
 
 
+ORDER_BULK_PRINT_LIMIT = 5000
+
+
 class OrderService:
     def __init__(self):
         self.orm = OrderORM()
@@ -48,6 +58,28 @@ class OrderService:
             raise OrderDoesNotExists
         return self.orm.print_order(order=order)
 
+    def print_orders(self, payload: BulkPrintOrderSchema):
+        """
+        Shipping bills of the selected orders (uids and/or status, at most
+        `ORDER_BULK_PRINT_LIMIT`, oldest first) as one multi-page PDF file.
+        Returns the file and the uids of the orders on it, to be marked printed
+        with `mark_orders_printed` once the file has been served.
+        """
+        if payload.order_uids is None and payload.status is None:
+            raise OrderPrintSelectionRequired
+        orders = self.orm.get_orders_to_print(
+            order_uids=payload.order_uids,
+            status=payload.status,
+            only_unprinted=payload.only_unprinted,
+            limit=ORDER_BULK_PRINT_LIMIT,
+        )
+        if not orders:
+            raise OrderDoesNotExists
+        return self.orm.print_orders(orders=orders), [order.uid for order in orders]
+
+    def mark_orders_printed(self, uids: list[UUID]) -> int:
+        return self.orm.mark_orders_printed(uids=uids)
+
     def create_discount(self, payload: DiscountRequestSchema):
         return self.orm.create_discount(payload=payload)
 
@@ -179,3 +211,55 @@ class PaymentService:
 
     def confirm_payment_success(self, uid: UUID, user):
         return self.orm.confirm_payment_success(uid=uid, user=user)
+
+
+class StockReservationService:
+    def __init__(self):
+        self.orm = StockReservationORM()
+
+    def reconcile(self, batch_size: int = 500) -> dict:
+        """
+        One reconciler pass:
+
+        1. deduct committed reservations from `Product.quantity_in_stock`
+        2. forget expired reservations whose order was committed, give the
+           stock of the others back
+        3. rebuild the Redis counters from the database, which also picks up
+           stock edited by admins
+        """
+        applied = 0
+        while True:
+            count = self.orm.apply_stock_reservations(limit=batch_size)
+            applied += count
+            if count < batch_size:
+                break
+
+        engine = get_stock_reservation_engine()
+        released = committed = 0
+        while True:
+            tokens = engine.get_expired_tokens(limit=batch_size)
+            committed_tokens = self.orm.get_committed_tokens(tokens)
+            for token in tokens:
+                if token in committed_tokens:
+                    committed += engine.commit(token)
+                else:
+                    released += engine.release(token)
+            if len(tokens) < batch_size:
+                break
+
+        synced = self.orm.mirror_stock(self.orm.get_reservation_enabled_product_uids())
+        return {
+            "applied": applied,
+            "committed": committed,
+            "released": released,
+            "synced": synced,
+        }
+
+    def reset_stock(self, product_uid: UUID) -> None:
+        """
+        Call before turning `stock_reservation_enabled` on. While it was off,
+        checkouts moved the database stock without Redis and `reconcile` skipped
+        the product, so a counter left from before is stale. Dropping it makes
+        the first reservation mirror the stock from the database again.
+        """
+        self.orm.forget_stock(product_uid)
@@ -0,0 +1,125 @@
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from account.models import ShippingInfo, User
+from order.models import Order
+from order.orm.order import OrderORM
+from order.schemas import OrderRequestSchema
+from order.utils import StockMode
+from product.exceptions import ProductOutOfStock
+from product.models import Brand, Product
+
+
+# Whatever the number of lines: the order, its items, its payment and the
+# confirmation email are each written once, and stock is deducted for every
+# product in one statement. Includes the savepoint of `transaction.atomic`.
+CREATE_ORDER_QUERIES = 10
+
+
+@override_settings(ORDER_STOCK_MODE=StockMode.LOCK)
+class CreateOrderQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="buyer@example.com", name="Buyer", password="x"
+        )
+        cls.shipping_info = ShippingInfo.objects.create(
+            user=cls.user,
+            name="Buyer",
+            phone="0901234567",
+            address="12 Nguyen Trai, Ha Noi",
+        )
+        brand = Brand.objects.create(name="Brand")
+        cls.products = Product.objects.bulk_create(
+            [
+                Product(
+                    code=f"P{index}",
+                    name=f"Product {index}",
+                    brand=brand,
+                    origin_price=1000,
+                    sale_price=2000,
+                    quantity_in_stock=100,
+                )
+                for index in range(30)
+            ]
+        )
+
+    def build_payload(self, products, quantity=2) -> OrderRequestSchema:
+        return OrderRequestSchema(
+            source="buy_now",
+            order_items=[
+                {"product_uid": product.uid, "quantity": quantity}
+                for product in products
+            ],
+            shipping_info_uid=self.shipping_info.uid,
+            payment_method="cod",
+        )
+
+    def assert_order_placed(self, products, quantity=2):
+        payload = self.build_payload(products, quantity)
+        with self.assertNumQueries(CREATE_ORDER_QUERIES):
+            order = OrderORM.create_order(user=self.user, payload=payload)
+
+        self.assertEqual(order.items.count(), len(products))
+        self.assertEqual(
+            Order.objects.get(uid=order.uid).total_amount,
+            2000 * quantity * len(products) + order.shipping_fee,
+        )
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.quantity_in_stock, 100 - quantity)
+
+    @skipUnless(connection.vendor == "postgresql", "UPDATE ... FROM (VALUES ...)")
+    def test_multi_product_order_values_update(self):
+        self.assert_order_placed(self.products)
+
+    def test_multi_product_order_case_update(self):
+        with mock.patch.object(connection, "vendor", "sqlite"):
+            self.assert_order_placed(self.products)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        with mock.patch.object(connection, "vendor", "sqlite"):
+            self.assert_order_placed(self.products[:2])
+            self.assert_order_placed(self.products[2:])
+
+
+class DeductStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="Brand")
+        cls.products = Product.objects.bulk_create(
+            [
+                Product(
+                    code=f"P{index}",
+                    name=f"Product {index}",
+                    brand=brand,
+                    origin_price=1000,
+                    sale_price=2000,
+                    quantity_in_stock=5,
+                )
+                for index in range(3)
+            ]
+        )
+
+    def assert_deducts_in_one_statement(self):
+        quantities = {
+            product.uid: index + 1 for index, product in enumerate(self.products)
+        }
+        with self.assertNumQueries(1):
+            OrderORM.deduct_stock(quantities)
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.quantity_in_stock, 5 - quantities[product.uid])
+
+        with self.assertNumQueries(1), self.assertRaises(ProductOutOfStock):
+            OrderORM.deduct_stock({self.products[0].uid: 5})
+
+    @skipUnless(connection.vendor == "postgresql", "UPDATE ... FROM (VALUES ...)")
+    def test_values_update(self):
+        self.assert_deducts_in_one_statement()
+
+    def test_case_update(self):
+        with mock.patch.object(connection, "vendor", "sqlite"):
+            self.assert_deducts_in_one_statement()
@@ -2,16 +2,17 @@ import os
 import random
 import string
 from enum import unique
+from functools import lru_cache
 from io import BytesIO
 from urllib.parse import urlencode
 
-from django.core.mail import send_mail
 from django.db.models import TextChoices
 from django.http import HttpResponse
 from django.utils import timezone
+from reportlab import rl_config
 from reportlab.graphics.barcode import code128
 from reportlab.lib.pagesizes import A6
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import mm
 from reportlab.lib.utils import ImageReader
 from reportlab.pdfbase import pdfmetrics
@@ -19,6 +20,8 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 from reportlab.platypus import Paragraph
 
+from outbox.services import EmailOutboxService
+
 
 @unique
 class OrderStatus(TextChoices):
@@ -36,6 +39,14 @@ class PaymentStatus(TextChoices):
     UNPAID = "UNPAID", "UnPaid"      
 
 
+@unique
+class StockMode(TextChoices):
+    # Lock every ordered product for the whole checkout transaction
+    LOCK = "lock", "Lock"
+    # Guarded decrement right before commit, no product lock up front
+    CONDITIONAL = "conditional", "Conditional"
+
+
 def generate_code(length=20):
     chars = string.ascii_uppercase + string.digits
     return "".join(random.choices(chars, k=length))
@@ -61,439 +72,303 @@ def count_quantity(order_items):
     return quantity
 
 
-def generate_order_bill(order, order_items):
+class OrderBillEngine:
     """
-    Generate A6 shipping order bill (PDF)
-    Layout:
-    - Header: Shop name + logo + barcode
-    - Sender / Receiver info (2 columns)
-    - Product list
-    - COD amount + signature area
+    Draws A6 shipping bills. Fonts, paragraph styles and the logo are loaded
+    once here instead of on every bill; use the process-wide instance from
+    `get_order_bill_engine`. The styles are private to the engine and never
+    mutated while drawing.
     """
 
-    buffer = BytesIO()
-    register_fonts()
-    c = canvas.Canvas(buffer, pagesize=A6)
-    width, height = A6
-
-    # ========================
-    # CONFIG
-    # ========================
-    padding = 5 * mm
-    margin = 2 * mm
-    usable_width = width - 2 * padding
-
-    # ========================
-    # PAYMENT AMOUNT DISPLAY
-    # ========================
-    payment_method = getattr(order, "payment_method", "")
-    payment_method = str(payment_method).lower() if payment_method else ""
-
-    total_amount = getattr(order, "total_amount", 0) or 0
-
-    if payment_method == "banking":
-        collect_amount = 0
-    else:
-        collect_amount = total_amount
-
-    collect_amount_text = f"{collect_amount:,} VND"
-
-    # ========================
-    # PAGE BORDER
-    # ========================
-    c.rect(0.5 * mm, 0.5 * mm, width - 1 * mm, height - 1 * mm)
-
-    origin_x = padding
-    origin_y = height - padding
-
-    # ==================================================
-    # HEADER: SHOP NAME + LOGO + BARCODE
-    # ==================================================
-    header_y = origin_y
-    shop_name = "Giao hàng nhanh"
-
-    c.setFont("Roboto-Bold", 12)
-    c.drawString(origin_x, header_y, shop_name)
-
-    # --- Center logo under shop name
-    text_width = c.stringWidth(shop_name, "Roboto-Bold", 12)
-    text_center_x = origin_x + text_width / 2
-
-    logo_path = get_logo_path()
-    logo_width = 20 * mm
-    logo_height = 12 * mm
-
-    c.drawImage(
-        ImageReader(logo_path),
-        text_center_x - logo_width / 2,
-        header_y - logo_height - 4,
-        width=logo_width,
-        height=logo_height,
-        mask="auto",
-    )
+    def __init__(self):
+        # Binary PDF streams: without the optional rl_accel C extension,
+        # ASCII85-encoding the logo and fonts took most of the time per bill
+        rl_config.useA85 = 0
+        register_fonts()
+        self.text_style = ParagraphStyle(
+            "BillText", fontName="Roboto", fontSize=9, leading=11
+        )
+        self.item_style = ParagraphStyle("BillItem", parent=self.text_style, leading=12)
+        self.logo = ImageReader(get_logo_path())
 
-    # --- Barcode (right side)
-    barcode = code128.Code128(
-        order.code,
-        barHeight=8 * mm,
-        barWidth=0.15 * mm,
-    )
+    def render(self, bills, output=None):
+        """
+        One PDF with a page per `(order, order_items)` of `bills`, written to
+        `output` (a new `BytesIO` by default) and rewound.
+        """
+        buffer = output if output is not None else BytesIO()
+        c = canvas.Canvas(buffer, pagesize=A6)
+        for order, order_items in bills:
+            self.draw(c, order, order_items)
+        c.save()
+        buffer.seek(0)
+        return buffer
+
+    def draw(self, c, order, order_items):
+        """
+        Draw the bill of `order` on the current page of `c`, then end the page.
+        Layout:
+        - Header: Shop name + logo + barcode
+        - Sender / Receiver info (2 columns)
+        - Product list
+        - COD amount + signature area
+        """
+        # ========================
+        # CONFIG
+        # ========================
+        width, height = A6
+        padding = 5 * mm
+        margin = 2 * mm
+        usable_width = width - 2 * padding
+
+        # ========================
+        # PAYMENT AMOUNT DISPLAY
+        # ========================
+        payment_method = getattr(order, "payment_method", "")
+        payment_method = str(payment_method).lower() if payment_method else ""
+
+        total_amount = getattr(order, "total_amount", 0) or 0
+
+        if payment_method == "banking":
+            collect_amount = 0
+        else:
+            collect_amount = total_amount
+
+        collect_amount_text = f"{collect_amount:,} VND"
+
+        # ========================
+        # PAGE BORDER
+        # ========================
+        c.rect(0.5 * mm, 0.5 * mm, width - 1 * mm, height - 1 * mm)
+
+        origin_x = padding
+        origin_y = height - padding
+
+        # ==================================================
+        # HEADER: SHOP NAME + LOGO + BARCODE
+        # ==================================================
+        header_y = origin_y
+        shop_name = "Giao hàng nhanh"
+
+        c.setFont("Roboto-Bold", 12)
+        c.drawString(origin_x, header_y, shop_name)
+
+        # --- Center logo under shop name
+        text_width = c.stringWidth(shop_name, "Roboto-Bold", 12)
+        text_center_x = origin_x + text_width / 2
+
+        logo_width = 20 * mm
+        logo_height = 12 * mm
+
+        c.drawImage(
+            self.logo,
+            text_center_x - logo_width / 2,
+            header_y - logo_height - 4,
+            width=logo_width,
+            height=logo_height,
+            mask="auto",
+        )
 
-    barcode_x = width - padding - barcode.width
-    barcode_y = header_y - barcode.height + 3
-    barcode.drawOn(c, barcode_x, barcode_y)
-
-    c.setFont("Roboto", 8)
-    c.drawString(barcode_x, barcode_y - 10, f"Mã đơn hàng: {order.code}")
-
-    # --- Divider below header
-    c.setDash(3, 2)
-    c.line(padding, barcode_y - 20, width - padding, barcode_y - 20)
-    c.setDash()
-
-    # ==================================================
-    # SENDER & RECEIVER INFO (2 COLUMNS)
-    # ==================================================
-    info_y = barcode_y - 30
-    left_x = origin_x
-    right_x = origin_x + usable_width / 2 + margin
-
-    # --- Text styles
-    styles = getSampleStyleSheet()
-    normal_style = styles["Normal"]
-    normal_style.fontName = "Roboto"
-    normal_style.fontSize = 9
-    normal_style.leading = 11
-
-    # --- Sender
-    c.setFont("Roboto-Bold", 10)
-    c.drawString(left_x, info_y, "Người gửi:")
-
-    sender_para = Paragraph(
-        "Lades Beauty<br/>127/25/2E Cô Giang, P1, Phú Nhuận",
-        normal_style,
-    )
-    _, sender_h = sender_para.wrap(usable_width / 2 - 2 * margin, 50 * mm)
-    sender_para.drawOn(c, left_x, info_y - 12 - sender_h + 11)
+        # --- Barcode (right side)
+        barcode = code128.Code128(
+            order.code,
+            barHeight=8 * mm,
+            barWidth=0.15 * mm,
+        )
 
-    # --- Receiver
-    c.drawString(right_x, info_y, "Người nhận:")
+        barcode_x = width - padding - barcode.width
+        barcode_y = header_y - barcode.height + 3
+        barcode.drawOn(c, barcode_x, barcode_y)
 
-    receiver_para = Paragraph(
-        f"{order.name}<br/>{order.address}<br/>SĐT: {order.phone}",
-        normal_style,
-    )
-    _, receiver_h = receiver_para.wrap(usable_width / 2 - 2 * margin, 50 * mm)
-    receiver_para.drawOn(c, right_x, info_y - 12 - receiver_h + 11)
-
-    # --- Vertical divider
-    c.setDash(3, 2)
-    c.line(
-        origin_x + usable_width / 2,
-        info_y,
-        origin_x + usable_width / 2,
-        info_y - max(sender_h, receiver_h) - 5,
-    )
-    c.setDash()
-
-    # --- Horizontal divider
-    items_start_y = info_y - max(sender_h, receiver_h) - 5
-    c.setDash(3, 2)
-    c.line(padding, items_start_y, width - padding, items_start_y)
-    c.setDash()
-
-    # ==================================================
-    # PRODUCT LIST
-    # ==================================================
-    text_y = items_start_y - 10
-    c.setFont("Roboto-Bold", 10)
-    c.drawString(
-        left_x,
-        text_y,
-        f"Nội dung sản phẩm: (Tổng SL sản phẩm: {count_quantity(order_items)})",
-    )
+        c.setFont("Roboto", 8)
+        c.drawString(barcode_x, barcode_y - 10, f"Mã đơn hàng: {order.code}")
+
+        # --- Divider below header
+        c.setDash(3, 2)
+        c.line(padding, barcode_y - 20, width - padding, barcode_y - 20)
+        c.setDash()
 
-    text_y -= 8
+        # ==================================================
+        # SENDER & RECEIVER INFO (2 COLUMNS)
+        # ==================================================
+        info_y = barcode_y - 30
+        left_x = origin_x
+        right_x = origin_x + usable_width / 2 + margin
 
-    item_style = styles["Normal"]
-    item_style.fontName = "Roboto"
-    item_style.fontSize = 9
-    item_style.leading = 12
+        # --- Sender
+        c.setFont("Roboto-Bold", 10)
+        c.drawString(left_x, info_y, "Người gửi:")
 
-    for index, oi in enumerate(order_items, start=1):
-        para = Paragraph(
-            f"{index}. {oi.product.name} - SL: {oi.quantity}",
-            item_style,
+        sender_para = Paragraph(
+            "Lades Beauty<br/>127/25/2E Cô Giang, P1, Phú Nhuận",
+            self.text_style,
         )
-        _, para_h = para.wrap(usable_width - 10, 100)
-        para.drawOn(c, left_x + 5, text_y - para_h)
-        text_y -= para_h + 4
-
-    # ==================================================
-    # FOOTER DIVIDER
-    # ==================================================
-    footer_y = padding + 60
-    c.setDash(3, 2)
-    c.line(padding, footer_y, width - padding, footer_y)
-    c.setDash()
-
-    # ==================================================
-    # COD AMOUNT & SIGNATURE AREA
-    # ==================================================
-    half_width = usable_width / 2
-    right_center_x = padding + half_width + half_width / 2
-
-    # --- Labels
-    label_y = footer_y - 12
-    c.setFont("Roboto", 9)
-    c.drawString(padding, label_y, "Tiền thu Người nhận:")
-    c.drawCentredString(right_center_x, label_y, "Khối lượng tối đa: 1000g")
-
-    # --- Signature title
-    sign_title_y = label_y - 10
-    c.setFont("Roboto-Bold", 9)
-    c.drawCentredString(right_center_x, sign_title_y, "Chữ ký người nhận")
-
-    # --- Signature note
-    note_y = sign_title_y - 10
-    c.setFont("Roboto", 7)
-
-    note_lines = [
-        "(Xác nhận hàng nguyên vẹn, không móp méo,",
-        "bể/vỡ)",
-    ]
-    for i, line in enumerate(note_lines):
-        c.drawCentredString(right_center_x, note_y - i * 9, line)
-
-    # --- Signature line
-    sign_line_y = note_y - len(note_lines) * 9 - 12
-    c.line(
-        right_center_x - (half_width - 12 * mm) / 2,
-        sign_line_y,
-        right_center_x + (half_width - 12 * mm) / 2,
-        sign_line_y,
-    )
+        _, sender_h = sender_para.wrap(usable_width / 2 - 2 * margin, 50 * mm)
+        sender_para.drawOn(c, left_x, info_y - 12 - sender_h + 11)
+
+        # --- Receiver
+        c.drawString(right_x, info_y, "Người nhận:")
+
+        receiver_para = Paragraph(
+            f"{order.name}<br/>{order.address}<br/>SĐT: {order.phone}",
+            self.text_style,
+        )
+        _, receiver_h = receiver_para.wrap(usable_width / 2 - 2 * margin, 50 * mm)
+        receiver_para.drawOn(c, right_x, info_y - 12 - receiver_h + 11)
+
+        # --- Vertical divider
+        c.setDash(3, 2)
+        c.line(
+            origin_x + usable_width / 2,
+            info_y,
+            origin_x + usable_width / 2,
+            info_y - max(sender_h, receiver_h) - 5,
+        )
+        c.setDash()
+
+        # --- Horizontal divider
+        items_start_y = info_y - max(sender_h, receiver_h) - 5
+        c.setDash(3, 2)
+        c.line(padding, items_start_y, width - padding, items_start_y)
+        c.setDash()
+
+        # ==================================================
+        # PRODUCT LIST
+        # ==================================================
+        text_y = items_start_y - 10
+        c.setFont("Roboto-Bold", 10)
+        c.drawString(
+            left_x,
+            text_y,
+            f"Nội dung sản phẩm: (Tổng SL sản phẩm: {count_quantity(order_items)})",
+        )
+
+        text_y -= 8
+
+        for index, oi in enumerate(order_items, start=1):
+            para = Paragraph(
+                f"{index}. {oi.product.name} - SL: {oi.quantity}",
+                self.item_style,
+            )
+            _, para_h = para.wrap(usable_width - 10, 100)
+            para.drawOn(c, left_x + 5, text_y - para_h)
+            text_y -= para_h + 4
+
+        # ==================================================
+        # FOOTER DIVIDER
+        # ==================================================
+        footer_y = padding + 60
+        c.setDash(3, 2)
+        c.line(padding, footer_y, width - padding, footer_y)
+        c.setDash()
+
+        # ==================================================
+        # COD AMOUNT & SIGNATURE AREA
+        # ==================================================
+        half_width = usable_width / 2
+        right_center_x = padding + half_width + half_width / 2
+
+        # --- Labels
+        label_y = footer_y - 12
+        c.setFont("Roboto", 9)
+        c.drawString(padding, label_y, "Tiền thu Người nhận:")
+        c.drawCentredString(right_center_x, label_y, "Khối lượng tối đa: 1000g")
+
+        # --- Signature title
+        sign_title_y = label_y - 10
+        c.setFont("Roboto-Bold", 9)
+        c.drawCentredString(right_center_x, sign_title_y, "Chữ ký người nhận")
+
+        # --- Signature note
+        note_y = sign_title_y - 10
+        c.setFont("Roboto", 7)
+
+        note_lines = [
+            "(Xác nhận hàng nguyên vẹn, không móp méo,",
+            "bể/vỡ)",
+        ]
+        for i, line in enumerate(note_lines):
+            c.drawCentredString(right_center_x, note_y - i * 9, line)
+
+        # --- Signature line
+        sign_line_y = note_y - len(note_lines) * 9 - 12
+        c.line(
+            right_center_x - (half_width - 12 * mm) / 2,
+            sign_line_y,
+            right_center_x + (half_width - 12 * mm) / 2,
+            sign_line_y,
+        )
+
+        # --- Amount to collect
+        c.setFont("Roboto-Bold", 18)
+        c.drawString(padding, note_y, collect_amount_text)
 
-    # --- Amount to collect
-    c.setFont("Roboto-Bold", 18)
-    c.drawString(padding, note_y, collect_amount_text)
+        # --- Payment note for bank order
+        if payment_method == "banking":
+            c.setFont("Roboto-Bold", 8)
+            c.drawString(padding, note_y - 12, "Đơn hàng đã thanh toán")
 
-    # --- Payment note for bank order
-    if payment_method == "banking":
-        c.setFont("Roboto-Bold", 8)
-        c.drawString(padding, note_y - 12, "Đơn hàng đã thanh toán")
+        # --- Delivery instruction
+        c.setFont("Roboto-Bold", 9)
+        c.drawString(padding, sign_line_y - 6, "Chỉ dẫn giao hàng: Đồng kiểm")
 
-    # --- Delivery instruction
-    c.setFont("Roboto-Bold", 9)
-    c.drawString(padding, sign_line_y - 6, "Chỉ dẫn giao hàng: Đồng kiểm")
+        c.showPage()
 
-    # ========================
-    # EXPORT PDF
-    # ========================
-    c.showPage()
-    c.save()
-    buffer.seek(0)
 
+@lru_cache(maxsize=1)
+def get_order_bill_engine() -> OrderBillEngine:
+    return OrderBillEngine()
+
+
+def generate_order_bill(order, order_items):
+    """
+    Generate A6 shipping order bill (PDF)
+    """
+    buffer = get_order_bill_engine().render([(order, order_items)])
     response = HttpResponse(buffer, content_type="application/pdf")
     response["Content-Disposition"] = f'attachment; filename="order_{order.code}.pdf"'
     return response
 
 
-def send_order_confirmation_email(order, email, link=None):
-    logo_url = "https://img.freepik.com/premium-vector/hand-drawn-cosmetic-brushes-gentle-brush-stroke-grunge-style-sketch-cosmetic-illustration_484720-4254.jpg?w=2000"
-
-    order_date = timezone.localtime(timezone.now()).strftime("%H:%M %d/%m/%Y")
-
-    subject = f"Xác nhận đơn hàng {order.code} tại Lades"
-    message = f"Đơn hàng {order.code} của bạn đã được đặt thành công. Xem chi tiết: {link or ''}"
+ORDER_CONFIRMATION_EMAIL_TEMPLATE = "emails/order_confirmation.html"
 
-    shipping_fee = getattr(order, "shipping_fee", 0) or 0
-    total_amount = getattr(order, "total_amount", 0) or 0
 
-    formatted_shipping_fee = f"{shipping_fee:,} VNĐ"
-    formatted_total = f"{total_amount:,} VNĐ"
+def format_vnd(amount) -> str:
+    return f"{amount or 0:,} VNĐ"
 
-    items_html = ""
 
+def get_order_email_context(order, link=None) -> dict:
     order_items = getattr(order, "order_items", None)
     if order_items is None:
         order_items = order.items.all()
 
-    for item in order_items:
-        item_total_price = getattr(item, "total_price", 0) or 0
-
-        items_html += f"""
-            <tr>
-                <td style="padding:6px 8px; border:1px solid #ddd; font-size:14px; max-width:250px; word-break:break-word;">
-                    {item.product.name}
-                </td>
-                <td style="padding:6px 8px; border:1px solid #ddd; text-align:center; font-size:14px;">
-                    {item.quantity}
-                </td>
-                <td style="padding:6px 8px; border:1px solid #ddd; text-align:right; font-size:14px; white-space:nowrap;">
-                    {item_total_price:,} VNĐ
-                </td>
-            </tr>
-        """
-
-    items_html += f"""
-        <tr>
-            <td colspan="2" style="padding:6px 8px; border:1px solid #ddd; text-align:right; font-weight:bold;">
-                Phí vận chuyển
-            </td>
-            <td style="padding:6px 8px; border:1px solid #ddd; text-align:right; font-weight:bold;">
-                {formatted_shipping_fee}
-            </td>
-        </tr>
-        <tr>
-            <td colspan="2" style="padding:6px 8px; border:1px solid #ddd; text-align:right; font-weight:bold;">
-                Tổng cộng
-            </td>
-            <td style="padding:6px 8px; border:1px solid #ddd; text-align:right; font-weight:bold;">
-                {formatted_total}
-            </td>
-        </tr>
-    """
+    return {
+        "order_name": order.name,
+        "order_code": order.code,
+        "order_date": timezone.localtime(timezone.now()).strftime("%H:%M %d/%m/%Y"),
+        "items": [
+            {
+                "name": item.product.name,
+                "quantity": item.quantity,
+                "total": format_vnd(item.total_price),
+            }
+            for item in order_items
+        ],
+        "shipping_fee": format_vnd(order.shipping_fee),
+        "total": format_vnd(order.total_amount),
+        "payment_method": (order.payment_method or "").lower(),
+        "link": link,
+    }
 
-    payment_method = getattr(order, "payment_method", "")
-    payment_method = payment_method.lower() if payment_method else ""
-
-    if payment_method == "banking":
-        payment_notice_html = f"""
-            <div style="margin:22px 0 12px 0; text-align:center;">
-                <div style="
-                    display:inline-block;
-                    padding:8px 24px;
-                    border:3px solid #ff3333;
-                    color:#ff3333;
-                    font-size:18px;
-                    font-weight:bold;
-                    text-transform:uppercase;
-                    transform:rotate(-10deg);
-                    -webkit-transform:rotate(-10deg);
-                    border-radius:4px;
-                    letter-spacing:1px;
-                ">
-                    Đã thanh toán
-                </div>
-            </div>
-
-            <p style="
-                margin-top:14px;
-                padding:12px;
-                background-color:#f0fff4;
-                border:1px solid #9ae6b4;
-                color:#006241;
-                font-size:14px;
-                border-radius:4px;
-                line-height:1.6;
-                font-weight:bold;
-            ">
-                Đơn hàng đã được thanh toán qua chuyển khoản ngân hàng.
-            </p>
-        """
-    elif payment_method == "cod":
-        payment_notice_html = f"""
-            <p style="
-                margin-top:16px;
-                padding:12px;
-                background-color:#fff7e6;
-                border:1px solid #ffd591;
-                color:#8a5a00;
-                font-size:14px;
-                border-radius:4px;
-                line-height:1.6;
-            ">
-                Bạn cần chuẩn bị số tiền 
-                <strong>{formatted_total}</strong> 
-                để thanh toán đơn hàng khi nhận hàng.
-            </p>
-        """
-    else:
-        payment_notice_html = ""
-
-    html_message = f"""
-    <!DOCTYPE html>
-    <html>
-    <body style="margin:0; padding:0; background-color:#f8f8f8; font-family: Arial, Helvetica, sans-serif;">
-        <table width="100%" cellpadding="0" cellspacing="0">
-        <tr>
-            <td align="center">
-            <table width="600" cellpadding="0" cellspacing="0" style="padding:40px; background-color:#ffffff; border-radius:8px; box-shadow:0 0 10px rgba(0,0,0,0.1);">
-                <tr>
-                    <td align="center" style="padding-bottom:30px;">
-                        <img src="{logo_url}" alt="Lades" width="120" style="display:block;">
-                    </td>
-                </tr>
-
-                <tr>
-                    <td style="color:#333333; font-size:16px; padding-bottom:20px;">
-                        Xin chào <strong>{order.name}</strong>,
-                    </td>
-                </tr>
-
-                <tr>
-                    <td style="color:#333333; font-size:14px; line-height:1.6;">
-                        Đơn hàng của bạn đã được đặt thành công!<br><br>
-
-                        <strong>Mã đơn hàng:</strong> {order.code}<br>
-                        <strong>Ngày đặt:</strong> {order_date}<br>
-                        <strong>Tổng thanh toán:</strong> {formatted_total}<br><br>
-
-                        <strong>Danh sách sản phẩm:</strong>
-
-                        <table width="100%" cellpadding="0" cellspacing="0" style="border-collapse: collapse; margin-top:10px;">
-                            <thead style="background-color:#006241; color:#ffffff;">
-                                <tr>
-                                    <th style="padding:8px; border:1px solid #ddd; text-align:left;">
-                                        Sản phẩm
-                                    </th>
-                                    <th style="padding:8px; border:1px solid #ddd; text-align:center;">
-                                        Số lượng
-                                    </th>
-                                    <th style="padding:8px; border:1px solid #ddd; text-align:right;">
-                                        Thành tiền
-                                    </th>
-                                </tr>
-                            </thead>
-                            <tbody>
-                                {items_html}
-                            </tbody>
-                        </table>
-
-                        {payment_notice_html}
-
-                        {f'<a href="{link}" style="display:inline-block; margin-top:12px; padding:12px 24px; background-color:#006241; color:#ffffff; text-decoration:none; border-radius:4px;">Xem chi tiết đơn hàng</a>' if link else ""}
-                    </td>
-                </tr>
-
-                <tr>
-                    <td style="padding:30px 0;">
-                        <hr style="border:none; border-top:1px solid #dddddd;">
-                    </td>
-                </tr>
-
-                <tr>
-                    <td style="padding-top:20px; font-size:12px; color:#999999; line-height:1.5;">
-                        Email này được gửi tự động, vui lòng không phản hồi.<br>
-                        © 2025 Lades. Bảo lưu mọi quyền.
-                    </td>
-                </tr>
-            </table>
-            </td>
-        </tr>
-        </table>
-    </body>
-    </html>
-    """
 
-    send_mail(
-        subject=subject,
-        message=message,
+def send_order_confirmation_email(order, email, link=None):
+    EmailOutboxService().queue_email(
+        to_email=email,
+        subject=f"Xác nhận đơn hàng {order.code} tại Lades",
+        body=f"Đơn hàng {order.code} của bạn đã được đặt thành công. Xem chi tiết: {link or ''}",
+        template_name=ORDER_CONFIRMATION_EMAIL_TEMPLATE,
+        context=get_order_email_context(order, link),
         from_email=os.environ.get("DEFAULT_FROM_EMAIL"),
-        recipient_list=[email],
-        html_message=html_message,
-        fail_silently=False,
     )
 
 FIELD_ORDER = [
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from outbox.services import EmailOutboxService
+
+
+class Command(BaseCommand):
+    help = (
+        "Send due emails of the outbox in batches, one SMTP connection per "
+        "batch. Runs once (e.g. every minute from cron) or with --loop as a "
+        "long-running worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep polling the outbox"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait when the outbox is empty (with --loop)",
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=30,
+            help="Keep sent emails this many days; 0 keeps them forever",
+        )
+
+    def handle(self, *args, **options):
+        service = EmailOutboxService()
+        if options["retention_days"] > 0:
+            deleted = service.prune_sent_emails(
+                retention_days=options["retention_days"]
+            )
+            self.stdout.write(f"Pruned {deleted} sent emails")
+
+        while True:
+            totals = {"sent": 0, "retried": 0, "failed": 0}
+            while True:
+                result = service.deliver_due_emails(batch_size=options["batch_size"])
+                for key in totals:
+                    totals[key] += result[key]
+                if result["claimed"] < options["batch_size"]:
+                    break
+
+            if any(totals.values()) or not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        "Sent {sent} emails, {retried} to retry, {failed} "
+                        "failed".format(**totals)
+                    )
+                )
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
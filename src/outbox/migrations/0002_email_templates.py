@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("outbox", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emailoutbox",
+            name="layout",
+            field=models.CharField(default="card", max_length=20),
+        ),
+        migrations.AddField(
+            model_name="emailoutbox",
+            name="template_context",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="emailoutbox",
+            name="template_name",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
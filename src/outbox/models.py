@@ -0,0 +1,54 @@
+from enum import unique
+from uuid import uuid4
+
+from django.db import models
+from django.utils import timezone
+
+
+@unique
+class EmailStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    SENT = "SENT", "Sent"
+    FAILED = "FAILED", "Failed"
+
+
+class EmailOutbox(models.Model):
+    """
+    Email written in the transaction of the change it announces and delivered
+    later by `manage.py send_outbox_emails`, so no SMTP round trip runs under a
+    database lock and a mail failure never rolls the change back. Emails queued
+    with a `template_name` are rendered by the worker from `template_context`.
+    """
+
+    uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=255, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    template_name = models.CharField(max_length=255, blank=True)
+    template_context = models.JSONField(default=dict, blank=True)
+    layout = models.CharField(max_length=20, default="card")
+    status = models.CharField(
+        max_length=20, choices=EmailStatus.choices, default=EmailStatus.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Also pushed forward while a worker is sending, so a crashed worker's
+    # emails are picked up again once it passes
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status=EmailStatus.PENDING),
+                name="email_outbox_due",
+            ),
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.to_email}: {self.subject}"
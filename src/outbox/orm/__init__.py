@@ -0,0 +1,4 @@
+from .outbox import EmailOutboxORM
+
+
+__all__ = ["EmailOutboxORM"]
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import F
+
+from outbox.models import EmailOutbox, EmailStatus
+
+
+class EmailOutboxORM:
+    @staticmethod
+    def create_email(**email_info) -> EmailOutbox:
+        return EmailOutbox.objects.create(**email_info)
+
+    @staticmethod
+    def bulk_create_emails(emails: list[EmailOutbox]) -> list[EmailOutbox]:
+        return EmailOutbox.objects.bulk_create(emails)
+
+    @staticmethod
+    @transaction.atomic
+    def claim_due_emails(
+        limit: int, now: datetime, lease: timedelta
+    ) -> list[EmailOutbox]:
+        """
+        Lock up to `limit` due emails, skipping those another worker holds, and
+        push them `lease` into the future so they are not claimed again while
+        being sent. Counts the attempt.
+        """
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailStatus.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:limit]
+        )
+        if emails:
+            EmailOutbox.objects.filter(uid__in=[email.uid for email in emails]).update(
+                attempts=F("attempts") + 1, next_attempt_at=now + lease
+            )
+            for email in emails:
+                email.attempts += 1
+        return emails
+
+    @staticmethod
+    def mark_sent(uids: list[UUID], sent_at: datetime) -> int:
+        return EmailOutbox.objects.filter(uid__in=uids).update(
+            status=EmailStatus.SENT, sent_at=sent_at, last_error=""
+        )
+
+    @staticmethod
+    def save_failed_attempts(emails: list[EmailOutbox]) -> int:
+        return EmailOutbox.objects.bulk_update(
+            emails, fields=["status", "next_attempt_at", "last_error"]
+        )
+
+    @staticmethod
+    def delete_sent_before(before: datetime, batch_size: int) -> int:
+        deleted = 0
+        while True:
+            uids = list(
+                EmailOutbox.objects.filter(
+                    status=EmailStatus.SENT, created_at__lt=before
+                ).values_list("uid", flat=True)[:batch_size]
+            )
+            if not uids:
+                return deleted
+            deleted += EmailOutbox.objects.filter(uid__in=uids).delete()[0]
@@ -0,0 +1,222 @@
+import logging
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from outbox.models import EmailOutbox, EmailStatus
+from outbox.orm import EmailOutboxORM
+from outbox.utils import render_emails
+
+
+logger = logging.getLogger("django")
+
+# A worker that dies mid-batch leaves its emails to be sent again after this
+EMAIL_OUTBOX_LEASE = timedelta(minutes=5)
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+# Doubled after every failed attempt: 1 min, 2 min, 4 min, ... up to 6 h
+EMAIL_OUTBOX_RETRY_DELAY = timedelta(minutes=1)
+EMAIL_OUTBOX_MAX_RETRY_DELAY = timedelta(hours=6)
+EMAIL_OUTBOX_PRUNE_BATCH_SIZE = 5000
+EMAIL_OUTBOX_BULK_BATCH_SIZE = 500
+
+
+class EmailOutboxService:
+    def __init__(self):
+        self.orm = EmailOutboxORM()
+
+    def queue_email(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        html_body: str = "",
+        template_name: str = "",
+        context: Optional[dict] = None,
+        layout: str = "card",
+        from_email: Optional[str] = None,
+    ) -> EmailOutbox:
+        """
+        Write the email to the outbox. Call it inside the transaction of the
+        change the email is about: it is only sent if that change commits. With
+        `template_name`, the HTML is rendered from the JSON-serializable
+        `context` by the worker, off the caller's path.
+        """
+        return self.orm.create_email(
+            to_email=to_email,
+            from_email=from_email or "",
+            subject=subject,
+            body=body,
+            html_body=html_body,
+            template_name=template_name,
+            template_context=context or {},
+            layout=layout,
+        )
+
+    def queue_bulk_emails(
+        self,
+        template_name: str,
+        messages: Iterable[dict],
+        layout: str = "card",
+        from_email: Optional[str] = None,
+    ) -> int:
+        """
+        Queue one email per message, e.g. a campaign or order status updates.
+        Each message has `to_email`, `subject`, `body` and the `context` of
+        `template_name`. Rows are inserted `EMAIL_OUTBOX_BULK_BATCH_SIZE` at a
+        time and rendered in bulk by the worker. Returns the number queued.
+        """
+        messages = iter(messages)
+        queued = 0
+        while batch := list(islice(messages, EMAIL_OUTBOX_BULK_BATCH_SIZE)):
+            queued += len(
+                self.orm.bulk_create_emails(
+                    [
+                        EmailOutbox(
+                            to_email=message["to_email"],
+                            from_email=from_email or "",
+                            subject=message["subject"],
+                            body=message["body"],
+                            template_name=template_name,
+                            template_context=message["context"],
+                            layout=layout,
+                        )
+                        for message in batch
+                    ]
+                )
+            )
+        return queued
+
+    def deliver_due_emails(
+        self, batch_size: int, now: Optional[datetime] = None
+    ) -> dict:
+        """
+        Send one batch of due emails over a single SMTP connection. Failed
+        emails are retried with exponential backoff until
+        `EMAIL_OUTBOX_MAX_ATTEMPTS`, then marked failed.
+        """
+        result = {"claimed": 0, "sent": 0, "retried": 0, "failed": 0}
+        emails = self.orm.claim_due_emails(
+            limit=batch_size, now=now or timezone.now(), lease=EMAIL_OUTBOX_LEASE
+        )
+        if not emails:
+            return result
+        result["claimed"] = len(emails)
+
+        errors = self.render_html_bodies(emails)
+        rendered = [email for email in emails if email.uid not in errors]
+        errors.update(
+            zip([email.uid for email in rendered], self.send_emails(rendered))
+        )
+
+        sent, failed = [], []
+        finished_at = timezone.now()
+        for email in emails:
+            error = errors[email.uid]
+            if error is None:
+                sent.append(email.uid)
+                continue
+
+            email.last_error = f"{type(error).__name__}: {error}"
+            if email.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+                email.status = EmailStatus.FAILED
+                result["failed"] += 1
+                logger.error(
+                    f"Giving up on email {email.uid} to {email.to_email}: "
+                    f"{email.last_error}"
+                )
+            else:
+                email.next_attempt_at = finished_at + min(
+                    EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1),
+                    EMAIL_OUTBOX_MAX_RETRY_DELAY,
+                )
+                result["retried"] += 1
+            failed.append(email)
+
+        if sent:
+            self.orm.mark_sent(sent, sent_at=finished_at)
+        if failed:
+            self.orm.save_failed_attempts(failed)
+        result["sent"] = len(sent)
+        return result
+
+    @staticmethod
+    def render_html_bodies(emails: list[EmailOutbox]) -> dict:
+        """
+        Render the HTML of templated emails, one `render_emails` pass per
+        template and layout. Returns the rendering error by email uid.
+        """
+        groups: dict[tuple, list[EmailOutbox]] = {}
+        for email in emails:
+            if email.template_name and not email.html_body:
+                groups.setdefault((email.template_name, email.layout), []).append(email)
+
+        errors = {}
+        for (template_name, layout), group in groups.items():
+            try:
+                htmls = list(
+                    render_emails(
+                        template_name,
+                        [email.template_context for email in group],
+                        layout,
+                    )
+                )
+            except Exception as exc:
+                logger.exception(f"Rendering email template {template_name} failed")
+                errors.update((email.uid, exc) for email in group)
+                continue
+            for email, html in zip(group, htmls):
+                email.html_body = html
+        return errors
+
+    def send_emails(self, emails: list[EmailOutbox]) -> list[Optional[Exception]]:
+        """
+        Send `emails` over one reused connection and return the error of each,
+        None when sent. A message the server rejects does not stop the others.
+        """
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as exc:
+            logger.exception("Opening the email connection failed")
+            return [exc] * len(emails)
+
+        errors = []
+        try:
+            for email in emails:
+                try:
+                    if not connection.send_messages([self.build_message(email)]):
+                        raise RuntimeError("The email backend sent nothing")
+                except Exception as exc:
+                    errors.append(exc)
+                else:
+                    errors.append(None)
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                logger.exception("Closing the email connection failed")
+        return errors
+
+    @staticmethod
+    def build_message(email: EmailOutbox) -> EmailMultiAlternatives:
+        message = EmailMultiAlternatives(
+            subject=email.subject,
+            body=email.body,
+            from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=[email.to_email],
+        )
+        if email.html_body:
+            message.attach_alternative(email.html_body, "text/html")
+        return message
+
+    def prune_sent_emails(
+        self, retention_days: int, now: Optional[datetime] = None
+    ) -> int:
+        before = (now or timezone.now()) - timedelta(days=retention_days)
+        return self.orm.delete_sent_before(
+            before=before, batch_size=EMAIL_OUTBOX_PRUNE_BATCH_SIZE
+        )
@@ -0,0 +1,56 @@
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from django.template import Context
+from django.template.loader import get_template, render_to_string
+
+
+EMAIL_LOGO_URL = "https://img.freepik.com/premium-vector/hand-drawn-cosmetic-brushes-gentle-brush-stroke-grunge-style-sketch-cosmetic-illustration_484720-4254.jpg?w=2000"
+
+# Page and content table styles of the two email looks
+EMAIL_LAYOUTS = {
+    "plain": {
+        "background_color": "#ffffff",
+        "table_style": "padding:40px 30px;",
+    },
+    "card": {
+        "background_color": "#f8f8f8",
+        "table_style": (
+            "padding:40px; background-color:#ffffff; border-radius:8px; "
+            "box-shadow:0 0 10px rgba(0,0,0,0.1);"
+        ),
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def get_email_frame(layout: str) -> tuple[str, str]:
+    """
+    Header and footer of `layout`, rendered once per process: they only depend
+    on the layout.
+    """
+    context = {**EMAIL_LAYOUTS[layout], "logo_url": EMAIL_LOGO_URL}
+    return (
+        render_to_string("emails/header.html", context),
+        render_to_string("emails/footer.html", context),
+    )
+
+
+def render_emails(
+    template_name: str, contexts: Iterable[dict], layout: str = "card"
+) -> Iterator[str]:
+    """
+    Render the HTML of one email per context. The template is compiled once by
+    the cached template loader, the frame is pre-rendered and a single `Context`
+    is reused, so each message only costs rendering its own content rows.
+    """
+    template = get_template(template_name).template
+    header, footer = get_email_frame(layout)
+    context = Context()
+    for values in contexts:
+        with context.push(values):
+            yield header + template.render(context) + footer
+
+
+def render_email(template_name: str, context: dict, layout: str = "card") -> str:
+    return next(render_emails(template_name, [context], layout))
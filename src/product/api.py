@@ -1,36 +1,58 @@
-from typing import List
+from datetime import date
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from django.http import HttpResponse
-from django.template import Context, Template
 from ninja import Query
 
+from product.caching import (
+    BRAND_CACHE_TTL,
+    PRODUCT_DETAIL_CACHE_TTL,
+    PRODUCT_LIST_CACHE_TTL,
+    build_brand_cache_key,
+    build_product_detail_cache_key,
+    build_product_list_cache_key,
+)
 from product.schemas import (
     BrandRequestSchema,
     BrandResponseSchema,
     DeleteBrandResponseSchema,
+    DeleteReviewResponseSchema,
     DeleteProductResponseSchema,
     OnOffResponseSchema,
     ProductDetailResponseSchema,
+    ProductScanDailyResponseSchema,
+    ProductScanLocationResponseSchema,
     ProductRequestSchema,
+    ProductImportResponseSchema,
     ProductResponseSchema,
+    ProductStockBucketsResponseSchema,
+    ProductStockResponseSchema,
+    ProductStockUpdateSchema,
     ProductUpdateSchema,
     SearchFilterSortSchema,
     VerifierLocationResponseSchema,
+    VerifyCodeBatchResponseSchema,
+    VerifyCodeCloneAlertResponseSchema,
+    VerifyCodeScanHourlyResponseSchema,
     ReviewRequestSchema,
     ReviewResponseSchema,
 )
 from ninja import File, Form
 from ninja.files import UploadedFile
+from product.services.analytics import ScanAnalyticsService
 from product.services.product import ProductService
+from product.services.stock import ProductStockService
 from product.services.verify_code import VerifyCodeService
 from product.services.review import ReviewService
-from product.utils import VERIFY_QR_TEMPLATE, generate_qrcode_pdf
+from product.utils import generate_qrcode_pdf, render_verify_page
 from router.authenticate import AuthBear
 from router.authorize import IsAdmin
 from router.controller import Controller, api, delete, get, post, put
 from router.middleware import get_client_ip
-from router.paginate import paginate
+from router.caching import cached_json_response
+from router.paginate import PaginatedResponseSchema, Pagination, paginate
+from router.streaming import iter_async, stream_attachment, stream_file
 from router.types import AuthenticatedRequest
 
 
@@ -38,6 +60,7 @@ from router.types import AuthenticatedRequest
 class ProductController(Controller):
     def __init__(self) -> None:
         self.service = ProductService()
+        self.stock_service = ProductStockService()
         self.verify_code_service = VerifyCodeService()
 
     @post("", response=ProductResponseSchema, auth=AuthBear(), permissions=[IsAdmin()])
@@ -60,9 +83,26 @@ class ProductController(Controller):
         response["Content-Disposition"] = 'attachment; filename="product_list.xlsx"'
         return response
 
+    @get("/export", auth=AuthBear(), permissions=[IsAdmin()])
+    def export_products(self, format: Literal["xlsx", "csv"] = "xlsx"):
+        if format == "csv":
+            return stream_attachment(
+                iter_async(self.service.export_products_csv()),
+                filename="products.csv",
+                content_type="text/csv; charset=utf-8",
+            )
+
+        return stream_file(
+            self.service.export_products_xlsx(),
+            filename="products.xlsx",
+            content_type=(
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            ),
+        )
+
     @post(
         "/multi-product",
-        response=List[ProductResponseSchema],
+        response=ProductImportResponseSchema,
         auth=AuthBear(),
         permissions=[IsAdmin()],
     )
@@ -75,13 +115,28 @@ class ProductController(Controller):
         self.service.delete_product_image(uid=uid)
 
     @get("", response=ProductResponseSchema, paginate=True)
-    @paginate
-    def get_products(self, payload: SearchFilterSortSchema = Query(...)):
-        return self.service.get_products(payload=payload)
+    def get_products(
+        self,
+        payload: SearchFilterSortSchema = Query(...),
+        pagination: Pagination.Input = Query(...),
+    ):
+        return cached_json_response(
+            cache_key=build_product_list_cache_key(payload, pagination),
+            schema=PaginatedResponseSchema[ProductResponseSchema],
+            get_data=lambda: self.service.get_products(
+                payload=payload, pagination=pagination
+            ),
+            timeout=PRODUCT_LIST_CACHE_TTL,
+        )
 
     @get("/{uid}", response=ProductDetailResponseSchema)
     def get_product_by_uid(self, uid: UUID):
-        return self.service.get_product_by_uid(uid=uid)
+        return cached_json_response(
+            cache_key=build_product_detail_cache_key(uid),
+            schema=ProductDetailResponseSchema,
+            get_data=lambda: self.service.get_product_by_uid(uid=uid),
+            timeout=PRODUCT_DETAIL_CACHE_TTL,
+        )
 
     @put(
         "/{uid}",
@@ -92,6 +147,32 @@ class ProductController(Controller):
     def update_product(self, uid: UUID, payload: ProductUpdateSchema):
         return self.service.update_product(uid=uid, payload=payload)
 
+    @get("/{uid}/stock", response=ProductStockResponseSchema)
+    def get_product_stock(self, uid: UUID):
+        return self.stock_service.get_stock(uid=uid)
+
+    @get(
+        "/{uid}/stock-buckets",
+        response=ProductStockBucketsResponseSchema,
+        auth=AuthBear(),
+        permissions=[IsAdmin()],
+    )
+    def get_product_stock_buckets(self, uid: UUID):
+        return self.stock_service.get_stock_buckets(uid=uid)
+
+    @put(
+        "/{uid}/stock",
+        response=ProductStockBucketsResponseSchema,
+        auth=AuthBear(),
+        permissions=[IsAdmin()],
+    )
+    def update_product_stock(self, uid: UUID, payload: ProductStockUpdateSchema):
+        return self.stock_service.update_stock(
+            uid=uid,
+            quantity_in_stock=payload.quantity_in_stock,
+            stock_bucket_count=payload.stock_bucket_count,
+        )
+
     @put(
         "/{uid}/on-off",
         response=OnOffResponseSchema,
@@ -117,7 +198,22 @@ class ProductController(Controller):
             uid=uid,
             quantity=quantity,
         )
-        return generate_qrcode_pdf(verify_codes)
+        return generate_qrcode_pdf(
+            self.verify_code_service.get_print_labels(verify_codes)
+        )
+
+    @post(
+        "/{uid}/qrcode-batches",
+        response=VerifyCodeBatchResponseSchema,
+        auth=AuthBear(),
+        permissions=[IsAdmin()],
+    )
+    def create_qrcode_batch(
+        self, request: AuthenticatedRequest, uid: UUID, quantity: int
+    ):
+        return self.verify_code_service.create_verify_code_batch(
+            user=request.user, uid=uid, quantity=quantity
+        )
 
 
 @api(prefix_or_class="brands", tags=["Brand"], auth=None)
@@ -131,11 +227,21 @@ class BrandController(Controller):
 
     @get("", response=List[BrandResponseSchema])
     def get_brands(self):
-        return self.service.get_brands()
+        return cached_json_response(
+            cache_key=build_brand_cache_key(),
+            schema=List[BrandResponseSchema],
+            get_data=self.service.get_brands,
+            timeout=BRAND_CACHE_TTL,
+        )
 
     @get("/{uid}", response=BrandResponseSchema)
     def get_brand(self, uid: UUID):
-        return self.service.get_brand_by_uid(uid=uid)
+        return cached_json_response(
+            cache_key=build_brand_cache_key(uid=uid),
+            schema=BrandResponseSchema,
+            get_data=lambda: self.service.get_brand_by_uid(uid=uid),
+            timeout=BRAND_CACHE_TTL,
+        )
 
     @delete(
         "/{uid}",
@@ -158,8 +264,7 @@ class VerifyCodeController(Controller):
         client_ip = get_client_ip(request)
         result = self.service.verify_qrcode(code=code, client_ip=client_ip)
 
-        html = Template(VERIFY_QR_TEMPLATE).render(Context(result))
-        return HttpResponse(html, content_type="text/html")
+        return HttpResponse(render_verify_page(result), content_type="text/html")
 
     @get(
         "/{code}/locations",
@@ -170,6 +275,97 @@ class VerifyCodeController(Controller):
     def get_verifier_location_by_code(self, code: str):
         return self.service.get_verifier_location_by_code(code=code)
 
+    @get(
+        "/batches/{uid}",
+        response=VerifyCodeBatchResponseSchema,
+        auth=AuthBear(),
+        permissions=[IsAdmin()],
+    )
+    def get_verify_code_batch(self, uid: UUID):
+        return self.service.get_verify_code_batch(uid=uid)
+
+    @get("/batches/{uid}/download", auth=AuthBear(), permissions=[IsAdmin()])
+    def download_verify_code_batch(self, uid: UUID):
+        return stream_file(
+            self.service.open_verify_code_batch_file(uid=uid),
+            filename=f"qr_codes_{uid}.pdf",
+            content_type="application/pdf",
+        )
+
+    @post(
+        "/batches/{uid}/reprint",
+        response=VerifyCodeBatchResponseSchema,
+        auth=AuthBear(),
+        permissions=[IsAdmin()],
+    )
+    def reprint_verify_code_batch(self, uid: UUID):
+        return self.service.reprint_verify_code_batch(uid=uid)
+
+
+@api(prefix_or_class="scan-analytics", tags=["Scan Analytics"], auth=None)
+class ScanAnalyticsController(Controller):
+    """
+    Read-only views over the scan rollups maintained by `manage.py rollup_scans`;
+    none of them touch the raw scan table.
+    """
+
+    def __init__(self) -> None:
+        self.service = ScanAnalyticsService()
+
+    @get(
+        "/products/{uid}/daily",
+        response=List[ProductScanDailyResponseSchema],
+        auth=AuthBear(),
+        permissions=[IsAdmin()],
+    )
+    def get_product_daily_scans(
+        self,
+        uid: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ):
+        return self.service.get_product_daily_scans(
+            product_uid=uid, start_date=start_date, end_date=end_date
+        )
+
+    @get(
+        "/products/{uid}/locations",
+        response=List[ProductScanLocationResponseSchema],
+        auth=AuthBear(),
+        permissions=[IsAdmin()],
+    )
+    def get_product_location_scans(
+        self,
+        uid: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ):
+        return self.service.get_product_location_scans(
+            product_uid=uid, start_date=start_date, end_date=end_date
+        )
+
+    @get(
+        "/verifycodes/{code}/hourly",
+        response=VerifyCodeScanHourlyResponseSchema,
+        auth=AuthBear(),
+        permissions=[IsAdmin()],
+        paginate=True,
+    )
+    @paginate
+    def get_verify_code_hourly_scans(self, code: str):
+        return self.service.get_verify_code_hourly_scans(code=code)
+
+    @get(
+        "/clone-alerts",
+        response=VerifyCodeCloneAlertResponseSchema,
+        auth=AuthBear(),
+        permissions=[IsAdmin()],
+        paginate=True,
+    )
+    @paginate
+    def get_clone_alerts(self, product_uid: Optional[UUID] = None):
+        return self.service.get_clone_alerts(product_uid=product_uid)
+
 
 @api(prefix_or_class="reviews", tags=["Review"], auth=None)
 class ReviewController(Controller):
@@ -197,6 +393,12 @@ class ReviewController(Controller):
             files=file or [],
         )
 
-    @get("/product/{uid}", response=List[ReviewResponseSchema])
+    @get("/product/{uid}", response=ReviewResponseSchema, paginate=True)
+    @paginate
     def get_reviews(self, uid: UUID):
         return self.service.get_reviews(uid=uid)
+
+    @delete("/{uid}", response=DeleteReviewResponseSchema, auth=AuthBear())
+    def delete_review(self, request: AuthenticatedRequest, uid: UUID):
+        success = self.service.delete_review(user=request.user, uid=uid)
+        return DeleteReviewResponseSchema(success=success)
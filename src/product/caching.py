@@ -1,16 +1,109 @@
+import hashlib
+import json
+import time
+
 from django.core.cache import cache
 
-PRODUCT_LIST_CACHE_KEY = "products:list:default"
+PRODUCT_CACHE_PREFIX = "products"
 PRODUCT_LIST_CACHE_TTL = 60 * 3  # 3 phút
+PRODUCT_DETAIL_CACHE_TTL = 60 * 10
+BRAND_CACHE_TTL = 60 * 30
+VERIFY_PRODUCT_CARD_CACHE_TTL = 60 * 60
+MISSING_VERIFY_CODE_CACHE_TTL = 60 * 10
+PRODUCT_STOCK_CACHE_TTL = 30
+PRODUCT_CATALOG_GENERATION_KEY = "products:generation"
+
+
+def get_catalog_generation() -> int:
+    generation = cache.get(PRODUCT_CATALOG_GENERATION_KEY)
+    if generation is None:
+        # Start from the current time so a lost counter never reuses old keys
+        cache.add(PRODUCT_CATALOG_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(PRODUCT_CATALOG_GENERATION_KEY, time.time_ns())
+    return generation
+
+
+def normalize_product_list_params(payload, pagination) -> dict:
+    search = (payload.search or "").strip().lower()
+    return {
+        "search": search or None,
+        "brand": payload.brand or None,
+        "min_price": payload.min_price,
+        "max_price": payload.max_price,
+        "sort": payload.sort,
+        "page": None if pagination.is_cursor_mode else pagination.page,
+        "page_size": pagination.page_size,
+        "cursor": pagination.cursor if pagination.is_cursor_mode else None,
+    }
+
+
+def build_catalog_cache_key(namespace: str, params: dict) -> str:
+    serialized = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha1(serialized.encode()).hexdigest()
+    return f"{PRODUCT_CACHE_PREFIX}:{namespace}:{get_catalog_generation()}:{digest}"
+
+
+def build_product_list_cache_key(payload, pagination) -> str:
+    return build_catalog_cache_key(
+        "list", normalize_product_list_params(payload, pagination)
+    )
+
+
+def build_product_detail_cache_key(uid) -> str:
+    return build_catalog_cache_key("detail", {"uid": str(uid)})
+
 
-def is_only_get_list(payload) -> bool:
-    return (
-        not getattr(payload, "search", None)
-        and not getattr(payload, "brand", None)
-        and getattr(payload, "min_price", None) is None
-        and getattr(payload, "max_price", None) is None
-        and getattr(payload, "sort", "asc") == "asc"
+def clear_product_detail_cache(uid) -> None:
+    cache.delete(build_product_detail_cache_key(uid))
+
+
+def build_product_stock_cache_key(uid) -> str:
+    # Not generation-scoped: checkouts change stock without touching the catalog
+    return f"{PRODUCT_CACHE_PREFIX}:stock:{uid}"
+
+
+def clear_product_stock_cache(uid) -> None:
+    cache.delete(build_product_stock_cache_key(uid))
+
+
+def build_verify_product_card_cache_key(product) -> str:
+    """
+    Not generation-scoped: the key is versioned by everything the card shows.
+    `updated_at` changes with every product edit, but not when an image is
+    added or removed or the brand is renamed, so the main image (annotated by
+    `VerifyCodeORM.get_product_info`) and the brand are part of it too.
+    """
+    version = json.dumps(
+        [
+            product.updated_at.timestamp() if product.updated_at else 0,
+            getattr(product, "image", None),
+            str(product.brand),
+        ]
     )
+    digest = hashlib.sha1(version.encode()).hexdigest()
+    return f"{PRODUCT_CACHE_PREFIX}:verify-card:{product.uid}:{digest}"
+
+
+def build_missing_verify_code_cache_key(code: str) -> str:
+    # Hashed: the code comes straight from the scanned URL
+    digest = hashlib.sha1(code.encode()).hexdigest()
+    return f"{PRODUCT_CACHE_PREFIX}:verify-missing:{digest}"
+
+
+def clear_missing_verify_code_cache(codes: list[str]) -> None:
+    cache.delete_many([build_missing_verify_code_cache_key(code) for code in codes])
+
+
+def build_brand_cache_key(uid=None) -> str:
+    return build_catalog_cache_key("brands", {"uid": str(uid) if uid else None})
+
 
 def clear_product_cache() -> None:
-    cache.delete(PRODUCT_LIST_CACHE_KEY)
\ No newline at end of file
+    """
+    Invalidate every cached catalog response in O(1): bump the catalog generation
+    so old keys are never read again and simply expire with their TTL.
+    """
+    try:
+        cache.incr(PRODUCT_CATALOG_GENERATION_KEY)
+    except ValueError:
+        cache.add(PRODUCT_CATALOG_GENERATION_KEY, time.time_ns(), timeout=None)
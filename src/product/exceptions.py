@@ -33,6 +33,18 @@ class ProductOutOfStock(APIException):
     message = "Sản phẩm không còn đủ số lượng trong kho."
 
 
+class ProductStockInvalid(APIException):
+    error_code = HTTPStatus.BAD_REQUEST
+    message_code = "PRODUCT_STOCK_INVALID"
+    message = "Số lượng tồn kho hoặc số ngăn kho không hợp lệ."
+
+
+class ProductStockBucketConflict(APIException):
+    error_code = HTTPStatus.BAD_REQUEST
+    message_code = "PRODUCT_STOCK_BUCKET_CONFLICT"
+    message = "Sản phẩm giữ hàng qua Redis không thể chia kho thành nhiều ngăn."
+
+
 class QuantityQRCodeInvalid(APIException):
     error_code = HTTPStatus.BAD_REQUEST
     message_code = "QUANTITY_QR_CODE_INVALID"
@@ -41,4 +53,40 @@ class QuantityQRCodeInvalid(APIException):
 class VerifyCodeDoesNotExists(APIException):
     error_code = HTTPStatus.BAD_REQUEST
     message_code = "VERIFY_CODE_DOES_NOT_EXISTS"
-    message = "Mã QR xác thực không tồn tại."
\ No newline at end of file
+    message = "Mã QR xác thực không tồn tại."
+
+
+class ReviewDoesNotExists(APIException):
+    error_code = HTTPStatus.BAD_REQUEST
+    message_code = "REVIEW_DOES_NOT_EXISTS"
+    message = "Đánh giá không tồn tại."
+
+
+class ReviewRatingInvalid(APIException):
+    error_code = HTTPStatus.BAD_REQUEST
+    message_code = "REVIEW_RATING_INVALID"
+    message = "Số sao đánh giá phải từ 1 đến 5."
+
+
+class ReviewPermissionDenied(APIException):
+    error_code = HTTPStatus.FORBIDDEN
+    message_code = "REVIEW_PERMISSION_DENIED"
+    message = "Bạn không có quyền xóa đánh giá này."
+
+
+class VerifyCodeBatchDoesNotExists(APIException):
+    error_code = HTTPStatus.BAD_REQUEST
+    message_code = "VERIFY_CODE_BATCH_DOES_NOT_EXISTS"
+    message = "Lô mã QR không tồn tại."
+
+
+class VerifyCodeBatchNotReady(APIException):
+    error_code = HTTPStatus.CONFLICT
+    message_code = "VERIFY_CODE_BATCH_NOT_READY"
+    message = "File PDF của lô mã QR chưa sẵn sàng."
+
+
+class VerifyCodeBatchIsRendering(APIException):
+    error_code = HTTPStatus.CONFLICT
+    message_code = "VERIFY_CODE_BATCH_IS_RENDERING"
+    message = "Lô mã QR đang được tạo file PDF."
@@ -0,0 +1,254 @@
+import csv
+import ipaddress
+import json
+import math
+import mmap
+import struct
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import requests
+from django.conf import settings
+
+
+GEOIP_TABLE_MAGIC = b"LGEOIP1\0"
+# magic, range count, location count
+GEOIP_HEADER = struct.Struct(">8sII")
+# start, end (IPv6 / IPv4-mapped, big endian) and location index
+GEOIP_RANGE = struct.Struct(">16s16sI")
+GEOIP_OFFSET = struct.Struct(">Q")
+IPV4_MAPPED_PREFIX = bytes(10) + b"\xff\xff"
+EARTH_RADIUS_KM = 6371.0
+
+GEOIP_LOCATION_FIELDS = [
+    "isp",
+    "organization",
+    "asn",
+    "country",
+    "country_code",
+    "region",
+    "region_name",
+    "city",
+    "zip_code",
+    "latitude",
+    "longitude",
+    "timezone",
+]
+
+
+def ip_to_key(ip: str) -> bytes:
+    """
+    16-byte sort key of an address; IPv4 is mapped into `::ffff:0:0/96` so both
+    families live in one table.
+    """
+    address = ipaddress.ip_address(ip.strip())
+    if address.version == 4:
+        address = ipaddress.IPv6Address(f"::ffff:{address}")
+    return address.packed
+
+
+def parse_ip_bound(value: str) -> bytes:
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        if number <= 0xFFFFFFFF:
+            return IPV4_MAPPED_PREFIX + number.to_bytes(4, "big")
+        return number.to_bytes(16, "big")
+    return ip_to_key(value)
+
+
+def distance_km(lat1, lon1, lat2, lon2) -> float:
+    """
+    Great-circle (haversine) distance between two coordinates in kilometres.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, map(float, (lat1, lon1, lat2, lon2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def build_geoip_table(rows: Iterable[dict], output) -> int:
+    """
+    Write an IP range CSV (`ip_from`, `ip_to` + `GEOIP_LOCATION_FIELDS`
+    columns) as a binary table readable by `GeoIPTable`. Identical locations are
+    stored once. Returns the number of ranges written.
+    """
+    locations: dict[str, int] = {}
+    ranges = []
+    for row in rows:
+        location = {field: row.get(field) or None for field in GEOIP_LOCATION_FIELDS}
+        for field in ("latitude", "longitude"):
+            if location[field] is not None:
+                location[field] = float(location[field])
+        encoded = json.dumps(location, ensure_ascii=False, separators=(",", ":"))
+        index = locations.setdefault(encoded, len(locations))
+        ranges.append(
+            (parse_ip_bound(row["ip_from"]), parse_ip_bound(row["ip_to"]), index)
+        )
+    ranges.sort()
+
+    output.write(GEOIP_HEADER.pack(GEOIP_TABLE_MAGIC, len(ranges), len(locations)))
+    for start, end, index in ranges:
+        output.write(GEOIP_RANGE.pack(start, end, index))
+
+    offset = 0
+    payloads = [location.encode() for location in locations]
+    for payload in payloads:
+        output.write(GEOIP_OFFSET.pack(offset))
+        offset += len(payload)
+    output.write(GEOIP_OFFSET.pack(offset))
+    for payload in payloads:
+        output.write(payload)
+    return len(ranges)
+
+
+def build_geoip_table_from_csv(csv_path: str, output_path: str) -> int:
+    with open(csv_path, newline="", encoding="utf-8") as source:
+        with open(output_path, "wb") as output:
+            return build_geoip_table(csv.DictReader(source), output)
+
+
+class GeoIPTable:
+    """
+    Sorted IP range table memory-mapped read-only, so every worker process
+    shares the same page cache instead of loading its own copy. Lookups bisect
+    directly over the fixed-width range records.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.range_count, self.location_count = GEOIP_HEADER.unpack_from(
+            self.buffer, 0
+        )
+        if magic != GEOIP_TABLE_MAGIC:
+            raise ValueError(f"{path} is not a geoip table")
+
+        self.ranges_offset = GEOIP_HEADER.size
+        self.offsets_offset = self.ranges_offset + self.range_count * GEOIP_RANGE.size
+        self.pool_offset = (
+            self.offsets_offset + (self.location_count + 1) * GEOIP_OFFSET.size
+        )
+
+    def __len__(self) -> int:
+        return self.range_count
+
+    def __getitem__(self, index: int) -> bytes:
+        # Sequence of range start keys, which is all `bisect` needs
+        start = self.ranges_offset + index * GEOIP_RANGE.size
+        return self.buffer[start : start + 16]
+
+    def get_location(self, index: int) -> dict:
+        position = self.offsets_offset + index * GEOIP_OFFSET.size
+        (start,) = GEOIP_OFFSET.unpack_from(self.buffer, position)
+        (end,) = GEOIP_OFFSET.unpack_from(self.buffer, position + GEOIP_OFFSET.size)
+        return json.loads(
+            self.buffer[self.pool_offset + start : self.pool_offset + end]
+        )
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        key = ip_to_key(ip)
+        index = bisect_right(self, key) - 1
+        if index < 0:
+            return None
+        _, end, location_index = GEOIP_RANGE.unpack_from(
+            self.buffer, self.ranges_offset + index * GEOIP_RANGE.size
+        )
+        if key > end:
+            return None
+        return self.get_location(location_index)
+
+
+class LocalGeoLocationProvider:
+    def __init__(self, path: str):
+        self.table = GeoIPTable(path)
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        location = self.table.lookup(ip)
+        if not location:
+            return None
+        return {"ip_address": ip, **location}
+
+
+class GeoLocationUnavailable(Exception):
+    """
+    A provider could not be reached (timeout, HTTP error); unlike a miss, the
+    lookup may succeed later and must not be cached.
+    """
+
+
+class HTTPGeoLocationProvider:
+    def lookup(self, ip: str) -> Optional[dict]:
+        try:
+            res = requests.get(
+                f"http://ip-api.com/json/{ip}",
+                timeout=2,
+            )
+            res.raise_for_status()
+            data = res.json()
+        except (requests.RequestException, ValueError) as exc:
+            raise GeoLocationUnavailable(ip) from exc
+
+        if data.get("status") != "success":
+            return None
+        return {
+            "ip_address": ip,
+            "isp": data.get("isp"),
+            "organization": data.get("org"),
+            "asn": data.get("as"),
+            "country": data.get("country"),
+            "country_code": data.get("countryCode"),
+            "region": data.get("region"),
+            "region_name": data.get("regionName"),
+            "city": data.get("city"),
+            "zip_code": data.get("zip"),
+            "latitude": data.get("lat"),
+            "longitude": data.get("lon"),
+            "timezone": data.get("timezone"),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_geolocation_providers() -> list:
+    """
+    Providers tried in order: the local table when `GEOIP_TABLE_PATH` is set,
+    then ip-api.com unless `GEOIP_HTTP_FALLBACK` is off.
+    """
+    providers = []
+    if settings.GEOIP_TABLE_PATH:
+        providers.append(LocalGeoLocationProvider(settings.GEOIP_TABLE_PATH))
+    if settings.GEOIP_HTTP_FALLBACK:
+        providers.append(HTTPGeoLocationProvider())
+    return providers
+
+
+@lru_cache(maxsize=4096)
+def get_cached_ip_location(ip: str) -> Optional[dict]:
+    """
+    Locations and definite misses are cached; `GeoLocationUnavailable` from a
+    provider propagates, and `lru_cache` does not cache exceptions, so the IP
+    is looked up again next time.
+    """
+    try:
+        address = ipaddress.ip_address(ip.strip())
+    except ValueError:
+        return None
+    if not address.is_global:
+        return None
+
+    for provider in get_geolocation_providers():
+        location = provider.lookup(str(address))
+        if location:
+            return location
+    return None
+
+
+def lookup_ip_location(ip: str) -> Optional[dict]:
+    try:
+        return get_cached_ip_location(ip)
+    except GeoLocationUnavailable:
+        return None
@@ -0,0 +1,72 @@
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.utils import timezone
+
+from product.caching import build_verify_product_card_cache_key
+from product.models import Brand, Product
+from product.utils import (
+    VERIFY_PRODUCT_CARD_TEMPLATE,
+    VERIFY_QR_TEMPLATE,
+    get_compiled_template,
+    render_verify_page,
+)
+
+
+class Command(BaseCommand):
+    help = "Measure the per-scan cost of rendering the QR verification page."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        product = Product(
+            uid=uuid4(),
+            name="Sản phẩm mẫu",
+            code="BENCH",
+            description="Mô tả sản phẩm " * 10,
+            brand=Brand(name="Thương hiệu"),
+            updated_at=timezone.now(),
+        )
+        product.image = "https://example.com/image.png"
+        result = {
+            "status": "AUTHENTIC",
+            "message": "Sản phẩm chính hãng.",
+            "product": product,
+            "scan_count": 1,
+        }
+
+        def parse_every_time():
+            context = dict(result)
+            context["product_card"] = Template(VERIFY_PRODUCT_CARD_TEMPLATE).render(
+                Context({"product": product})
+            )
+            Template(VERIFY_QR_TEMPLATE).render(Context(context))
+
+        def compiled_without_cache():
+            context = dict(result)
+            context["product_card"] = get_compiled_template(
+                VERIFY_PRODUCT_CARD_TEMPLATE
+            ).render(Context({"product": product}))
+            get_compiled_template(VERIFY_QR_TEMPLATE).render(Context(context))
+
+        def compiled_with_fragment_cache():
+            render_verify_page(result)
+
+        cache.delete(build_verify_product_card_cache_key(product))
+        for label, render in [
+            ("parse per scan", parse_every_time),
+            ("compiled template", compiled_without_cache),
+            ("compiled + card cache", compiled_with_fragment_cache),
+        ]:
+            render()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                render()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{label:<24} {elapsed / iterations * 1e6:10.1f} us/scan")
+        cache.delete(build_verify_product_card_cache_key(product))
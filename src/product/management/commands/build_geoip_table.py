@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from product.geolocation import GEOIP_LOCATION_FIELDS, build_geoip_table_from_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the binary IP range table used for offline geolocation from a CSV "
+        f"with columns ip_from, ip_to, {', '.join(GEOIP_LOCATION_FIELDS)}. "
+        "Bounds may be IPv4/IPv6 addresses or integers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path")
+        parser.add_argument("output_path")
+
+    def handle(self, *args, **options):
+        count = build_geoip_table_from_csv(options["csv_path"], options["output_path"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {count} ranges to {options['output_path']}")
+        )
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from product.models import RATING_AGGREGATE_FIELDS, Product, Review
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized rating counters on Product from Review."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        product_uids = Product.objects.order_by("pk").values_list("pk", flat=True)
+
+        updated = 0
+        batch = []
+        for uid in product_uids.iterator(chunk_size=batch_size):
+            batch.append(uid)
+            if len(batch) >= batch_size:
+                updated += self.rebuild(batch)
+                batch = []
+        if batch:
+            updated += self.rebuild(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings for {updated} products"))
+
+    @transaction.atomic
+    def rebuild(self, product_uids: list) -> int:
+        # Lock before counting: a review committed after the count would
+        # otherwise have its `apply_rating` increment overwritten. Reviews
+        # committed once the lock is held only add to the rebuilt totals.
+        products = list(
+            Product.objects.select_for_update()
+            .filter(pk__in=product_uids)
+            .order_by("pk")
+        )
+        rows = (
+            Review.objects.filter(product_id__in=product_uids)
+            .values("product_id")
+            .annotate(
+                review_count=Count("uid"),
+                rating_sum=Sum("rating"),
+                **{
+                    f"rating_{star}_count": Count("uid", filter=Q(rating=star))
+                    for star in range(1, 6)
+                },
+            )
+        )
+        aggregates = {row.pop("product_id"): row for row in rows}
+
+        for product in products:
+            row = aggregates.get(product.pk, {})
+            for field in RATING_AGGREGATE_FIELDS:
+                setattr(product, field, row.get(field) or 0)
+
+        Product.objects.bulk_update(products, RATING_AGGREGATE_FIELDS)
+        return len(products)
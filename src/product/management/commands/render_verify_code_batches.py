@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from product.services.verify_code import VerifyCodeService
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the PDF of every pending verify code batch, and of batches whose "
+        "rendering worker died (lease expired), e.g. after a web process restart."
+    )
+
+    def handle(self, *args, **options):
+        service = VerifyCodeService()
+        rendered = 0
+        for uid in service.orm.get_pending_verify_code_batch_uids():
+            try:
+                if service.render_verify_code_batch(uid=uid):
+                    rendered += 1
+            except Exception as exc:
+                self.stderr.write(f"Batch {uid} failed: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} batches"))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from product.services.analytics import ScanAnalyticsService
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold new verify code scans into the daily / hourly scan rollups, flag "
+        "cloned codes and prune raw scans past the retention period. Meant to "
+        "run every few minutes from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=settings.SCAN_RAW_RETENTION_DAYS,
+            help="Keep raw scans this many days; 0 keeps them forever",
+        )
+
+    def handle(self, *args, **options):
+        service = ScanAnalyticsService()
+        scan_count = service.rollup_scans()
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {scan_count} scans"))
+
+        if options["retention_days"] > 0:
+            deleted = service.prune_raw_scans(retention_days=options["retention_days"])
+            self.stdout.write(f"Pruned {deleted} raw scans")
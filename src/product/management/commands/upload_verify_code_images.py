@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from product.services.verify_code import VerifyCodeService
+
+
+class Command(BaseCommand):
+    help = "Upload QR images to Cloudinary for verify codes that have none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        uploaded = VerifyCodeService().upload_pending_qr_images(
+            batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Uploaded {uploaded} QR images"))
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def get_search_indexes():
+    # Same expressions as `product.search`, so the planner matches them
+    return [
+        django.contrib.postgres.indexes.GinIndex(
+            django.contrib.postgres.indexes.OpClass(
+                django.db.models.functions.text.Upper(
+                    django.db.models.functions.comparison.Cast(
+                        "name", output_field=models.TextField()
+                    )
+                ),
+                name="gin_trgm_ops",
+            ),
+            name="product_name_trgm_idx",
+        ),
+        django.contrib.postgres.indexes.GinIndex(
+            django.contrib.postgres.indexes.OpClass(
+                django.db.models.functions.text.Upper(
+                    django.db.models.functions.comparison.Cast(
+                        "code", output_field=models.TextField()
+                    )
+                ),
+                name="gin_trgm_ops",
+            ),
+            name="product_code_trgm_idx",
+        ),
+        django.contrib.postgres.indexes.GinIndex(
+            django.contrib.postgres.search.SearchVector(
+                "name", "code", config="simple"
+            ),
+            name="product_search_vector_idx",
+        ),
+    ]
+
+
+def add_search_indexes(apps, schema_editor):
+    """
+    `pg_trgm` and the GIN indexes only exist on PostgreSQL; other databases use
+    the `icontains` fallback of `search_products` and get none.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Product = apps.get_model("product", "Product")
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index in get_search_indexes():
+        schema_editor.add_index(Product, index)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Product = apps.get_model("product", "Product")
+    for index in get_search_indexes():
+        schema_editor.remove_index(Product, index)
+    schema_editor.execute("DROP EXTENSION IF EXISTS pg_trgm")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
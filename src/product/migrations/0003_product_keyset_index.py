@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0002_product_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["sale_price", "uid"], name="product_pro_sale_pr_233e59_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0003_product_keyset_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["product", "created_at", "uid"],
+                name="product_rev_product_9b62b0_idx",
+            ),
+        ),
+    ]
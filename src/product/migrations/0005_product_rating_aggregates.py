@@ -0,0 +1,74 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model("product", "Product")
+    Review = apps.get_model("product", "Review")
+
+    def aggregate(expression):
+        reviews = (
+            Review.objects.filter(product=OuterRef("pk"))
+            .order_by()
+            .values("product")
+            .annotate(value=expression)
+            .values("value")
+        )
+        return Coalesce(Subquery(reviews, output_field=IntegerField()), 0)
+
+    Product.objects.update(
+        review_count=aggregate(Count("uid")),
+        rating_sum=aggregate(Sum("rating")),
+        **{
+            f"rating_{star}_count": aggregate(Count("uid", filter=Q(rating=star)))
+            for star in range(1, 6)
+        },
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0004_review_product_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_1_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_2_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_3_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_4_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_5_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,219 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:49
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0006_verify_code_batch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductScanDaily",
+            fields=[
+                (
+                    "uid",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("scan_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductScanLocationDaily",
+            fields=[
+                (
+                    "uid",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "country_code",
+                    models.CharField(blank=True, default="", max_length=10),
+                ),
+                ("country", models.CharField(blank=True, default="", max_length=100)),
+                ("city", models.CharField(blank=True, default="", max_length=100)),
+                ("scan_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ScanRollupCheckpoint",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=50, primary_key=True, serialize=False),
+                ),
+                ("rolled_up_until", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="VerifyCodeCloneAlert",
+            fields=[
+                (
+                    "uid",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("distance_km", models.FloatField()),
+                (
+                    "first_city",
+                    models.CharField(blank=True, default="", max_length=100),
+                ),
+                (
+                    "first_country_code",
+                    models.CharField(blank=True, default="", max_length=10),
+                ),
+                ("first_seen_at", models.DateTimeField()),
+                (
+                    "second_city",
+                    models.CharField(blank=True, default="", max_length=100),
+                ),
+                (
+                    "second_country_code",
+                    models.CharField(blank=True, default="", max_length=10),
+                ),
+                ("second_seen_at", models.DateTimeField()),
+                ("detected_at", models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                "ordering": ["-detected_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="VerifyCodeScanHourly",
+            fields=[
+                (
+                    "uid",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("hour", models.DateTimeField()),
+                (
+                    "country_code",
+                    models.CharField(blank=True, default="", max_length=10),
+                ),
+                ("city", models.CharField(blank=True, default="", max_length=100)),
+                (
+                    "latitude",
+                    models.DecimalField(
+                        blank=True, decimal_places=6, max_digits=9, null=True
+                    ),
+                ),
+                (
+                    "longitude",
+                    models.DecimalField(
+                        blank=True, decimal_places=6, max_digits=9, null=True
+                    ),
+                ),
+                ("scan_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="verifierlocation",
+            index=models.Index(
+                fields=["scanned_at"], name="product_ver_scanned_c7a6f3_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="productscandaily",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="scan_daily",
+                to="product.product",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productscanlocationdaily",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="scan_location_daily",
+                to="product.product",
+            ),
+        ),
+        migrations.AddField(
+            model_name="verifycodeclonealert",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="clone_alerts",
+                to="product.product",
+            ),
+        ),
+        migrations.AddField(
+            model_name="verifycodeclonealert",
+            name="verify_code",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="clone_alert",
+                to="product.verifycode",
+            ),
+        ),
+        migrations.AddField(
+            model_name="verifycodescanhourly",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="code_scan_hourly",
+                to="product.product",
+            ),
+        ),
+        migrations.AddField(
+            model_name="verifycodescanhourly",
+            name="verify_code",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="scan_hourly",
+                to="product.verifycode",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="productscandaily",
+            constraint=models.UniqueConstraint(
+                fields=("product", "date"), name="unique_product_scan_daily"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="productscanlocationdaily",
+            constraint=models.UniqueConstraint(
+                fields=("product", "date", "country_code", "city"),
+                name="unique_product_scan_location_daily",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="verifycodescanhourly",
+            index=models.Index(
+                fields=["verify_code", "hour"], name="product_ver_verify__8f0a39_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="verifycodescanhourly",
+            constraint=models.UniqueConstraint(
+                fields=("verify_code", "hour", "country_code", "city"),
+                name="unique_verify_code_scan_hourly",
+            ),
+        ),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:50
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def merge_scan_rollups(apps, keep, duplicate_uids):
+    """
+    Fold the hourly scan rollups and clone alerts of the duplicates into
+    `keep`, instead of letting the delete cascade to them.
+    """
+    VerifyCodeScanHourly = apps.get_model("product", "VerifyCodeScanHourly")
+    VerifyCodeCloneAlert = apps.get_model("product", "VerifyCodeCloneAlert")
+
+    kept_rollups = {
+        (rollup.hour, rollup.country_code, rollup.city): rollup
+        for rollup in VerifyCodeScanHourly.objects.filter(verify_code_id=keep.uid)
+    }
+    for rollup in VerifyCodeScanHourly.objects.filter(
+        verify_code_id__in=duplicate_uids
+    ).order_by("hour", "uid"):
+        bucket = (rollup.hour, rollup.country_code, rollup.city)
+        kept = kept_rollups.get(bucket)
+        if kept:
+            VerifyCodeScanHourly.objects.filter(uid=kept.uid).update(
+                scan_count=F("scan_count") + rollup.scan_count
+            )
+            rollup.delete()
+        else:
+            rollup.verify_code_id = keep.uid
+            rollup.save(update_fields=["verify_code"])
+            kept_rollups[bucket] = rollup
+
+    # One alert per code: the kept code's own, else the latest duplicate's
+    if not VerifyCodeCloneAlert.objects.filter(verify_code_id=keep.uid).exists():
+        alert = (
+            VerifyCodeCloneAlert.objects.filter(verify_code_id__in=duplicate_uids)
+            .order_by("-detected_at")
+            .first()
+        )
+        if alert:
+            VerifyCodeCloneAlert.objects.filter(uid=alert.uid).update(
+                verify_code_id=keep.uid
+            )
+
+
+def deduplicate_verify_codes(apps, schema_editor):
+    """
+    Keep the oldest row of every duplicated code. Its scans and scan rollups
+    absorb those of the duplicates, which are then deleted.
+    """
+    VerifyCode = apps.get_model("product", "VerifyCode")
+    VerifierLocation = apps.get_model("product", "VerifierLocation")
+
+    duplicated_codes = (
+        VerifyCode.objects.order_by()
+        .values("code")
+        .annotate(total=Count("uid"))
+        .filter(total__gt=1)
+        .values_list("code", flat=True)
+    )
+    for code in list(duplicated_codes):
+        keep, *duplicates = VerifyCode.objects.filter(code=code).order_by(
+            "created_at", "uid"
+        )
+        duplicate_uids = [verify_code.uid for verify_code in duplicates]
+
+        VerifierLocation.objects.filter(verify_code_id__in=duplicate_uids).update(
+            verify_code_id=keep.uid
+        )
+        merge_scan_rollups(apps, keep, duplicate_uids)
+        keep.scan_count = max(v.scan_count for v in [keep, *duplicates])
+        keep.max_scan = max(v.max_scan for v in [keep, *duplicates])
+        keep.save(update_fields=["scan_count", "max_scan"])
+        VerifyCode.objects.filter(uid__in=duplicate_uids).delete()
+
+
+def get_code_fields(apps):
+    VerifyCode = apps.get_model("product", "VerifyCode")
+    old_field = VerifyCode._meta.get_field("code")
+    new_field = models.CharField(max_length=255, unique=True)
+    new_field.set_attributes_from_name("code")
+    new_field.model = VerifyCode
+    return VerifyCode, old_field, new_field
+
+
+def add_unique_code_index(apps, schema_editor):
+    """
+    On PostgreSQL, build the unique (and `LIKE`) index of `code` concurrently so
+    the table stays writable, then attach it as the constraint Django would
+    have created. Other backends just alter the field.
+    """
+    VerifyCode, old_field, new_field = get_code_fields(apps)
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.alter_field(VerifyCode, old_field, new_field)
+        return
+
+    table = VerifyCode._meta.db_table
+    quote = schema_editor.quote_name
+    unique_name = schema_editor._create_index_name(table, ["code"], suffix="_uniq")
+    like_name = schema_editor._create_index_name(table, ["code"], suffix="_like")
+    # An interrupted concurrent build leaves an invalid index behind; a rerun
+    # drops it, unless the constraint was already attached
+    if not schema_editor._constraint_names(VerifyCode, ["code"], unique=True):
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(unique_name)}")
+        schema_editor.execute(
+            f"CREATE UNIQUE INDEX CONCURRENTLY {quote(unique_name)} "
+            f"ON {quote(table)} ({quote('code')})"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(unique_name)} "
+            f"UNIQUE USING INDEX {quote(unique_name)}"
+        )
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(like_name)}")
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY {quote(like_name)} "
+        f"ON {quote(table)} ({quote('code')} varchar_pattern_ops)"
+    )
+
+
+def remove_unique_code_index(apps, schema_editor):
+    VerifyCode, old_field, new_field = get_code_fields(apps)
+    schema_editor.alter_field(VerifyCode, new_field, old_field)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("product", "0007_scan_rollups"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            deduplicate_verify_codes, migrations.RunPython.noop, atomic=True
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="verifycode",
+                    name="code",
+                    field=models.CharField(max_length=255, unique=True),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_unique_code_index, remove_unique_code_index),
+            ],
+        ),
+    ]
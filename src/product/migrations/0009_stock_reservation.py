@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0008_unique_verify_code"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="stock_reservation_enabled",
+            field=models.BooleanField(default=False),
+        ),
+    ]
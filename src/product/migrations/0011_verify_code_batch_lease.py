@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0010_stock_buckets"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="verifycodebatch",
+            name="lease_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
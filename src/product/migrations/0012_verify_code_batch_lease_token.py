@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0011_verify_code_batch_lease"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="verifycodebatch",
+            name="lease_token",
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:39
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_located_count(apps, schema_editor):
+    # Best guess for existing rows: every scan of a located row had coordinates
+    VerifyCodeScanHourly = apps.get_model("product", "VerifyCodeScanHourly")
+    VerifyCodeScanHourly.objects.filter(latitude__isnull=False).update(
+        located_count=F("scan_count")
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0012_verify_code_batch_lease_token"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="verifycodescanhourly",
+            name="located_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_located_count, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from enum import unique
 from uuid import uuid4
 
 from django.db import models
@@ -20,6 +21,17 @@ class Brand(models.Model):
         return self.name
 
 
+RATING_AGGREGATE_FIELDS = [
+    "review_count",
+    "rating_sum",
+    "rating_1_count",
+    "rating_2_count",
+    "rating_3_count",
+    "rating_4_count",
+    "rating_5_count",
+]
+
+
 class Product(models.Model):
     uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     code = models.CharField(max_length=50, unique=True, db_index=True)
@@ -31,16 +43,62 @@ class Product(models.Model):
     quantity_in_stock = models.PositiveIntegerField(null=False, blank=False)
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name="products")
     is_deleted = models.BooleanField(default=False)
+    # Flash-sale products: checkout reserves their stock in Redis instead of
+    # locking the row (see `order.reservation`)
+    stock_reservation_enabled = models.BooleanField(default=False)
+    # Hot products: stock split across this many `ProductStockBucket` rows so
+    # concurrent checkouts update different rows. 0 keeps it on this row; when
+    # bucketed, `quantity_in_stock` is only the total as last set by an admin
+    stock_bucket_count = models.PositiveSmallIntegerField(default=0)
+    # Denormalized from Review, kept in sync by ReviewORM and
+    # `manage.py rebuild_rating_aggregates`
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
-        indexes = [models.Index(fields=["code"]), models.Index(fields=["name"])]
+        indexes = [
+            models.Index(fields=["code"]),
+            models.Index(fields=["name"]),
+            models.Index(fields=["sale_price", "uid"]),
+            # Search GIN indexes are PostgreSQL-only and live in migration 0002
+        ]
 
     def __str__(self) -> str:
         return f"{self.code} - {self.name}"
 
+    @property
+    def average_rating(self) -> float:
+        if not self.review_count:
+            return 0.0
+        return round(self.rating_sum / self.review_count, 2)
+
+
+class ProductStockBucket(models.Model):
+    uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    product = models.ForeignKey(
+        to=Product, on_delete=models.CASCADE, related_name="stock_buckets"
+    )
+    index = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "index"], name="unique_product_stock_bucket"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product_id} #{self.index}: {self.quantity}"
+
 
 class ProductImage(models.Model):
     uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
@@ -70,9 +128,59 @@ class ProductImage(models.Model):
         return f"{self.product.name} - {self.attachment.uid}"
 
 
+@unique
+class VerifyCodeBatchStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    RENDERING = "RENDERING", "Rendering"
+    DONE = "DONE", "Done"
+    FAILED = "FAILED", "Failed"
+
+
+class VerifyCodeBatch(models.Model):
+    uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    product = models.ForeignKey(
+        to=Product,
+        on_delete=models.CASCADE,
+        related_name="verify_code_batches",
+        db_index=True,
+    )
+    created_by = models.ForeignKey(
+        to=User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="verify_code_batches",
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(
+        max_length=20,
+        choices=VerifyCodeBatchStatus,
+        default=VerifyCodeBatchStatus.PENDING,
+        db_index=True,
+    )
+    rendered_count = models.PositiveIntegerField(default=0)
+    file_path = models.CharField(max_length=255, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    print_count = models.PositiveIntegerField(default=0)
+    # Renewed by the rendering worker after every page; a RENDERING batch past
+    # it was abandoned and may be claimed again
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    # Set by every claim; the worker's writes only apply while it still matches
+    lease_token = models.UUIDField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"VerifyCodeBatch {self.uid} ({self.quantity}) for {self.product.name}"
+
+
 class VerifyCode(models.Model):
     uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
-    code = models.CharField(max_length=255, null=False, blank=False)
+    code = models.CharField(max_length=255, unique=True, null=False, blank=False)
     max_scan = models.IntegerField(null=False, blank=False, default=3)
     scan_count = models.IntegerField(null=False, blank=False, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -91,6 +199,13 @@ class VerifyCode(models.Model):
         blank=True,
         related_name="verify_code",
     )
+    batch = models.ForeignKey(
+        to=VerifyCodeBatch,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="verify_codes",
+    )
 
     def __str__(self):
         return f"VerifyCode {self.code} for Product {self.product.name}"
@@ -130,6 +245,108 @@ class VerifierLocation(models.Model):
 
     class Meta:
         ordering = ["-scanned_at"]
+        # Range scans of the scan rollup job
+        indexes = [models.Index(fields=["scanned_at"])]
+
+
+class ScanRollupCheckpoint(models.Model):
+    """
+    High-water mark of `VerifierLocation.scanned_at` already folded into the
+    scan rollups. The single row is also locked to serialize rollup runs.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    rolled_up_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ProductScanDaily(models.Model):
+    uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    product = models.ForeignKey(
+        to=Product, on_delete=models.CASCADE, related_name="scan_daily"
+    )
+    date = models.DateField()
+    scan_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "date"], name="unique_product_scan_daily"
+            )
+        ]
+
+
+class ProductScanLocationDaily(models.Model):
+    uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    product = models.ForeignKey(
+        to=Product, on_delete=models.CASCADE, related_name="scan_location_daily"
+    )
+    date = models.DateField()
+    # Empty strings rather than NULL so unknown locations share one row
+    country_code = models.CharField(max_length=10, blank=True, default="")
+    country = models.CharField(max_length=100, blank=True, default="")
+    city = models.CharField(max_length=100, blank=True, default="")
+    scan_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "date", "country_code", "city"],
+                name="unique_product_scan_location_daily",
+            )
+        ]
+
+
+class VerifyCodeScanHourly(models.Model):
+    uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    verify_code = models.ForeignKey(
+        to=VerifyCode, on_delete=models.CASCADE, related_name="scan_hourly"
+    )
+    product = models.ForeignKey(
+        to=Product, on_delete=models.CASCADE, related_name="code_scan_hourly"
+    )
+    hour = models.DateTimeField()
+    country_code = models.CharField(max_length=10, blank=True, default="")
+    city = models.CharField(max_length=100, blank=True, default="")
+    latitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True
+    )
+    longitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True
+    )
+    scan_count = models.PositiveIntegerField(default=0)
+    # Scans with coordinates, i.e. the weight of `latitude` / `longitude`
+    located_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["verify_code", "hour", "country_code", "city"],
+                name="unique_verify_code_scan_hourly",
+            )
+        ]
+        indexes = [models.Index(fields=["verify_code", "hour"])]
+
+
+class VerifyCodeCloneAlert(models.Model):
+    uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    verify_code = models.OneToOneField(
+        to=VerifyCode, on_delete=models.CASCADE, related_name="clone_alert"
+    )
+    product = models.ForeignKey(
+        to=Product, on_delete=models.CASCADE, related_name="clone_alerts"
+    )
+    distance_km = models.FloatField()
+    first_city = models.CharField(max_length=100, blank=True, default="")
+    first_country_code = models.CharField(max_length=10, blank=True, default="")
+    first_seen_at = models.DateTimeField()
+    second_city = models.CharField(max_length=100, blank=True, default="")
+    second_country_code = models.CharField(max_length=10, blank=True, default="")
+    second_seen_at = models.DateTimeField()
+    detected_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        ordering = ["-detected_at"]
 
 
 class Review(models.Model):
@@ -164,6 +381,7 @@ class Review(models.Model):
             )
         ]
         unique_together = ("product", "user")
+        indexes = [models.Index(fields=["product", "created_at", "uid"])]
 
 
 class ReviewAttachment(models.Model):
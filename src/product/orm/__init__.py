@@ -1,8 +1,10 @@
 from .product import ProductORM
 from .verify_code import VerifyCodeORM
+from .analytics import ScanAnalyticsORM
+from .stock import ProductStockORM
 
 
 # from .review import ReviewORM
 
 
-__all__ = ["ProductORM", "VerifyCodeORM"]
+__all__ = ["ProductORM", "VerifyCodeORM", "ScanAnalyticsORM", "ProductStockORM"]
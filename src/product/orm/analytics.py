@@ -0,0 +1,181 @@
+from datetime import date, datetime
+from typing import Optional
+from uuid import UUID
+
+from django.db.models import Avg, Count, F, Max, Min, Model, Sum
+from django.db.models.functions import TruncDate, TruncHour
+
+from product.models import (
+    ProductScanDaily,
+    ProductScanLocationDaily,
+    ScanRollupCheckpoint,
+    VerifierLocation,
+    VerifyCodeCloneAlert,
+    VerifyCodeScanHourly,
+)
+
+
+class ScanAnalyticsORM:
+    @staticmethod
+    def lock_checkpoint(name: str) -> ScanRollupCheckpoint:
+        ScanRollupCheckpoint.objects.get_or_create(name=name)
+        return ScanRollupCheckpoint.objects.select_for_update().get(name=name)
+
+    @staticmethod
+    def get_checkpoint(name: str) -> Optional[ScanRollupCheckpoint]:
+        return ScanRollupCheckpoint.objects.filter(name=name).first()
+
+    @staticmethod
+    def get_first_scan_time() -> Optional[datetime]:
+        return VerifierLocation.objects.aggregate(first=Min("scanned_at"))["first"]
+
+    @staticmethod
+    def get_scans_between(start: datetime, end: datetime):
+        return VerifierLocation.objects.filter(
+            scanned_at__gte=start, scanned_at__lt=end
+        ).order_by()
+
+    @staticmethod
+    def aggregate_product_daily(start: datetime, end: datetime) -> list[dict]:
+        return list(
+            ScanAnalyticsORM.get_scans_between(start, end)
+            .values(
+                product_id=F("verify_code__product_id"),
+                date=TruncDate("scanned_at"),
+            )
+            .annotate(scan_count=Count("uid"))
+        )
+
+    @staticmethod
+    def aggregate_product_location_daily(start: datetime, end: datetime) -> list[dict]:
+        return list(
+            ScanAnalyticsORM.get_scans_between(start, end)
+            .values(
+                "country_code",
+                "city",
+                product_id=F("verify_code__product_id"),
+                date=TruncDate("scanned_at"),
+            )
+            .annotate(scan_count=Count("uid"), country_name=Max("country"))
+        )
+
+    @staticmethod
+    def aggregate_verify_code_hourly(start: datetime, end: datetime) -> list[dict]:
+        return list(
+            ScanAnalyticsORM.get_scans_between(start, end)
+            .values(
+                "verify_code_id",
+                "country_code",
+                "city",
+                product_id=F("verify_code__product_id"),
+                hour=TruncHour("scanned_at"),
+            )
+            .annotate(
+                scan_count=Count("uid"),
+                located_count=Count("latitude"),
+                average_latitude=Avg("latitude"),
+                average_longitude=Avg("longitude"),
+            )
+        )
+
+    @staticmethod
+    def get_rollup_rows(model: type[Model], **filters) -> list[Model]:
+        return list(model.objects.filter(**filters))
+
+    @staticmethod
+    def save_rollup_rows(
+        model: type[Model],
+        created: list[Model],
+        updated: list[Model],
+        fields: list[str],
+    ) -> None:
+        if updated:
+            model.objects.bulk_update(updated, fields=fields, batch_size=1000)
+        if created:
+            model.objects.bulk_create(created, batch_size=1000)
+
+    @staticmethod
+    def get_located_code_scans(verify_code_uids: list[UUID], since: datetime):
+        return (
+            VerifyCodeScanHourly.objects.filter(
+                verify_code_id__in=verify_code_uids,
+                hour__gte=since,
+                latitude__isnull=False,
+                longitude__isnull=False,
+            )
+            .order_by("verify_code_id", "hour")
+            .values(
+                "verify_code_id",
+                "product_id",
+                "hour",
+                "country_code",
+                "city",
+                "latitude",
+                "longitude",
+            )
+        )
+
+    @staticmethod
+    def save_clone_alert(verify_code_uid: UUID, **alert_info) -> VerifyCodeCloneAlert:
+        alert, _ = VerifyCodeCloneAlert.objects.update_or_create(
+            verify_code_id=verify_code_uid, defaults=alert_info
+        )
+        return alert
+
+    @staticmethod
+    def delete_scans_before(before: datetime, batch_size: int) -> int:
+        deleted = 0
+        while True:
+            uids = list(
+                VerifierLocation.objects.filter(scanned_at__lt=before)
+                .order_by()
+                .values_list("uid", flat=True)[:batch_size]
+            )
+            if not uids:
+                return deleted
+            deleted += VerifierLocation.objects.filter(uid__in=uids).delete()[0]
+
+    @staticmethod
+    def get_product_daily_scans(
+        product_uid: UUID, start_date: Optional[date], end_date: Optional[date]
+    ):
+        return ProductScanDaily.objects.filter(
+            product_id=product_uid,
+            **ScanAnalyticsORM.date_range(start_date, end_date),
+        ).order_by("date")
+
+    @staticmethod
+    def get_product_location_scans(
+        product_uid: UUID, start_date: Optional[date], end_date: Optional[date]
+    ):
+        return (
+            ProductScanLocationDaily.objects.filter(
+                product_id=product_uid,
+                **ScanAnalyticsORM.date_range(start_date, end_date),
+            )
+            .values("country_code", "city")
+            .annotate(country=Max("country"), scan_count=Sum("scan_count"))
+            .order_by("-scan_count", "country_code", "city")
+        )
+
+    @staticmethod
+    def get_verify_code_hourly_scans(code: str):
+        return VerifyCodeScanHourly.objects.filter(verify_code__code=code).order_by(
+            "-hour"
+        )
+
+    @staticmethod
+    def get_clone_alerts(product_uid: Optional[UUID] = None):
+        alerts = VerifyCodeCloneAlert.objects.select_related("verify_code")
+        if product_uid:
+            alerts = alerts.filter(product_id=product_uid)
+        return alerts
+
+    @staticmethod
+    def date_range(start_date: Optional[date], end_date: Optional[date]) -> dict:
+        filters = {}
+        if start_date:
+            filters["date__gte"] = start_date
+        if end_date:
+            filters["date__lte"] = end_date
+        return filters
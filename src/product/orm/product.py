@@ -2,14 +2,33 @@ from typing import List, Optional
 from uuid import UUID
 
 from django.db import transaction
-from django.db.models import Prefetch, Q, QuerySet
+from django.db.models import (
+    Case,
+    F,
+    FloatField,
+    OuterRef,
+    Prefetch,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
 
 from account.models import User
-from attachment.models import Attachment
-from product.models import Brand, Product, ProductImage, Review, ReviewAttachment
+from product.models import (
+    Brand,
+    Product,
+    ProductImage,
+    ProductStockBucket,
+    Review,
+    ReviewAttachment,
+)
 from product.schemas import (
     SearchFilterSortSchema,
 )
+from product.search import search_products
 
 
 class ProductORM:
@@ -26,11 +45,6 @@ class ProductORM:
     def get_products(payload: SearchFilterSortSchema) -> QuerySet[Product]:
         query = Q(is_deleted=False)
 
-        if payload.search:
-            query &= Q(name__icontains=payload.search) | Q(
-                code__icontains=payload.search
-            )
-
         if payload.brand:
             query &= Q(brand__name=payload.brand)
 
@@ -40,12 +54,28 @@ class ProductORM:
         if payload.max_price is not None:
             query &= Q(sale_price__lte=payload.max_price)
 
-        sort_order = "" if payload.sort == "asc" else "-"
-        order_by_field = f"{sort_order}sale_price"
+        products = Product.objects.filter(query)
+        search = (payload.search or "").strip()
+        if search:
+            products = search_products(products, search=search)
+
+        if payload.sort == "relevance" and search:
+            order_by_fields = ["-rank", "sale_price"]
+        elif payload.sort == "rating":
+            products = products.annotate(
+                rating_average=Coalesce(
+                    Cast("rating_sum", FloatField())
+                    / NullIf(Cast("review_count", FloatField()), 0.0),
+                    0.0,
+                )
+            )
+            order_by_fields = ["-rating_average", "-review_count"]
+        else:
+            sort_order = "-" if payload.sort == "desc" else ""
+            order_by_fields = [f"{sort_order}sale_price"]
 
         return (
-            Product.objects.filter(query)
-            .select_related("brand")
+            products.select_related("brand")
             .prefetch_related(
                 Prefetch(
                     "product_images",
@@ -55,11 +85,28 @@ class ProductORM:
                     to_attr="images",
                 )
             )
-            .order_by(order_by_field)
+            .order_by(*order_by_fields)
         )
 
     @staticmethod
     def get_product_by_uid(uid: UUID) -> Optional[Product]:
+        return (
+            Product.objects.filter(uid=uid)
+            .select_related("brand")
+            .prefetch_related(
+                Prefetch(
+                    "product_images",
+                    queryset=ProductImage.objects.select_related("attachment").order_by(
+                        "sort_order", "created_at"
+                    ),
+                    to_attr="images",
+                )
+            )
+            .first()
+        )
+
+    @staticmethod
+    def get_product_detail(uid: UUID, review_limit: int) -> Optional[Product]:
         return (
             Product.objects.filter(uid=uid)
             .select_related("brand")
@@ -83,7 +130,7 @@ class ProductORM:
                             to_attr="images",
                         )
                     )
-                    .order_by("-created_at"),
+                    .order_by("-created_at", "-uid")[:review_limit],
                     to_attr="product_reviews",
                 ),
             )
@@ -138,6 +185,56 @@ class ProductORM:
             )
         )
 
+    @staticmethod
+    def get_product_export_rows() -> QuerySet:
+        """
+        Flat rows in `PRODUCT_HEADERS` order, main image URL included, so the
+        export never instantiates models or prefetches images. Bucketed
+        products export the sum of their buckets.
+        """
+        main_image_url = (
+            ProductImage.objects.filter(product=OuterRef("pk"))
+            .order_by("-is_main", "sort_order", "created_at")
+            .values("attachment__url")[:1]
+        )
+        bucket_stock = (
+            ProductStockBucket.objects.filter(product=OuterRef("pk"))
+            .order_by()
+            .values("product")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+        quantity_in_stock = Case(
+            When(
+                stock_bucket_count__gt=0,
+                then=Coalesce(Subquery(bucket_stock), 0),
+            ),
+            default=F("quantity_in_stock"),
+        )
+        return (
+            Product.objects.filter(is_deleted=False)
+            .order_by("code")
+            .values_list(
+                "name",
+                "code",
+                "origin_price",
+                "sale_price",
+                "brand__name",
+                "type",
+                "description",
+                quantity_in_stock,
+                Subquery(main_image_url),
+            )
+        )
+
+    @staticmethod
+    def get_product_uids_by_codes(codes: list[str]) -> dict[str, UUID]:
+        return dict(Product.objects.filter(code__in=codes).values_list("code", "uid"))
+
+    @staticmethod
+    def get_brands_by_names(names: list[str]) -> dict[str, Brand]:
+        return {brand.name: brand for brand in Brand.objects.filter(name__in=names)}
+
     @staticmethod
     def update_product(product: Product, **product_info) -> Product:
         filtered_info = {
@@ -198,20 +295,9 @@ class ProductORM:
         brand.delete()
         return True
 
-    @staticmethod
-    def create_product_image(
-        product: Product, attachment: Attachment, is_main: bool, sort_order: int
-    ):
-        return ProductImage.objects.create(
-            product=product,
-            attachment=attachment,
-            is_main=is_main,
-            sort_order=sort_order,
-        )
-
     @staticmethod
     def bulk_create_product_images(product_images):
-        return ProductImage.objects.bulk_create(product_images)
+        return ProductImage.objects.bulk_create(product_images, ignore_conflicts=True)
 
     @staticmethod
     def get_product_image_by_uid(uid: UUID):
@@ -1,8 +1,7 @@
 from account.models import User
 from product.models import Product, Review, ReviewAttachment
-from attachment.models import Attachment
 from uuid import UUID
-from django.db.models import Prefetch
+from django.db.models import F, Prefetch
 
 
 class ReviewORM:
@@ -10,38 +9,58 @@ class ReviewORM:
     def create_review(
         user: User, product: Product, rating: int, comment: str = ""
     ) -> Review:
-        return Review.objects.create(
+        review = Review.objects.create(
             user=user,
             product=product,
             rating=rating,
             comment=comment,
         )
+        ReviewORM.apply_rating(product_uid=product.uid, rating=rating, delta=1)
+        return review
 
     @staticmethod
-    def get_review_by_uid(uid: UUID) -> Review:
-        return Review.objects.get(uid=uid)
+    def delete_review(review: Review) -> None:
+        review.delete()
+        ReviewORM.apply_rating(
+            product_uid=review.product_id, rating=review.rating, delta=-1
+        )
 
     @staticmethod
-    def create_review_attachment(
-        review: Review, attachment: Attachment, sort_order: int
-    ) -> ReviewAttachment:
-        return ReviewAttachment.objects.create(
-            review=review,
-            attachment=attachment,
-            sort_order=sort_order,
+    def apply_rating(product_uid: UUID, rating: int, delta: int) -> int:
+        """
+        Keep the denormalized rating counters on Product in step with a review
+        write. A single `UPDATE ... SET col = col + delta` so concurrent reviews
+        never overwrite each other.
+        """
+        return Product.objects.filter(uid=product_uid).update(
+            review_count=F("review_count") + delta,
+            rating_sum=F("rating_sum") + rating * delta,
+            **{f"rating_{rating}_count": F(f"rating_{rating}_count") + delta},
         )
 
     @staticmethod
-    def get_reviews(product: Product):
+    def get_review_by_uid(uid: UUID) -> Review | None:
+        return Review.objects.filter(uid=uid).first()
+
+    @staticmethod
+    def bulk_create_review_attachments(
+        review_attachments: list[ReviewAttachment],
+    ) -> list[ReviewAttachment]:
+        return ReviewAttachment.objects.bulk_create(review_attachments)
+
+    @staticmethod
+    def get_reviews(product_uid: UUID):
         return (
-            Review.objects.filter(product=product)
+            Review.objects.filter(product_id=product_uid)
             .select_related("user")
             .prefetch_related(
                 Prefetch(
                     "review_attachments",
-                    queryset=ReviewAttachment.objects.select_related("attachment"),
+                    queryset=ReviewAttachment.objects.select_related(
+                        "attachment"
+                    ).order_by("sort_order", "created_at"),
                     to_attr="images",
                 )
             )
-            .order_by("-created_at")
+            .order_by("-created_at", "-uid")
         )
@@ -0,0 +1,153 @@
+import random
+from typing import Optional
+from uuid import UUID
+
+from django.db.models import F, Sum
+
+from product.exceptions import ProductOutOfStock
+from product.models import Product, ProductStockBucket
+
+
+class ProductStockORM:
+    @staticmethod
+    def get_product(uid: UUID) -> Optional[Product]:
+        return Product.objects.filter(uid=uid).first()
+
+    @staticmethod
+    def lock_product(uid: UUID) -> Optional[Product]:
+        return Product.objects.select_for_update().filter(uid=uid).first()
+
+    @staticmethod
+    def get_buckets(product_uid: UUID) -> list[ProductStockBucket]:
+        return list(
+            ProductStockBucket.objects.filter(product_id=product_uid).order_by("index")
+        )
+
+    @staticmethod
+    def get_total_stock(product: Product) -> int:
+        if not product.stock_bucket_count:
+            return product.quantity_in_stock
+        return (
+            ProductStockBucket.objects.filter(product=product).aggregate(
+                total=Sum("quantity")
+            )["total"]
+            or 0
+        )
+
+    @staticmethod
+    def get_total_stocks(product_uids: list[UUID]) -> dict[UUID, int]:
+        """
+        Bucket sums of the given bucketed products, in one query.
+        """
+        totals = dict(
+            ProductStockBucket.objects.filter(product_id__in=product_uids)
+            .order_by()
+            .values("product_id")
+            .annotate(total=Sum("quantity"))
+            .values_list("product_id", "total")
+        )
+        return {uid: totals.get(uid, 0) for uid in product_uids}
+
+    @staticmethod
+    def get_bucket_counts(product_uids: list[UUID]) -> dict[UUID, int]:
+        return dict(
+            Product.objects.filter(
+                uid__in=product_uids, stock_bucket_count__gt=0
+            ).values_list("uid", "stock_bucket_count")
+        )
+
+    @staticmethod
+    def set_stock(product: Product, total: Optional[int], bucket_count: int) -> Product:
+        """
+        Spread `total` (default: the current total) evenly over `bucket_count`
+        buckets, or keep it on the product row when `bucket_count` is 0. The
+        caller holds the product row lock; the buckets are locked too, so a
+        checkout never decrements a bucket being rewritten.
+        """
+        existing = {
+            bucket.index: bucket
+            for bucket in ProductStockBucket.objects.select_for_update()
+            .filter(product=product)
+            .order_by("index")
+        }
+        if total is None:
+            total = (
+                sum(bucket.quantity for bucket in existing.values())
+                if product.stock_bucket_count
+                else product.quantity_in_stock
+            )
+
+        created, updated = [], []
+        share, remainder = divmod(total, bucket_count) if bucket_count else (0, 0)
+        for index in range(bucket_count):
+            quantity = share + (1 if index < remainder else 0)
+            bucket = existing.pop(index, None)
+            if bucket is None:
+                created.append(
+                    ProductStockBucket(product=product, index=index, quantity=quantity)
+                )
+            else:
+                bucket.quantity = quantity
+                updated.append(bucket)
+
+        if existing:
+            ProductStockBucket.objects.filter(
+                uid__in=[bucket.uid for bucket in existing.values()]
+            ).delete()
+        if updated:
+            ProductStockBucket.objects.bulk_update(updated, fields=["quantity"])
+        if created:
+            ProductStockBucket.objects.bulk_create(created)
+
+        product.quantity_in_stock = total
+        product.stock_bucket_count = bucket_count
+        product.save(
+            update_fields=["quantity_in_stock", "stock_bucket_count", "updated_at"]
+        )
+        return product
+
+    @staticmethod
+    def decrement_bucket_stock(
+        product_uid: UUID, bucket_count: int, quantity: int
+    ) -> None:
+        """
+        Take `quantity` from one randomly chosen bucket with enough stock, so
+        concurrent checkouts of the same product mostly update different rows.
+        When that bucket is short the others holding enough are tried; as a
+        last resort the quantity is split across buckets, all locked in index
+        order. Raises `ProductOutOfStock` when the buckets hold less in total.
+        """
+        buckets = ProductStockBucket.objects.filter(product_id=product_uid)
+
+        index = random.randrange(bucket_count)
+        if buckets.filter(index=index, quantity__gte=quantity).update(
+            quantity=F("quantity") - quantity
+        ):
+            return
+
+        candidates = list(
+            buckets.filter(quantity__gte=quantity).values_list("index", flat=True)
+        )
+        random.shuffle(candidates)
+        for index in candidates:
+            # A concurrent checkout may have drained it since the read above
+            if buckets.filter(index=index, quantity__gte=quantity).update(
+                quantity=F("quantity") - quantity
+            ):
+                return
+
+        locked = list(
+            buckets.select_for_update().filter(quantity__gt=0).order_by("index")
+        )
+        if sum(bucket.quantity for bucket in locked) < quantity:
+            raise ProductOutOfStock
+
+        remaining, drained = quantity, []
+        for bucket in locked:
+            taken = min(bucket.quantity, remaining)
+            bucket.quantity -= taken
+            remaining -= taken
+            drained.append(bucket)
+            if not remaining:
+                break
+        ProductStockBucket.objects.bulk_update(drained, fields=["quantity"])
@@ -1,9 +1,20 @@
 from uuid import UUID
 
-from django.db.models import Prefetch
+from typing import Optional
+
+from django.db import connection
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+from django.utils import timezone
 
 from attachment.models import Attachment
-from product.models import Product, VerifierLocation, VerifyCode
+from product.models import (
+    Product,
+    ProductImage,
+    VerifierLocation,
+    VerifyCode,
+    VerifyCodeBatch,
+    VerifyCodeBatchStatus,
+)
 from product.schemas import ProductInfoSchema
 
 
@@ -14,6 +25,91 @@ class VerifyCodeORM:
             product=product, code=code, attachment=attachment
         )
 
+    @staticmethod
+    def bulk_create_verify_codes(
+        product: Product, codes: list[str], batch: Optional[VerifyCodeBatch] = None
+    ):
+        return VerifyCode.objects.bulk_create(
+            [VerifyCode(product=product, code=code, batch=batch) for code in codes],
+            batch_size=1000,
+        )
+
+    @staticmethod
+    def create_verify_code_batch(**batch_info) -> VerifyCodeBatch:
+        return VerifyCodeBatch.objects.create(**batch_info)
+
+    @staticmethod
+    def get_verify_code_batch_by_uid(uid: UUID) -> Optional[VerifyCodeBatch]:
+        return VerifyCodeBatch.objects.select_related("product").filter(uid=uid).first()
+
+    @staticmethod
+    def get_claimable_batch_filter(statuses: list[str]) -> Q:
+        """
+        Batches in `statuses`, plus RENDERING ones whose worker stopped renewing
+        its lease, e.g. because the web process restarted mid-render.
+        """
+        return Q(status__in=statuses) | Q(
+            Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=timezone.now()),
+            status=VerifyCodeBatchStatus.RENDERING,
+        )
+
+    @staticmethod
+    def get_pending_verify_code_batch_uids() -> list[UUID]:
+        return list(
+            VerifyCodeBatch.objects.filter(
+                VerifyCodeORM.get_claimable_batch_filter(
+                    [VerifyCodeBatchStatus.PENDING]
+                )
+            )
+            .order_by("created_at")
+            .values_list("uid", flat=True)
+        )
+
+    @staticmethod
+    def get_batch_codes(batch_uid: UUID):
+        return (
+            VerifyCode.objects.filter(batch_id=batch_uid)
+            .order_by("created_at", "uid")
+            .values_list("code", flat=True)
+        )
+
+    @staticmethod
+    def update_verify_code_batch(
+        uid: UUID,
+        statuses: Optional[list[str]] = None,
+        reclaim_stale: bool = False,
+        lease_holder: Optional[UUID] = None,
+        **batch_info,
+    ) -> int:
+        """
+        Conditional single-row UPDATE; `statuses` guards the transition so two
+        workers never render the same batch. With `reclaim_stale`, a RENDERING
+        batch whose lease expired also matches. With `lease_holder`, only while
+        it is still the `lease_token` of the RENDERING batch.
+        """
+        query = VerifyCodeBatch.objects.filter(uid=uid)
+        if statuses:
+            query = query.filter(
+                VerifyCodeORM.get_claimable_batch_filter(statuses)
+                if reclaim_stale
+                else Q(status__in=statuses)
+            )
+        if lease_holder:
+            query = query.filter(
+                status=VerifyCodeBatchStatus.RENDERING, lease_token=lease_holder
+            )
+        return query.update(**batch_info, updated_at=timezone.now())
+
+    @staticmethod
+    def bulk_update_verify_codes(verify_codes: list[VerifyCode], fields: list[str]):
+        return VerifyCode.objects.bulk_update(verify_codes, fields=fields)
+
+    @staticmethod
+    def get_verify_codes_without_attachment(limit: int):
+        return VerifyCode.objects.filter(attachment__isnull=True).order_by(
+            "created_at"
+        )[:limit]
+
     @staticmethod
     def get_verify_code_by_uid(uid: UUID):
         return VerifyCode.objects.filter(uid=uid).first()
@@ -24,7 +120,17 @@ class VerifyCodeORM:
 
     @staticmethod
     def get_product_info(uid: UUID) -> ProductInfoSchema:
-        return Product.objects.filter(uid=uid).first()
+        main_image_url = (
+            ProductImage.objects.filter(product=OuterRef("pk"))
+            .order_by("-is_main", "sort_order", "created_at")
+            .values("attachment__url")[:1]
+        )
+        return (
+            Product.objects.select_related("brand")
+            .annotate(image=Subquery(main_image_url))
+            .filter(uid=uid)
+            .first()
+        )
 
     @staticmethod
     def create_verifier_location(**verifier_location_info):
@@ -37,7 +143,28 @@ class VerifyCodeORM:
         )
 
     @staticmethod
-    def increase_scan_count(verify_code: VerifyCode):
-        verify_code.scan_count += 1
-        verify_code.save(update_fields=["scan_count"])
-        return verify_code
+    def increase_scan_count_by_code(code: str) -> Optional[tuple[UUID, int, UUID]]:
+        """
+        Count a scan with one conditional `UPDATE ... RETURNING`: concurrent scans
+        can neither lose increments nor push a code past `max_scan`. Returns
+        `(uid, scan_count, product_uid)`, or None when the code does not exist or
+        is exhausted.
+        """
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {quote(VerifyCode._meta.db_table)} "
+                "SET scan_count = scan_count + 1 "
+                "WHERE code = %s AND scan_count < max_scan "
+                "RETURNING uid, scan_count, product_id",
+                [code],
+            )
+            row = cursor.fetchone()
+        if not row:
+            return None
+        to_uuid = VerifyCode._meta.pk.to_python
+        return to_uuid(row[0]), row[1], to_uuid(row[2])
+
+    @staticmethod
+    def update_verifier_location(uid: UUID, **location_info) -> int:
+        return VerifierLocation.objects.filter(uid=uid).update(**location_info)
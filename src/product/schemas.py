@@ -1,4 +1,5 @@
-from typing import List, Optional
+from datetime import date
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from ninja import Field, ModelSchema, Query, Schema
@@ -7,13 +8,18 @@ from pydantic import ConfigDict
 from account.models import User
 from attachment.schemas import AttachmentSchema
 from product.models import (
+    RATING_AGGREGATE_FIELDS,
     Brand,
     Product,
     ProductImage,
+    ProductStockBucket,
     Review,
     ReviewAttachment,
     VerifierLocation,
     VerifyCode,
+    VerifyCodeBatch,
+    VerifyCodeCloneAlert,
+    VerifyCodeScanHourly,
 )
 
 
@@ -22,7 +28,7 @@ class SearchFilterSortSchema(Schema):
     brand: Optional[str] = Query(None)
     min_price: Optional[int] = Query(None)
     max_price: Optional[int] = Query(None)
-    sort: str = Query("asc")
+    sort: Literal["asc", "desc", "relevance", "rating"] = Query("asc")
 
 
 class BrandRequestSchema(Schema):
@@ -34,7 +40,15 @@ class ProductRequestSchema(ModelSchema):
 
     class Meta:
         model = Product
-        exclude = ["uid", "brand", "is_deleted", "created_at", "updated_at"]
+        exclude = [
+            "uid",
+            "brand",
+            "is_deleted",
+            "created_at",
+            "updated_at",
+            "stock_bucket_count",
+            *RATING_AGGREGATE_FIELDS,
+        ]
 
 
 class ProductUpdateSchema(Schema):
@@ -44,6 +58,7 @@ class ProductUpdateSchema(Schema):
     sale_price: Optional[int] = None
     description: Optional[str] = None
     quantity_in_stock: Optional[int] = None
+    stock_reservation_enabled: Optional[bool] = None
 
 
 
@@ -97,6 +112,7 @@ class ReviewResponseSchema(ModelSchema):
 class ProductResponseSchema(ModelSchema):
     brand: BrandResponseSchema
     images: List[ProductImageResponseSchema] = Field(default_factory=list)
+    average_rating: float
 
     class Meta:
         model = Product
@@ -109,6 +125,7 @@ class ProductDetailResponseSchema(ModelSchema):
     brand: BrandResponseSchema
     images: List[ProductImageResponseSchema] = Field(default_factory=list)
     product_reviews: List[ReviewResponseSchema] = Field(default_factory=list)
+    average_rating: float
 
     class Meta:
         model = Product
@@ -133,6 +150,44 @@ class DeleteBrandResponseSchema(Schema):
     success: bool
 
 
+class DeleteReviewResponseSchema(Schema):
+    success: bool
+
+
+class ProductImportErrorSchema(Schema):
+    row: int
+    code: Optional[str] = None
+    message: str
+
+
+class ProductImportResponseSchema(Schema):
+    created: int
+    updated: int
+    failed: int
+    errors: List[ProductImportErrorSchema] = Field(default_factory=list)
+
+
+class ProductStockUpdateSchema(Schema):
+    quantity_in_stock: Optional[int] = None
+    stock_bucket_count: Optional[int] = None
+
+
+class ProductStockResponseSchema(Schema):
+    uid: UUID
+    quantity_in_stock: int
+    stock_bucket_count: int
+
+
+class ProductStockBucketResponseSchema(ModelSchema):
+    class Meta:
+        model = ProductStockBucket
+        fields = ["index", "quantity"]
+
+
+class ProductStockBucketsResponseSchema(ProductStockResponseSchema):
+    buckets: List[ProductStockBucketResponseSchema] = Field(default_factory=list)
+
+
 class ProductInfoSchema(Schema):
     name: str
     code: str
@@ -147,6 +202,24 @@ class VerifyCodeResponseSchema(ModelSchema):
     model_config = ConfigDict(from_attributes=True)
 
 
+class VerifyCodeBatchResponseSchema(ModelSchema):
+    class Meta:
+        model = VerifyCodeBatch
+        fields = [
+            "uid",
+            "product",
+            "quantity",
+            "status",
+            "rendered_count",
+            "print_count",
+            "error",
+            "created_at",
+            "finished_at",
+        ]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class VerifierLocationResponseSchema(ModelSchema):
     verify_code: VerifyCodeResponseSchema
 
@@ -172,6 +245,47 @@ class VerifierLocationRequestSchema(Schema):
     timezone: Optional[str] = None
 
 
+class ProductScanDailyResponseSchema(Schema):
+    date: date
+    scan_count: int
+
+
+class ProductScanLocationResponseSchema(Schema):
+    country_code: str
+    country: str
+    city: str
+    scan_count: int
+
+
+class VerifyCodeScanHourlyResponseSchema(ModelSchema):
+    class Meta:
+        model = VerifyCodeScanHourly
+        fields = [
+            "hour",
+            "country_code",
+            "city",
+            "latitude",
+            "longitude",
+            "scan_count",
+        ]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class VerifyCodeCloneAlertResponseSchema(ModelSchema):
+    code: str
+
+    class Meta:
+        model = VerifyCodeCloneAlert
+        exclude = ["verify_code"]
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @staticmethod
+    def resolve_code(obj):
+        return obj.verify_code.code
+
+
 class ReviewRequestSchema(Schema):
     product_uid: UUID
     rating: int
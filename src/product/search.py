@@ -0,0 +1,63 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import FloatField, Q, QuerySet, TextField, Value
+from django.db.models.functions import Cast, Greatest, Upper
+
+
+PRODUCT_SEARCH_CONFIG = "simple"
+
+# The expressions below are also used to build the GIN indexes on Product
+# (migration 0002), so the planner can match the WHERE clause against them.
+# Keep both sides in sync.
+PRODUCT_SEARCH_VECTOR = SearchVector("name", "code", config=PRODUCT_SEARCH_CONFIG)
+PRODUCT_NAME_UPPER = Upper(Cast("name", output_field=TextField()))
+PRODUCT_CODE_UPPER = Upper(Cast("code", output_field=TextField()))
+
+
+def is_full_text_search_supported(queryset: QuerySet) -> bool:
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def search_products(queryset: QuerySet, search: str) -> QuerySet:
+    """
+    Filter products by keyword and annotate each row with a relevance `rank`.
+
+    - PostgreSQL: full-text (`@@`) and trigram (`%`, `ILIKE`) matches are all served
+      by GIN indexes; the fuzzy threshold is `pg_trgm.similarity_threshold`.
+    - Other databases (tests): fall back to `icontains` with a constant rank of 0.
+    """
+    search = search.strip()
+    if not search:
+        return queryset
+
+    if not is_full_text_search_supported(queryset):
+        return queryset.filter(
+            Q(name__icontains=search) | Q(code__icontains=search)
+        ).annotate(rank=Value(0.0, output_field=FloatField()))
+
+    query = SearchQuery(search, config=PRODUCT_SEARCH_CONFIG, search_type="websearch")
+
+    return (
+        queryset.alias(
+            search_vector=PRODUCT_SEARCH_VECTOR,
+            name_upper=PRODUCT_NAME_UPPER,
+        )
+        .filter(
+            Q(search_vector=query)
+            | Q(name_upper__trigram_similar=search)
+            | Q(name__icontains=search)
+            | Q(code__icontains=search)
+        )
+        .annotate(
+            rank=SearchRank(PRODUCT_SEARCH_VECTOR, query)
+            + Greatest(
+                TrigramSimilarity("name", search),
+                TrigramSimilarity("code", search),
+            )
+        )
+    )
@@ -1,5 +1,13 @@
 from .product import ProductService
 from .verify_code import VerifyCodeService
 from .review import ReviewService
+from .analytics import ScanAnalyticsService
+from .stock import ProductStockService
 
-__all__ = ["ProductService", "VerifyCodeService", "ReviewService"]
+__all__ = [
+    "ProductService",
+    "VerifyCodeService",
+    "ReviewService",
+    "ScanAnalyticsService",
+    "ProductStockService",
+]
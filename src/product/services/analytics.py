@@ -0,0 +1,308 @@
+import logging
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Optional
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import Model
+from django.utils import timezone
+
+from product.geolocation import distance_km
+from product.models import (
+    ProductScanDaily,
+    ProductScanLocationDaily,
+    VerifyCodeScanHourly,
+)
+from product.orm.analytics import ScanAnalyticsORM
+
+
+logger = logging.getLogger("django")
+
+SCAN_ROLLUP_CHECKPOINT = "verifier_locations"
+# Scans younger than this are left for the next run, so the asynchronous
+# geolocation lookup has landed before a scan is counted under its city
+SCAN_ROLLUP_SETTLE_DELAY = timedelta(minutes=5)
+SCAN_ROLLUP_STEP = timedelta(hours=6)
+SCAN_CLONE_WINDOW = timedelta(hours=6)
+SCAN_CLONE_DISTANCE_KM = 300
+SCAN_CLONE_BATCH_SIZE = 1000
+SCAN_PRUNE_BATCH_SIZE = 5000
+
+
+class ScanAnalyticsService:
+    def __init__(self) -> None:
+        self.orm = ScanAnalyticsORM()
+
+    def rollup_scans(self, now: Optional[datetime] = None) -> int:
+        """
+        Fold raw `VerifierLocation` rows past the checkpoint into the rollup
+        tables, one `SCAN_ROLLUP_STEP` window per transaction. The checkpoint row
+        is locked for the whole window, so concurrent runs never count a scan
+        twice. Returns the number of scans folded in.
+        """
+        until = (now or timezone.now()) - SCAN_ROLLUP_SETTLE_DELAY
+        scan_count = 0
+
+        while True:
+            with transaction.atomic():
+                checkpoint = self.orm.lock_checkpoint(SCAN_ROLLUP_CHECKPOINT)
+                start = checkpoint.rolled_up_until or self.orm.get_first_scan_time()
+                if start is None or start >= until:
+                    return scan_count
+
+                end = min(start + SCAN_ROLLUP_STEP, until)
+                scan_count += self.rollup_window(start=start, end=end)
+
+                checkpoint.rolled_up_until = end
+                checkpoint.save(update_fields=["rolled_up_until", "updated_at"])
+
+    def rollup_window(self, start: datetime, end: datetime) -> int:
+        daily = self.orm.aggregate_product_daily(start, end)
+        if not daily:
+            return 0
+
+        self.merge_rollup(
+            model=ProductScanDaily,
+            keys=["product_id", "date"],
+            rows=daily,
+        )
+        self.merge_rollup(
+            model=ProductScanLocationDaily,
+            keys=["product_id", "date", "country_code", "city"],
+            rows=[
+                {
+                    "product_id": row["product_id"],
+                    "date": row["date"],
+                    "country_code": row["country_code"] or "",
+                    "city": row["city"] or "",
+                    "country": row["country_name"] or "",
+                    "scan_count": row["scan_count"],
+                }
+                for row in self.orm.aggregate_product_location_daily(start, end)
+            ],
+            values=["country"],
+        )
+
+        hourly = [
+            {
+                "verify_code_id": row["verify_code_id"],
+                "hour": row["hour"],
+                "country_code": row["country_code"] or "",
+                "city": row["city"] or "",
+                "product_id": row["product_id"],
+                "latitude": row["average_latitude"],
+                "longitude": row["average_longitude"],
+                "scan_count": row["scan_count"],
+                "located_count": row["located_count"],
+            }
+            for row in self.orm.aggregate_verify_code_hourly(start, end)
+        ]
+        self.merge_rollup(
+            model=VerifyCodeScanHourly,
+            keys=["verify_code_id", "hour", "country_code", "city"],
+            rows=hourly,
+            values=["product_id"],
+            averages=["latitude", "longitude"],
+        )
+
+        self.detect_clones(
+            verify_code_uids=list({row["verify_code_id"] for row in hourly}),
+            since=start,
+        )
+        return sum(row["scan_count"] for row in daily)
+
+    def merge_rollup(
+        self,
+        model: type[Model],
+        keys: list[str],
+        rows: list[dict],
+        values: Optional[list[str]] = None,
+        averages: Optional[list[str]] = None,
+    ) -> None:
+        """
+        Add the `scan_count` of each aggregated row onto the rollup row with the
+        same `keys`, creating it when missing. `values` are copied over as-is.
+        `averages` are merged weighted by `located_count`, which adds up like
+        `scan_count`: a window often covers only part of an hour.
+        """
+        values = values or []
+        averages = averages or []
+        counts = ["scan_count", "located_count"] if averages else ["scan_count"]
+
+        increments: dict[tuple, dict] = {}
+        for row in rows:
+            key = tuple(row[field] for field in keys)
+            if key in increments:
+                self.add_rollup_counts(increments[key], row, counts, averages)
+            else:
+                increments[key] = dict(row)
+        if not increments:
+            return
+
+        # The two leading keys are selective enough to narrow the lookup
+        filters = {
+            f"{field}__in": {key[index] for key in increments}
+            for index, field in enumerate(keys[:2])
+        }
+        existing = {
+            tuple(getattr(item, field) for field in keys): item
+            for item in self.orm.get_rollup_rows(model, **filters)
+        }
+
+        created, updated = [], []
+        for key, row in increments.items():
+            item = existing.get(key)
+            if item is None:
+                created.append(
+                    model(
+                        **{
+                            field: row[field]
+                            for field in keys + values + averages + counts
+                        }
+                    )
+                )
+                continue
+
+            current = {field: getattr(item, field) for field in counts + averages}
+            self.add_rollup_counts(current, row, counts, averages)
+            for field, value in current.items():
+                setattr(item, field, value)
+            for field in values:
+                if row[field] is not None:
+                    setattr(item, field, row[field])
+            updated.append(item)
+
+        self.orm.save_rollup_rows(
+            model,
+            created=created,
+            updated=updated,
+            fields=[*counts, *values, *averages],
+        )
+
+    @staticmethod
+    def add_rollup_counts(
+        current: dict, row: dict, counts: list[str], averages: list[str]
+    ) -> None:
+        for field in averages:
+            weight, row_weight = current["located_count"], row["located_count"]
+            if row[field] is None or not row_weight:
+                continue
+            if current[field] is None or not weight:
+                current[field] = row[field]
+            else:
+                current[field] = (current[field] * weight + row[field] * row_weight) / (
+                    weight + row_weight
+                )
+        for field in counts:
+            current[field] += row[field]
+
+    def detect_clones(self, verify_code_uids: list[UUID], since: datetime) -> int:
+        """
+        Flag codes scanned at least `SCAN_CLONE_DISTANCE_KM` apart within
+        `SCAN_CLONE_WINDOW`, looking only at the hourly rollup. Only pairs whose
+        later scan falls in the window being rolled up are considered; the
+        farthest one is kept on the code's alert.
+        """
+        since_hour = since.replace(minute=0, second=0, microsecond=0)
+        flagged = 0
+
+        for index in range(0, len(verify_code_uids), SCAN_CLONE_BATCH_SIZE):
+            scans = self.orm.get_located_code_scans(
+                verify_code_uids=verify_code_uids[
+                    index : index + SCAN_CLONE_BATCH_SIZE
+                ],
+                since=since_hour - SCAN_CLONE_WINDOW,
+            )
+            for verify_code_uid, code_scans in groupby(
+                scans, key=itemgetter("verify_code_id")
+            ):
+                pair = self.find_farthest_pair(list(code_scans), since_hour)
+                if pair is None:
+                    continue
+
+                distance, first, second = pair
+                self.orm.save_clone_alert(
+                    verify_code_uid,
+                    product_id=first["product_id"],
+                    distance_km=round(distance, 1),
+                    first_city=first["city"],
+                    first_country_code=first["country_code"],
+                    first_seen_at=first["hour"],
+                    second_city=second["city"],
+                    second_country_code=second["country_code"],
+                    second_seen_at=second["hour"],
+                )
+                flagged += 1
+
+        if flagged:
+            logger.warning(f"Flagged {flagged} verify codes as possibly cloned")
+        return flagged
+
+    @staticmethod
+    def find_farthest_pair(scans: list[dict], since_hour: datetime):
+        farthest = None
+        for index, first in enumerate(scans):
+            for second in scans[index + 1 :]:
+                if second["hour"] - first["hour"] > SCAN_CLONE_WINDOW:
+                    break
+                if second["hour"] < since_hour:
+                    continue
+
+                distance = distance_km(
+                    first["latitude"],
+                    first["longitude"],
+                    second["latitude"],
+                    second["longitude"],
+                )
+                if distance >= SCAN_CLONE_DISTANCE_KM and (
+                    farthest is None or distance > farthest[0]
+                ):
+                    farthest = (distance, first, second)
+        return farthest
+
+    def prune_raw_scans(
+        self, retention_days: int, now: Optional[datetime] = None
+    ) -> int:
+        """
+        Delete raw scans older than `retention_days` that are already counted in
+        the rollups.
+        """
+        checkpoint = self.orm.get_checkpoint(SCAN_ROLLUP_CHECKPOINT)
+        if checkpoint is None or checkpoint.rolled_up_until is None:
+            return 0
+
+        before = min(
+            checkpoint.rolled_up_until,
+            (now or timezone.now()) - timedelta(days=retention_days),
+        )
+        return self.orm.delete_scans_before(
+            before=before, batch_size=SCAN_PRUNE_BATCH_SIZE
+        )
+
+    def get_product_daily_scans(
+        self,
+        product_uid: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ):
+        return self.orm.get_product_daily_scans(
+            product_uid=product_uid, start_date=start_date, end_date=end_date
+        )
+
+    def get_product_location_scans(
+        self,
+        product_uid: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ):
+        return self.orm.get_product_location_scans(
+            product_uid=product_uid, start_date=start_date, end_date=end_date
+        )
+
+    def get_verify_code_hourly_scans(self, code: str):
+        return self.orm.get_verify_code_hourly_scans(code=code)
+
+    def get_clone_alerts(self, product_uid: Optional[UUID] = None):
+        return self.orm.get_clone_alerts(product_uid=product_uid)
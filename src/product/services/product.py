@@ -1,37 +1,59 @@
-from io import BytesIO
-from typing import Any
 from uuid import UUID
 
+from django.db import transaction
+from django.utils import timezone
+
 from account.models import User
+from attachment.exceptions import UploadAttachmentFail
 from attachment.models import AttachmentType
 from attachment.services import AttachmentService
+from order.services import StockReservationService
 from product.exceptions import (
     BrandDoesNotExists,
     ProductDoesNotExists,
     ProductFileRequired,
     ProductImageDoesNotExists,
+    ProductStockBucketConflict,
 )
-from django.core.cache import cache
-
-from product.caching import (
-    PRODUCT_LIST_CACHE_KEY,
-    PRODUCT_LIST_CACHE_TTL,
-    is_only_get_list,
-    clear_product_cache,
-)
+from product.caching import clear_product_cache
 from product.models import Brand, Product, ProductImage
 from product.orm.product import ProductORM
 from product.schemas import ProductRequestSchema, SearchFilterSortSchema
-from product.utils import build_product_workbook, load_product_information
-from django.core.cache import cache
+from product.services.stock import ProductStockService
+from product.utils import (
+    PRODUCT_EXPORT_CHUNK_SIZE,
+    ProductWorkbookReader,
+    build_product_export_workbook,
+    build_product_workbook,
+    stream_product_csv,
+)
+from router.paginate import Pagination
+
 
+PRODUCT_DETAIL_REVIEW_LIMIT = 10
+PRODUCT_IMPORT_CHUNK_SIZE = 500
+# Image bytes are only held for one batch of uploads at a time
+PRODUCT_IMPORT_IMAGE_BATCH_SIZE = 16
+PRODUCT_IMPORT_UPDATE_FIELDS = [
+    "name",
+    "origin_price",
+    "sale_price",
+    "brand",
+    "type",
+    "description",
+    "quantity_in_stock",
+    "updated_at",
+]
 
 
 class ProductService:
     def __init__(self):
         self.orm = ProductORM()
         self.attachment_service = AttachmentService()
+        self.stock_service = ProductStockService()
+        self.stock_reservation_service = StockReservationService()
 
+    @transaction.atomic
     def create_product(self, payload: ProductRequestSchema, files: list):
         product_info = payload.dict()
 
@@ -41,114 +63,180 @@ class ProductService:
             raise BrandDoesNotExists
 
         product = self.orm.create_product(**product_info, brand=brand)
-        product_image_uids = []
-
-        for idx, file in enumerate(files):
-            attachment = self.attachment_service.upload_attachment(
-                file=file.file,
-                folder="product_images",
-                public_id=f"product_{product.uid}_{idx}",
-                type=AttachmentType.PRODUCT,
-            )
 
-            product_image = self.orm.create_product_image(
-                product=product,
-                attachment=attachment,
-                is_main=(idx == 0),
-                sort_order=idx,
+        attachments = self.attachment_service.upload_attachments(
+            files=[
+                (file.file, f"product_{product.uid}_{idx}")
+                for idx, file in enumerate(files)
+            ],
+            folder="product_images",
+            type=AttachmentType.PRODUCT,
+        )
+        try:
+            self.orm.bulk_create_product_images(
+                [
+                    ProductImage(
+                        product=product,
+                        attachment=attachment,
+                        is_main=(idx == 0),
+                        sort_order=idx,
+                    )
+                    for idx, attachment in enumerate(attachments)
+                ]
             )
+        except Exception:
+            self.attachment_service.discard_attachments(attachments)
+            raise
 
-            product_image_uids.append(product_image.uid)
-        clear_product_cache()
+        transaction.on_commit(clear_product_cache)
         return product
 
     def get_product_file(self):
         return build_product_workbook()
 
+    def export_products_xlsx(self):
+        rows = self.orm.get_product_export_rows()
+        return build_product_export_workbook(
+            rows.iterator(chunk_size=PRODUCT_EXPORT_CHUNK_SIZE)
+        )
+
+    def export_products_csv(self):
+        rows = self.orm.get_product_export_rows()
+        return stream_product_csv(rows.iterator(chunk_size=PRODUCT_EXPORT_CHUNK_SIZE))
+
     def create_multiple_products(self, product_file):
+        """
+        Import a product sheet in chunks of `PRODUCT_IMPORT_CHUNK_SIZE` rows so
+        memory stays flat whatever the file size. Invalid rows and failed image
+        uploads are reported per row instead of aborting the import.
+        """
         if not product_file:
             raise ProductFileRequired
 
-        products_data = load_product_information(product_file=product_file)
+        report = {"created": 0, "updated": 0, "failed": 0, "errors": []}
         brand_cache: dict[str, Brand] = {}
-        product_map: dict[str, Product] = {}
-        image_map: dict[str, Any] = {}
-
-        for product_data in products_data:
-            brand_name = product_data.pop("brand_name", None)
-            image = product_data.pop("image", None)
-
-            brand = None
-            if brand_name:
-                if brand_name not in brand_cache:
-                    brand_cache[brand_name], _ = self.orm.get_or_create_by_name(
-                        name=brand_name
-                    )
-                brand = brand_cache[brand_name]
-
-            product_code = product_data["code"]
-            product_map[product_code] = Product(**product_data, brand=brand)
-
-            if image:
-                image_map[product_code] = image
-
-        codes = list(product_map.keys())
-        existing_products = self.orm.get_products_by_codes(codes=codes)
-        existing_code_set = {product.code for product in existing_products}
-
-        new_products = [
-            product
-            for code, product in product_map.items()
-            if code not in existing_code_set
-        ]
-        if new_products:
-            self.orm.bulk_create_product(new_products)
-
-        for existing_product in existing_products:
-            new_product_data = product_map[existing_product.code]
-            existing_product.name = new_product_data.name
-            existing_product.origin_price = new_product_data.origin_price
-            existing_product.sale_price = new_product_data.sale_price
-            existing_product.brand = new_product_data.brand
-            existing_product.type = new_product_data.type
-            existing_product.description = new_product_data.description
-            existing_product.quantity_in_stock = new_product_data.quantity_in_stock
-
-        if existing_products:
-            self.orm.bulk_update_product(
-                list(existing_products),
-                fields=[
-                    "name",
-                    "origin_price",
-                    "sale_price",
-                    "brand",
-                    "type",
-                    "description",
-                    "quantity_in_stock",
-                ],
+        reader = ProductWorkbookReader(product_file)
+
+        try:
+            chunk = []
+            for row_index, product_data, error in reader.iter_rows():
+                if error:
+                    self.add_import_error(report, row_index, None, error)
+                    continue
+                chunk.append((row_index, product_data))
+                if len(chunk) >= PRODUCT_IMPORT_CHUNK_SIZE:
+                    self.import_product_chunk(reader, chunk, brand_cache, report)
+                    chunk = []
+            if chunk:
+                self.import_product_chunk(reader, chunk, brand_cache, report)
+        finally:
+            reader.close()
+            clear_product_cache()
+
+        return report
+
+    @staticmethod
+    def add_import_error(report: dict, row: int, code, message: str):
+        report["failed"] += 1
+        report["errors"].append({"row": row, "code": code, "message": message})
+
+    def import_product_chunk(
+        self,
+        reader: ProductWorkbookReader,
+        chunk: list[tuple[int, dict]],
+        brand_cache: dict[str, Brand],
+        report: dict,
+    ):
+        # A code repeated inside the sheet keeps its last row, as before
+        rows_by_code = {
+            product_data["code"]: (row, product_data) for row, product_data in chunk
+        }
+
+        brand_names = {data["brand_name"] for _, data in rows_by_code.values()}
+        missing_brands = [name for name in brand_names if name not in brand_cache]
+        if missing_brands:
+            brand_cache.update(self.orm.get_brands_by_names(names=missing_brands))
+            for name in missing_brands:
+                if name not in brand_cache:
+                    brand_cache[name], _ = self.orm.get_or_create_by_name(name=name)
+
+        existing_uids = self.orm.get_product_uids_by_codes(codes=list(rows_by_code))
+        now = timezone.now()
+        new_products, existing_products, images = [], [], []
+
+        for code, (row, product_data) in rows_by_code.items():
+            image_path = product_data.pop("image_path")
+            brand = brand_cache[product_data.pop("brand_name")]
+            product = Product(**product_data, brand=brand, updated_at=now)
+            if code in existing_uids:
+                product.uid = existing_uids[code]
+                existing_products.append(product)
+            else:
+                new_products.append(product)
+            if image_path:
+                images.append((row, product, image_path))
+
+        with transaction.atomic():
+            if new_products:
+                self.orm.bulk_create_product(new_products)
+            if existing_products:
+                self.orm.bulk_update_product(
+                    existing_products, fields=PRODUCT_IMPORT_UPDATE_FIELDS
+                )
+                # The imported total is spread over the buckets of bucketed ones
+                bucketed_uids = self.stock_service.orm.get_bucket_counts(
+                    [product.uid for product in existing_products]
+                )
+                for product in existing_products:
+                    if product.uid in bucketed_uids:
+                        self.stock_service.update_stock(
+                            uid=product.uid, quantity_in_stock=product.quantity_in_stock
+                        )
+        report["created"] += len(new_products)
+        report["updated"] += len(existing_products)
+
+        for start in range(0, len(images), PRODUCT_IMPORT_IMAGE_BATCH_SIZE):
+            self.import_product_images(
+                reader, images[start : start + PRODUCT_IMPORT_IMAGE_BATCH_SIZE], report
             )
 
-        all_products = self.orm.get_products_by_codes(codes=codes)
-
-        for product in all_products:
-            image_object = image_map.get(product.code)
-            if not image_object:
-                continue
-
-            buffer = BytesIO(image_object._data())
-            buffer.seek(0)
+    def import_product_images(
+        self, reader: ProductWorkbookReader, images: list, report: dict
+    ):
+        uploaded = self.attachment_service.upload_files(
+            [
+                (reader.read_image(image_path), f"product_{product.uid}_0")
+                for _, product, image_path in images
+            ],
+            folder="product_images",
+        )
 
-            attachment = self.attachment_service.upload_attachment(
-                file=buffer,
-                folder="product_images",
-                public_id=f"product_{product.uid}_0",
-                type=AttachmentType.PRODUCT,
+        succeeded = []
+        for (row, product, _), info in zip(images, uploaded):
+            if info:
+                succeeded.append((product, info))
+            else:
+                self.add_import_error(
+                    report, row, product.code, UploadAttachmentFail.message
+                )
+        if not succeeded:
+            return
+
+        with transaction.atomic():
+            attachments = self.attachment_service.save_attachments(
+                [info for _, info in succeeded], type=AttachmentType.PRODUCT
             )
-            _ = self.orm.create_product_image(
-                product=product, attachment=attachment, is_main=True, sort_order=0
+            self.orm.bulk_create_product_images(
+                [
+                    ProductImage(
+                        product=product,
+                        attachment=attachment,
+                        is_main=True,
+                        sort_order=0,
+                    )
+                    for (product, _), attachment in zip(succeeded, attachments)
+                ]
             )
-        clear_product_cache()
-        return list(all_products)
 
     def delete_product_image(self, uid: UUID):
         product_image = self.orm.get_product_image_by_uid(uid=uid)
@@ -160,29 +248,23 @@ class ProductService:
         self.orm.delete_product_image(product_image=product_image)
         if attachment_uid:
             self.attachment_service.delete_attachment(attachment_uid)
+        clear_product_cache()
 
-    def get_products(self, payload: SearchFilterSortSchema):
-        if is_only_get_list(payload):
-            cached_products = cache.get(PRODUCT_LIST_CACHE_KEY)
-            if cached_products is not None:
-                return cached_products
-
+    def get_products(
+        self, payload: SearchFilterSortSchema, pagination: Pagination.Input
+    ):
         products = self.orm.get_products(payload=payload)
-
-        if is_only_get_list(payload):
-            products = list(products)
-            cache.set(
-                PRODUCT_LIST_CACHE_KEY,
-                products,
-                timeout=PRODUCT_LIST_CACHE_TTL,
-            )
-
-        return products
+        page = Pagination().get_page(products, pagination)
+        self.stock_service.fill_total_stock(page["content"])
+        return page
 
     def get_product_by_uid(self, uid: UUID):
-        product = self.orm.get_product_by_uid(uid=uid)
+        product = self.orm.get_product_detail(
+            uid=uid, review_limit=PRODUCT_DETAIL_REVIEW_LIMIT
+        )
         if not product:
             raise ProductDoesNotExists
+        product.quantity_in_stock = self.stock_service.get_total_stock(product)
         return product
 
     def update_product(self, uid: UUID, payload: ProductRequestSchema):
@@ -190,32 +272,59 @@ class ProductService:
         if not product:
             raise ProductDoesNotExists
         product_info = payload.dict()
+        if product.stock_bucket_count:
+            if product_info.get("stock_reservation_enabled"):
+                raise ProductStockBucketConflict
+            quantity_in_stock = product_info.pop("quantity_in_stock", None)
+            if quantity_in_stock is not None:
+                self.stock_service.update_stock(
+                    uid=uid, quantity_in_stock=quantity_in_stock
+                )
+        if (
+            product_info.get("stock_reservation_enabled")
+            and not product.stock_reservation_enabled
+        ):
+            # Before the flag is saved: until then checkouts take the lock path
+            # and never recreate the counter
+            self.stock_reservation_service.reset_stock(product_uid=uid)
+        self.orm.update_product(product=product, **product_info)
         clear_product_cache()
-        return self.orm.update_product(product=product, **product_info)
+        return self.get_product_by_uid(uid=uid)
 
     def on_off_product(self, uid: UUID):
         product = self.orm.get_product_by_uid(uid=uid)
         if not product:
             raise ProductDoesNotExists
+        product = self.orm.on_off_product(product=product)
         clear_product_cache()
-        return self.orm.on_off_product(product=product)
+        return product
 
     def delete_product(self, uid: UUID):
         product = self.orm.get_product_by_uid(uid=uid)
         if not product:
             raise ProductDoesNotExists
+        success = self.orm.hard_delete_product(product=product)
         clear_product_cache()
-        return self.orm.hard_delete_product(product=product)
+        return success
 
     def create_brand(self, name: str):
-        return self.orm.create_brand(name=name)
+        brand = self.orm.create_brand(name=name)
+        clear_product_cache()
+        return brand
 
     def get_brands(self):
         return self.orm.get_brands()
 
     def get_brand_by_uid(self, uid: UUID):
-        return self.orm.get_brand_by_uid(uid=uid)
+        brand = self.orm.get_brand_by_uid(uid=uid)
+        if not brand:
+            raise BrandDoesNotExists
+        return brand
 
     def delete_brand(self, uid: UUID):
         brand = self.orm.get_brand_by_uid(uid=uid)
-        return self.orm.delete_brand(brand=brand)
+        if not brand:
+            raise BrandDoesNotExists
+        success = self.orm.delete_brand(brand=brand)
+        clear_product_cache()
+        return success
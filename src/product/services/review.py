@@ -1,10 +1,21 @@
 from uuid import UUID
+
+from django.db import transaction
+
 from product.schemas import ReviewRequestSchema
 from product.orm.review import ReviewORM
 from product.orm.product import ProductORM
 from attachment.services import AttachmentService
 from attachment.models import AttachmentType
 from account.models import User
+from product.models import ReviewAttachment
+from product.caching import clear_product_detail_cache
+from product.exceptions import (
+    ProductDoesNotExists,
+    ReviewDoesNotExists,
+    ReviewPermissionDenied,
+    ReviewRatingInvalid,
+)
 
 
 class ReviewService:
@@ -13,11 +24,14 @@ class ReviewService:
         self.product_orm = ProductORM()
         self.attachment_service = AttachmentService()
 
-    from django.db import transaction
-
     @transaction.atomic
     def create_review(self, user: User, payload: ReviewRequestSchema, files: list):
+        if not 1 <= payload.rating <= 5:
+            raise ReviewRatingInvalid
+
         product = self.product_orm.get_product_by_uid(uid=payload.product_uid)
+        if not product:
+            raise ProductDoesNotExists
 
         review = self.orm.create_review(
             user=user,
@@ -26,26 +40,42 @@ class ReviewService:
             comment=payload.comment,
         )
 
-        attachments = []
-
-        for index, file in enumerate(files or []):
-            attachment = self.attachment_service.upload_attachment(
-                file=file,
-                type=AttachmentType.REVIEW,
-                public_id=f"review_{review.uid}_{index}",
-                folder="review_images",
+        attachments = self.attachment_service.upload_attachments(
+            files=[
+                (file, f"review_{review.uid}_{index}")
+                for index, file in enumerate(files or [])
+            ],
+            folder="review_images",
+            type=AttachmentType.REVIEW,
+        )
+        try:
+            self.orm.bulk_create_review_attachments(
+                [
+                    ReviewAttachment(
+                        review=review, attachment=attachment, sort_order=index
+                    )
+                    for index, attachment in enumerate(attachments)
+                ]
             )
+        except Exception:
+            self.attachment_service.discard_attachments(attachments)
+            raise
 
-            review_attachment = self.orm.create_review_attachment(
-                review=review,
-                attachment=attachment,
-                sort_order=index,
-            )
+        transaction.on_commit(lambda: clear_product_detail_cache(product.uid))
+        return review
 
-            attachments.append(review_attachment)
+    @transaction.atomic
+    def delete_review(self, user: User, uid: UUID) -> bool:
+        review = self.orm.get_review_by_uid(uid=uid)
+        if not review:
+            raise ReviewDoesNotExists
+        if review.user_id != user.uid and not user.is_staff:
+            raise ReviewPermissionDenied
 
-        return review
+        self.orm.delete_review(review=review)
+        product_uid = review.product_id
+        transaction.on_commit(lambda: clear_product_detail_cache(product_uid))
+        return True
 
     def get_reviews(self, uid: UUID):
-        product = self.product_orm.get_product_by_uid(uid=uid)
-        return self.orm.get_reviews(product=product)
+        return self.orm.get_reviews(product_uid=uid)
@@ -0,0 +1,146 @@
+from typing import Iterable, Optional
+from uuid import UUID
+
+from django.core.cache import cache
+from django.db import transaction
+
+from product.caching import (
+    PRODUCT_STOCK_CACHE_TTL,
+    build_product_stock_cache_key,
+    clear_product_cache,
+    clear_product_stock_cache,
+)
+from product.exceptions import (
+    ProductDoesNotExists,
+    ProductStockBucketConflict,
+    ProductStockInvalid,
+)
+from product.models import Product
+from product.orm.stock import ProductStockORM
+
+
+PRODUCT_STOCK_MAX_BUCKETS = 64
+
+
+class ProductStockService:
+    def __init__(self):
+        self.orm = ProductStockORM()
+
+    def get_total_stock(self, product: Product) -> int:
+        """
+        Total stock of `product`. Summing the buckets of a bucketed product is
+        cached for `PRODUCT_STOCK_CACHE_TTL` seconds; checkouts only lower it,
+        admin changes clear it.
+        """
+        if not product.stock_bucket_count:
+            return product.quantity_in_stock
+
+        cache_key = build_product_stock_cache_key(product.uid)
+        total = cache.get(cache_key)
+        if total is None:
+            total = self.orm.get_total_stock(product)
+            cache.set(cache_key, total, PRODUCT_STOCK_CACHE_TTL)
+        return total
+
+    def get_total_stocks(self, products: Iterable[Product]) -> dict[UUID, int]:
+        """
+        `get_total_stock` of a page of products: the cached sums are read at
+        once and the missing ones summed in a single query.
+        """
+        totals, cache_keys = {}, {}
+        for product in products:
+            if product.stock_bucket_count:
+                cache_keys[build_product_stock_cache_key(product.uid)] = product.uid
+            else:
+                totals[product.uid] = product.quantity_in_stock
+        if not cache_keys:
+            return totals
+
+        cached = cache.get_many(list(cache_keys))
+        totals.update({cache_keys[key]: total for key, total in cached.items()})
+        missing = [uid for key, uid in cache_keys.items() if key not in cached]
+        if missing:
+            summed = self.orm.get_total_stocks(product_uids=missing)
+            cache.set_many(
+                {
+                    build_product_stock_cache_key(uid): total
+                    for uid, total in summed.items()
+                },
+                PRODUCT_STOCK_CACHE_TTL,
+            )
+            totals.update(summed)
+        return totals
+
+    def fill_total_stock(self, products: Iterable[Product]) -> None:
+        """
+        Replace `quantity_in_stock` of bucketed products, only the total last
+        set by an admin, with the bucket sum before they are serialized.
+        """
+        products = list(products)
+        totals = self.get_total_stocks(products)
+        for product in products:
+            product.quantity_in_stock = totals[product.uid]
+
+    def get_stock(self, uid: UUID) -> dict:
+        product = self.orm.get_product(uid=uid)
+        if not product:
+            raise ProductDoesNotExists
+        return {
+            "uid": product.uid,
+            "quantity_in_stock": self.get_total_stock(product),
+            "stock_bucket_count": product.stock_bucket_count,
+        }
+
+    def get_stock_buckets(self, uid: UUID) -> dict:
+        product = self.orm.get_product(uid=uid)
+        if not product:
+            raise ProductDoesNotExists
+        buckets = self.orm.get_buckets(product_uid=uid)
+        return {
+            "uid": product.uid,
+            "quantity_in_stock": (
+                sum(bucket.quantity for bucket in buckets)
+                if product.stock_bucket_count
+                else product.quantity_in_stock
+            ),
+            "stock_bucket_count": product.stock_bucket_count,
+            "buckets": buckets,
+        }
+
+    def update_stock(
+        self,
+        uid: UUID,
+        quantity_in_stock: Optional[int] = None,
+        stock_bucket_count: Optional[int] = None,
+    ) -> dict:
+        """
+        Set the total stock and/or split it over `stock_bucket_count` buckets
+        (0 merges it back onto the product row). A missing total keeps the
+        current one, a missing bucket count keeps the current split.
+        """
+        with transaction.atomic():
+            product = self.orm.lock_product(uid=uid)
+            if not product:
+                raise ProductDoesNotExists
+
+            if stock_bucket_count is None:
+                stock_bucket_count = product.stock_bucket_count
+            if not 0 <= stock_bucket_count <= PRODUCT_STOCK_MAX_BUCKETS or (
+                quantity_in_stock is not None and quantity_in_stock < 0
+            ):
+                raise ProductStockInvalid
+            if stock_bucket_count and product.stock_reservation_enabled:
+                raise ProductStockBucketConflict
+
+            self.orm.set_stock(
+                product=product,
+                total=quantity_in_stock,
+                bucket_count=stock_bucket_count,
+            )
+            transaction.on_commit(lambda: self.clear_stock_cache(uid))
+        return self.get_stock_buckets(uid=uid)
+
+    @staticmethod
+    def clear_stock_cache(uid: UUID) -> None:
+        clear_product_stock_cache(uid)
+        clear_product_cache()
@@ -1,18 +1,81 @@
+import logging
 import os
-from uuid import UUID
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
 
 from account.exceptions import BackendURLNotConfigured
+from attachment.exceptions import UploadAttachmentFail
 from attachment.models import AttachmentType
 from attachment.services import AttachmentService
+from account.models import User
 from product.exceptions import (
     ProductDoesNotExists,
     QuantityQRCodeInvalid,
+    VerifyCodeBatchDoesNotExists,
+    VerifyCodeBatchIsRendering,
+    VerifyCodeBatchNotReady,
     VerifyCodeDoesNotExists,
 )
+from product.caching import (
+    MISSING_VERIFY_CODE_CACHE_TTL,
+    build_missing_verify_code_cache_key,
+    clear_missing_verify_code_cache,
+)
+from product.models import VerifyCode, VerifyCodeBatchStatus
 from product.orm.product import ProductORM
 from product.orm.verify_code import VerifyCodeORM
 from product.schemas import VerifierLocationRequestSchema
-from product.utils import generate_qr_image, get_ip_location, generate_random_code
+from product.utils import (
+    build_verify_link,
+    check_code_signature,
+    generate_qr_image,
+    generate_random_code,
+    get_ip_location,
+    render_qrcode_pdf,
+)
+
+
+logger = logging.getLogger("django")
+
+VERIFY_CODE_BATCH_FOLDER = "verify_code_batches"
+# A rendering worker renews its lease after every page; a batch whose lease ran
+# out is taken over by `render_verify_code_batches` or a reprint
+VERIFY_CODE_BATCH_LEASE = timedelta(minutes=5)
+VERIFY_CODE_MAX_LENGTH = VerifyCode._meta.get_field("code").max_length
+VERIFIER_LOCATION_FIELDS = [
+    "isp",
+    "country",
+    "country_code",
+    "region",
+    "region_name",
+    "city",
+    "zip_code",
+    "latitude",
+    "longitude",
+    "timezone",
+]
+
+# Geolocation lookups run here, off the scan request
+GEOLOCATION_EXECUTOR = ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="geolocation"
+)
+
+
+class VerifyCodeBatchLeaseLost(Exception):
+    """
+    Raised while rendering when another worker has claimed the batch since.
+    """
 
 
 class VerifyCodeService:
@@ -21,41 +84,242 @@ class VerifyCodeService:
         self.product_orm = ProductORM()
         self.attachment_service = AttachmentService()
 
+    @staticmethod
+    def get_backend_url() -> str:
+        backend_url = os.environ.get("BACKEND_URL")
+        if not backend_url:
+            raise BackendURLNotConfigured
+        return backend_url
+
     def generate_verify_qr_code(self, uid: UUID):
+        return self.generate_multiple_verify_qr_codes(uid=uid, quantity=1)[0]
+
+    @staticmethod
+    def generate_codes(quantity: int) -> list[str]:
+        codes = set()
+        while len(codes) < quantity:
+            codes.add(generate_random_code())
+        return list(codes)
+
+    def generate_multiple_verify_qr_codes(self, uid: UUID, quantity: int):
+        """
+        Create `quantity` codes with a single INSERT. QR images are no longer
+        rendered or uploaded here: the PDF draws them from the code itself, and
+        `manage.py upload_verify_code_images` uploads PNGs later if needed.
+        """
+        if quantity <= 0:
+            raise QuantityQRCodeInvalid
+
         product = self.product_orm.get_product_by_uid(uid=uid)
         if not product:
             raise ProductDoesNotExists
+        self.get_backend_url()
 
-        code = generate_random_code()
+        return self.create_verify_codes(product=product, quantity=quantity)
 
-        backend_url = os.environ.get("BACKEND_URL")
-        if not backend_url:
-            raise BackendURLNotConfigured
+    def create_verify_codes(self, product, quantity: int, batch=None):
+        codes = self.generate_codes(quantity)
+        verify_codes = self.orm.bulk_create_verify_codes(
+            product=product, codes=codes, batch=batch
+        )
+        # A code scanned before it existed must not stay cached as fake
+        transaction.on_commit(lambda: clear_missing_verify_code_cache(codes))
+        return verify_codes
 
-        link = f"{backend_url}/api/verifycodes/verify-qrcode?code={code}"
-        buffer = generate_qr_image(link=link)
+    @transaction.atomic
+    def create_verify_code_batch(self, user: User, uid: UUID, quantity: int):
+        """
+        Create the batch and its codes now, render the PDF in the background.
+        """
+        if quantity <= 0:
+            raise QuantityQRCodeInvalid
+
+        product = self.product_orm.get_product_by_uid(uid=uid)
+        if not product:
+            raise ProductDoesNotExists
+        self.get_backend_url()
 
-        attachment = self.attachment_service.upload_attachment(
-            file=buffer,
-            folder="qr_codes/",
-            public_id=f"verify_{code}",
-            type=AttachmentType.VERIFYCODE,
+        batch = self.orm.create_verify_code_batch(
+            product=product, created_by=user, quantity=quantity
         )
+        self.create_verify_codes(product=product, quantity=quantity, batch=batch)
+
+        transaction.on_commit(lambda: self.schedule_batch_render(batch.uid))
+        return batch
+
+    def get_verify_code_batch(self, uid: UUID):
+        batch = self.orm.get_verify_code_batch_by_uid(uid=uid)
+        if not batch:
+            raise VerifyCodeBatchDoesNotExists
+        return batch
 
-        return self.orm.create_verify_code(
-            product=product, code=code, attachment=attachment
+    def reprint_verify_code_batch(self, uid: UUID):
+        """
+        Re-render the PDF of an existing batch from its stored codes; no new code
+        is created. A batch stuck in RENDERING by a dead worker can be reprinted
+        once its lease has expired.
+        """
+        batch = self.get_verify_code_batch(uid=uid)
+        reset = self.orm.update_verify_code_batch(
+            uid=uid,
+            statuses=[VerifyCodeBatchStatus.DONE, VerifyCodeBatchStatus.FAILED],
+            reclaim_stale=True,
+            status=VerifyCodeBatchStatus.PENDING,
+            rendered_count=0,
+            error=None,
+            finished_at=None,
+            lease_expires_at=None,
         )
+        if not reset:
+            raise VerifyCodeBatchIsRendering
 
-    def generate_multiple_verify_qr_codes(self, uid: UUID, quantity: int):
-        if quantity <= 0:
-            raise QuantityQRCodeInvalid
-        verify_codes = []
+        self.schedule_batch_render(uid)
+        batch.refresh_from_db()
+        return batch
 
-        for _ in range(quantity):
-            verify_code = self.generate_verify_qr_code(uid=uid)
-            verify_codes.append(verify_code)
+    def open_verify_code_batch_file(self, uid: UUID):
+        batch = self.get_verify_code_batch(uid=uid)
+        if batch.status != VerifyCodeBatchStatus.DONE or not batch.file_path:
+            raise VerifyCodeBatchNotReady
+        return default_storage.open(batch.file_path, "rb")
 
-        return verify_codes
+    def schedule_batch_render(self, uid: UUID):
+        threading.Thread(target=self.run_batch_render, args=(uid,), daemon=True).start()
+
+    def run_batch_render(self, uid: UUID):
+        # Runs on its own thread, so it owns (and must release) its connection
+        close_old_connections()
+        try:
+            self.render_verify_code_batch(uid=uid)
+        except Exception:
+            logger.exception("Rendering verify code batch %s failed", uid)
+        finally:
+            close_old_connections()
+
+    def render_verify_code_batch(self, uid: UUID) -> bool:
+        """
+        Render the batch PDF page by page into a temporary file, report progress
+        after every page, then move the file to storage. Returns False when the
+        batch is held by another live worker, or was taken over while rendering.
+        Progress reports renew the lease, and every write after the claim only
+        applies while this worker still holds it.
+        """
+        lease_token = uuid4()
+        claimed = self.orm.update_verify_code_batch(
+            uid=uid,
+            statuses=[VerifyCodeBatchStatus.PENDING],
+            reclaim_stale=True,
+            status=VerifyCodeBatchStatus.RENDERING,
+            rendered_count=0,
+            error=None,
+            lease_expires_at=timezone.now() + VERIFY_CODE_BATCH_LEASE,
+            lease_token=lease_token,
+        )
+        if not claimed:
+            return False
+
+        def report_progress(count: int):
+            renewed = self.orm.update_verify_code_batch(
+                uid=uid,
+                lease_holder=lease_token,
+                rendered_count=count,
+                lease_expires_at=timezone.now() + VERIFY_CODE_BATCH_LEASE,
+            )
+            if not renewed:
+                raise VerifyCodeBatchLeaseLost
+
+        batch = self.orm.get_verify_code_batch_by_uid(uid=uid)
+        try:
+            backend_url = self.get_backend_url()
+            labels = (
+                (code, build_verify_link(backend_url, code))
+                for code in self.orm.get_batch_codes(batch_uid=uid).iterator(
+                    chunk_size=2000
+                )
+            )
+            with tempfile.TemporaryFile() as output:
+                render_qrcode_pdf(output, labels, on_page=report_progress)
+                output.seek(0)
+                file_path = default_storage.save(
+                    f"{VERIFY_CODE_BATCH_FOLDER}/{uid}.pdf", File(output)
+                )
+        except VerifyCodeBatchLeaseLost:
+            logger.warning("Verify code batch %s was taken over mid-render", uid)
+            return False
+        except Exception as exc:
+            self.orm.update_verify_code_batch(
+                uid=uid,
+                lease_holder=lease_token,
+                status=VerifyCodeBatchStatus.FAILED,
+                error=str(exc),
+                lease_expires_at=None,
+                lease_token=None,
+            )
+            raise
+
+        done = self.orm.update_verify_code_batch(
+            uid=uid,
+            lease_holder=lease_token,
+            status=VerifyCodeBatchStatus.DONE,
+            file_path=file_path,
+            finished_at=timezone.now(),
+            print_count=F("print_count") + 1,
+            lease_expires_at=None,
+            lease_token=None,
+        )
+        if not done:
+            # Taken over after the last page: the new owner's file wins
+            default_storage.delete(file_path)
+            return False
+        if batch.file_path and batch.file_path != file_path:
+            default_storage.delete(batch.file_path)
+        return True
+
+    def get_print_labels(self, verify_codes) -> list[tuple[str, str]]:
+        backend_url = self.get_backend_url()
+        return [
+            (verify_code.code, build_verify_link(backend_url, verify_code.code))
+            for verify_code in verify_codes
+        ]
+
+    def upload_pending_qr_images(self, batch_size: int = 100) -> int:
+        """
+        Upload a QR PNG for every code that has none yet, `batch_size` codes at a
+        time, each batch uploaded concurrently and saved with bulk queries.
+        """
+        backend_url = self.get_backend_url()
+        uploaded_count = 0
+
+        while True:
+            verify_codes = list(
+                self.orm.get_verify_codes_without_attachment(limit=batch_size)
+            )
+            if not verify_codes:
+                return uploaded_count
+
+            uploaded = self.attachment_service.upload_files(
+                [
+                    (
+                        generate_qr_image(build_verify_link(backend_url, vc.code)),
+                        f"verify_{vc.code}",
+                    )
+                    for vc in verify_codes
+                ],
+                folder="qr_codes/",
+            )
+            succeeded = [(vc, info) for vc, info in zip(verify_codes, uploaded) if info]
+            if not succeeded:
+                raise UploadAttachmentFail
+
+            attachments = self.attachment_service.save_attachments(
+                [info for _, info in succeeded], type=AttachmentType.VERIFYCODE
+            )
+            for (verify_code, _), attachment in zip(succeeded, attachments):
+                verify_code.attachment = attachment
+            self.orm.bulk_update_verify_codes(
+                [vc for vc, _ in succeeded], fields=["attachment"]
+            )
+            uploaded_count += len(succeeded)
 
     def create_verifier_location(self, payload: VerifierLocationRequestSchema):
         verifier_location_info = payload.dict()
@@ -73,38 +337,31 @@ class VerifyCodeService:
     def get_verifier_location_by_code(self, code: str):
         return self.orm.get_verifier_location_by_code(code=code)
 
-
     def verify_qrcode(self, code: str, client_ip: str):
-        verify_code = self.orm.get_verify_code_by_code(code=code)
-        if not verify_code:
-            return {
-                "status": "FAKE",
-                "message": "Mã QR không tồn tại. Có thể là hàng giả.",
-                "product": None,
-                "scan_count": 0,
-            }
+        if not self.is_code_format_valid(code):
+            return self.get_missing_code_result()
 
-        location_info = get_ip_location(client_ip) or {}
-
-        payload = VerifierLocationRequestSchema(
-            verify_code_uid=verify_code.uid,
-            ip_address=client_ip,
-            isp=location_info.get("isp"),
-            country=location_info.get("country"),
-            country_code=location_info.get("country_code"),
-            region=location_info.get("region"),
-            region_name=location_info.get("region_name"),
-            city=location_info.get("city"),
-            zip_code=location_info.get("zip_code"),
-            latitude=location_info.get("latitude"),
-            longitude=location_info.get("longitude"),
-            timezone=location_info.get("timezone"),
-        )
-        self.create_verifier_location(payload=payload)
+        # Unknown codes are remembered for a while, so a fake label scanned
+        # over and over never reaches the database
+        missing_key = build_missing_verify_code_cache_key(code)
+        if cache.get(missing_key):
+            return self.get_missing_code_result()
+
+        scanned = self.orm.increase_scan_count_by_code(code=code)
+        if scanned:
+            verify_code_uid, scan_count, product_uid = scanned
+        else:
+            verify_code = self.orm.get_verify_code_by_code(code=code)
+            if not verify_code:
+                cache.set(missing_key, True, MISSING_VERIFY_CODE_CACHE_TTL)
+                return self.get_missing_code_result()
+            verify_code_uid = verify_code.uid
 
-        product_info = self.orm.get_product_info(uid=verify_code.product.uid)
+        self.record_verifier_location(
+            verify_code_uid=verify_code_uid, client_ip=client_ip
+        )
 
-        if verify_code.scan_count >= verify_code.max_scan:
+        if not scanned:
             return {
                 "status": "FAKE",
                 "message": "Mã QR đã bị quét vượt số lần cho phép. Có dấu hiệu hàng giả.",
@@ -112,19 +369,75 @@ class VerifyCodeService:
                 "scan_count": verify_code.scan_count,
             }
 
-        verify_code = self.orm.increase_scan_count(verify_code=verify_code)
+        product_info = self.orm.get_product_info(uid=product_uid)
 
-        if verify_code.scan_count > 1:
+        if scan_count > 1:
             return {
                 "status": "SCANNED",
                 "message": "Mã QR đã được quét trước đó.",
                 "product": product_info,
-                "scan_count": verify_code.scan_count,
+                "scan_count": scan_count,
             }
 
         return {
             "status": "AUTHENTIC",
             "message": "Sản phẩm chính hãng.",
             "product": product_info,
-            "scan_count": verify_code.scan_count,
-        }
\ No newline at end of file
+            "scan_count": scan_count,
+        }
+
+    @staticmethod
+    def is_code_format_valid(code: str) -> bool:
+        """
+        Stateless pre-check: signed codes must carry a valid signature, unsigned
+        (legacy) codes are only accepted in compatibility mode.
+        """
+        if len(code) > VERIFY_CODE_MAX_LENGTH:
+            return False
+        signed = check_code_signature(code)
+        if signed is None:
+            return settings.VERIFY_CODE_ACCEPT_UNSIGNED
+        return signed
+
+    @staticmethod
+    def get_missing_code_result() -> dict:
+        return {
+            "status": "FAKE",
+            "message": "Mã QR không tồn tại. Có thể là hàng giả.",
+            "product": None,
+            "scan_count": 0,
+        }
+
+    def record_verifier_location(self, verify_code_uid: UUID, client_ip: str):
+        """
+        Save the scan with its IP right away; geolocation is looked up off the
+        request path and filled in later.
+        """
+        location = self.orm.create_verifier_location(
+            verify_code_id=verify_code_uid, ip_address=client_ip
+        )
+        if client_ip:
+            transaction.on_commit(
+                lambda: GEOLOCATION_EXECUTOR.submit(
+                    self.fill_verifier_location, location.uid, client_ip
+                )
+            )
+        return location
+
+    def fill_verifier_location(self, uid: UUID, client_ip: str):
+        close_old_connections()
+        try:
+            location_info = get_ip_location(client_ip)
+            if location_info:
+                location_info.pop("ip_address", None)
+                self.orm.update_verifier_location(
+                    uid=uid,
+                    **{
+                        field: location_info.get(field)
+                        for field in VERIFIER_LOCATION_FIELDS
+                    },
+                )
+        except Exception:
+            logger.exception("Geolocating verifier location %s failed", uid)
+        finally:
+            close_old_connections()
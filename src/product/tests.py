@@ -0,0 +1,126 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from product.models import Brand, Product
+from product.orm.product import ProductORM
+from product.orm.stock import ProductStockORM
+from product.schemas import SearchFilterSortSchema
+from product.services.product import ProductService
+from product.services.stock import ProductStockService
+from router.paginate import Pagination
+
+
+class ProductCursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="Brand")
+        # Ratings 5.0, 4.5, 4.0, ... with a tie on every pair of products
+        Product.objects.bulk_create(
+            [
+                Product(
+                    code=f"P{index}",
+                    name=f"Product {index}",
+                    brand=brand,
+                    origin_price=1000,
+                    sale_price=2000 + index,
+                    quantity_in_stock=10,
+                    review_count=2,
+                    rating_sum=10 - index // 2,
+                )
+                for index in range(9)
+            ]
+        )
+
+    def walk(self, payload: SearchFilterSortSchema, page_size=2) -> list[Product]:
+        pagination = Pagination()
+        products, cursor = [], None
+        while True:
+            page = pagination.get_page(
+                ProductORM.get_products(payload),
+                Pagination.Input(mode="cursor", cursor=cursor, page_size=page_size),
+            )
+            products += page["content"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                return products
+
+    def assert_walks_annotated_sort(self, payload: SearchFilterSortSchema):
+        queryset = ProductORM.get_products(payload)
+        field, _ = Pagination.get_keyset_field(queryset)
+        self.assertIn(field, queryset.query.annotations)
+
+        products = self.walk(payload)
+        self.assertEqual(len(products), 9)
+        self.assertEqual(len({product.uid for product in products}), 9)
+        keys = [Pagination.get_keyset_value(product, field) for product in products]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_rating_sort_pages_past_first_page(self):
+        self.assert_walks_annotated_sort(SearchFilterSortSchema(sort="rating"))
+
+    def test_relevance_sort_pages_past_first_page(self):
+        self.assert_walks_annotated_sort(
+            SearchFilterSortSchema(search="product", sort="relevance")
+        )
+
+    def test_blank_search_falls_back_to_price_order(self):
+        payload = SearchFilterSortSchema(search="   ", sort="relevance")
+        products = list(ProductORM.get_products(payload))
+        self.assertEqual(len(products), 9)
+        self.assertEqual(
+            [product.sale_price for product in products],
+            sorted(product.sale_price for product in products),
+        )
+
+
+class BucketedStockReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="Brand")
+        cls.plain, cls.bucketed = Product.objects.bulk_create(
+            [
+                Product(
+                    code=f"P{index}",
+                    name=f"Product {index}",
+                    brand=brand,
+                    origin_price=1000,
+                    sale_price=2000 + index,
+                    quantity_in_stock=100,
+                )
+                for index in range(2)
+            ]
+        )
+        ProductStockService().update_stock(
+            uid=cls.bucketed.uid, quantity_in_stock=100, stock_bucket_count=4
+        )
+        # Checkouts take from the buckets and leave the row total behind
+        ProductStockORM.decrement_bucket_stock(
+            product_uid=cls.bucketed.uid, bucket_count=4, quantity=7
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_listing_shows_bucket_sum(self):
+        page = ProductService().get_products(
+            payload=SearchFilterSortSchema(),
+            pagination=Pagination.Input(),
+        )
+        stock = {product.uid: product.quantity_in_stock for product in page["content"]}
+        self.assertEqual(stock, {self.plain.uid: 100, self.bucketed.uid: 93})
+
+    def test_total_stocks_are_summed_in_one_query(self):
+        service = ProductStockService()
+        products = list(Product.objects.all())
+        with self.assertNumQueries(1):
+            totals = service.get_total_stocks(products)
+        self.assertEqual(totals, {self.plain.uid: 100, self.bucketed.uid: 93})
+        with self.assertNumQueries(0):
+            service.get_total_stocks(products)
+
+    def test_export_shows_bucket_sum(self):
+        rows = ProductORM.get_product_export_rows()
+        self.assertEqual(
+            {row[1]: row[7] for row in rows},
+            {self.plain.code: 100, self.bucketed.code: 93},
+        )
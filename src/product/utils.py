@@ -1,17 +1,36 @@
+import csv
 import math
+import tempfile
+import zipfile
+from functools import lru_cache
 from io import BytesIO
-from typing import List
+from typing import Callable, Iterable, Iterator, Optional
 
 import secrets
 import openpyxl
 import qrcode
-import requests
 from cloudinary.uploader import upload
+from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpResponse
+from django.template import Context, Template
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.safestring import mark_safe
+from openpyxl.drawing.spreadsheet_drawing import SpreadsheetDrawing
+from openpyxl.packaging.relationship import (
+    RelationshipList,
+    get_dependents,
+    get_rels_path,
+)
 from openpyxl.utils import get_column_letter
+from openpyxl.xml.functions import fromstring
+from product.caching import (
+    VERIFY_PRODUCT_CARD_CACHE_TTL,
+    build_verify_product_card_cache_key,
+)
+from product.geolocation import lookup_ip_location
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
 
@@ -28,6 +47,9 @@ PRODUCT_HEADERS = [
 ]
 
 
+PRODUCT_EXPORT_CHUNK_SIZE = 2000
+
+
 def build_product_workbook() -> BytesIO:
     wb = openpyxl.Workbook()
     ws = wb.active
@@ -43,58 +65,181 @@ def build_product_workbook() -> BytesIO:
     return output
 
 
-def extract_images(sheet):
-    image_map = {}
-    for img in sheet._images:
-        anchor = img.anchor
-        if hasattr(anchor, "_from"):
-            row = anchor._from.row + 1
-        else:
-            row = anchor.from_.row + 1
-        image_map[row] = img
-    return image_map
-
-
-def load_product_information(product_file) -> List[dict]:
-    workbook = openpyxl.load_workbook(product_file)
-    sheet = workbook.active
-    image_map = extract_images(sheet)
-    products = []
-
-    for row_index, row in enumerate(
-        sheet.iter_rows(min_row=2, values_only=True),
-        start=2,
-    ):
-        (
-            name,
-            code,
-            origin_price,
-            sale_price,
-            brand_name,
-            type_,
-            description,
-            quantity_in_stock,
-            _,
-        ) = row
-
-        if not all([name, code, origin_price, sale_price, type_, quantity_in_stock]):
-            continue
-
-        product_data = {
-            "name": name,
-            "code": code,
-            "origin_price": origin_price,
-            "sale_price": sale_price,
-            "brand_name": brand_name,
-            "type": type_,
-            "description": description or "",
-            "quantity_in_stock": quantity_in_stock,
-            "image": image_map.get(row_index),
-        }
+def build_product_export_workbook(rows: Iterable[tuple]):
+    """
+    Write the catalog with openpyxl write-only mode: rows are flushed to disk as
+    they are appended, and the finished workbook is a temporary file that the
+    response streams back in chunks.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Danh sách sản phẩm")
+    for index in range(1, len(PRODUCT_HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(index)].width = 25
+
+    ws.append(PRODUCT_HEADERS)
+    for row in rows:
+        ws.append(row)
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+class EchoBuffer:
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_product_csv(rows: Iterable[tuple], chunk_rows: int = 500) -> Iterator[str]:
+    """
+    CSV text in chunks of `chunk_rows` lines, so a large export is not sent as
+    one tiny message per row.
+    """
+    writer = csv.writer(EchoBuffer())
+    # BOM so Excel opens Vietnamese text as UTF-8
+    lines = ["\ufeff" + writer.writerow(PRODUCT_HEADERS)]
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= chunk_rows:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+PRODUCT_IMPORT_REQUIRED_FIELDS = {
+    "name": "Tên sản phẩm",
+    "code": "Mã sản phẩm",
+    "origin_price": "Giá gốc",
+    "sale_price": "Giá bán",
+    "brand_name": "Thương hiệu",
+    "type": "Phân loại",
+    "quantity_in_stock": "Số lượng trong kho",
+}
+PRODUCT_IMPORT_INTEGER_FIELDS = ["origin_price", "sale_price", "quantity_in_stock"]
+
+
+class ProductImportRowError(ValueError):
+    pass
+
+
+def parse_product_row(row: tuple) -> dict:
+    row = tuple(row) + (None,) * (len(PRODUCT_HEADERS) - len(row))
+    (
+        name,
+        code,
+        origin_price,
+        sale_price,
+        brand_name,
+        type_,
+        description,
+        quantity_in_stock,
+        _,
+    ) = row[: len(PRODUCT_HEADERS)]
+
+    product_data = {
+        "name": str(name).strip() if name is not None else "",
+        "code": str(code).strip() if code is not None else "",
+        "origin_price": origin_price,
+        "sale_price": sale_price,
+        "brand_name": str(brand_name).strip() if brand_name is not None else "",
+        "type": str(type_).strip() if type_ is not None else "",
+        "description": description or "",
+        "quantity_in_stock": quantity_in_stock,
+    }
+
+    missing = [
+        label
+        for field, label in PRODUCT_IMPORT_REQUIRED_FIELDS.items()
+        if product_data[field] in (None, "")
+    ]
+    if missing:
+        raise ProductImportRowError(f"Thiếu thông tin: {', '.join(missing)}")
+
+    for field in PRODUCT_IMPORT_INTEGER_FIELDS:
+        value = product_data[field]
+        if isinstance(value, str):
+            value = value.strip()
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = -1.0
+        if number < 0 or not number.is_integer():
+            raise ProductImportRowError(
+                f"{PRODUCT_IMPORT_REQUIRED_FIELDS[field]} phải là số nguyên không âm"
+            )
+        product_data[field] = int(number)
+
+    return product_data
+
+
+class ProductWorkbookReader:
+    """
+    Stream an uploaded product sheet row by row.
+
+    The workbook is opened in read-only mode so rows are parsed lazily from the
+    zip archive. Embedded images are never decoded up front: only the row -> media
+    path mapping is read from the drawing XML, and the bytes of an image are read
+    on demand with `read_image`.
+    """
 
-        products.append(product_data)
+    def __init__(self, product_file):
+        self.archive = zipfile.ZipFile(product_file)
+        self.workbook = openpyxl.load_workbook(
+            product_file, read_only=True, data_only=True
+        )
+        self.sheet = self.workbook.active
+        self.image_paths = self.extract_image_paths()
+
+    def extract_image_paths(self) -> dict[int, str]:
+        image_paths = {}
+        sheet_path = self.sheet._worksheet_path
+        for drawing_rel in self.get_rels(sheet_path).find(SpreadsheetDrawing._rel_type):
+            drawing = SpreadsheetDrawing.from_tree(
+                fromstring(self.archive.read(drawing_rel.target))
+            )
+            media = {rel.Id: rel.target for rel in self.get_rels(drawing_rel.target)}
+            for anchor in drawing.oneCellAnchor + drawing.twoCellAnchor:
+                if not anchor.pic or not anchor.pic.blipFill.blip:
+                    continue
+                target = media.get(anchor.pic.blipFill.blip.embed)
+                if target:
+                    image_paths[anchor._from.row + 1] = target
+        return image_paths
+
+    def get_rels(self, path: str) -> RelationshipList:
+        rels_path = get_rels_path(path)
+        if rels_path not in self.archive.namelist():
+            return RelationshipList()
+        return get_dependents(self.archive, rels_path)
+
+    def iter_rows(self) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+        """
+        Yield `(row_index, product_data, error)` for every non-empty row.
+        """
+        for row_index, row in enumerate(
+            self.sheet.iter_rows(
+                min_row=2, max_col=len(PRODUCT_HEADERS), values_only=True
+            ),
+            start=2,
+        ):
+            if all(value in (None, "") for value in row):
+                continue
+            try:
+                product_data = parse_product_row(row)
+            except ProductImportRowError as error:
+                yield row_index, None, str(error)
+                continue
+            product_data["image_path"] = self.image_paths.get(row_index)
+            yield row_index, product_data, None
+
+    def read_image(self, path: str) -> BytesIO:
+        return BytesIO(self.archive.read(path))
 
-    return products
+    def close(self) -> None:
+        self.workbook.close()
+        self.archive.close()
 
 
 def upload_file(file, folder: str, public_id: str, overwrite: bool = True) -> dict:
@@ -110,6 +255,10 @@ def upload_file(file, folder: str, public_id: str, overwrite: bool = True) -> di
     )
 
 
+def build_verify_link(backend_url: str, code: str) -> str:
+    return f"{backend_url}/api/verifycodes/verify-qrcode?code={code}"
+
+
 def generate_qr_image(link: str):
     qr = qrcode.make(link)
     buffer = BytesIO()
@@ -119,16 +268,92 @@ def generate_qr_image(link: str):
 
 
 ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+VERIFY_CODE_BODY_LENGTH = 16
+VERIFY_CODE_SIGNATURE_LENGTH = 8
+VERIFY_CODE_SIGNING_SALT = "product.verify_code"
 
 
-def generate_random_code(length: int = 16) -> str:
-    return "".join(secrets.choice(ALPHABET) for _ in range(length))
+def sign_code(body: str) -> str:
+    """
+    Short HMAC of `body`: the first 40 bits of a SHA-256 HMAC keyed by
+    `VERIFY_CODE_SIGNING_KEY`, written in `ALPHABET` (5 bits per character).
+    """
+    digest = salted_hmac(
+        VERIFY_CODE_SIGNING_SALT,
+        body,
+        secret=settings.VERIFY_CODE_SIGNING_KEY,
+        algorithm="sha256",
+    ).digest()
+    number = int.from_bytes(digest[:5], "big")
+    return "".join(
+        ALPHABET[(number >> shift) & 31]
+        for shift in range(5 * (VERIFY_CODE_SIGNATURE_LENGTH - 1), -1, -5)
+    )
 
 
-def generate_qrcode_pdf(verify_codes):
-    buffer = BytesIO()
+def generate_random_code(
+    length: int = VERIFY_CODE_BODY_LENGTH, signed: bool = True
+) -> str:
+    body = "".join(secrets.choice(ALPHABET) for _ in range(length))
+    return body + sign_code(body) if signed else body
 
-    c = canvas.Canvas(buffer, pagesize=A4)
+
+def check_code_signature(code: str) -> Optional[bool]:
+    """
+    Whether a signed code carries a valid signature, compared in constant
+    time. None for codes that are not in the signed format (legacy codes).
+    """
+    if len(code) != VERIFY_CODE_BODY_LENGTH + VERIFY_CODE_SIGNATURE_LENGTH:
+        return None
+    body = code[:VERIFY_CODE_BODY_LENGTH]
+    signature = code[VERIFY_CODE_BODY_LENGTH:]
+    return constant_time_compare(signature, sign_code(body))
+
+
+def draw_qrcode(c: canvas.Canvas, data: str, x: float, y: float, size: float):
+    """
+    Draw `data` as a vector QR code with its bottom-left corner at (x, y).
+
+    Coordinates are switched to module units so every dark run of a row becomes
+    one integer `re` operator; formatting floats through reportlab's path API was
+    the bulk of the cost for large print runs.
+    """
+    # A fixed mask skips qrcode's eight-pass mask scoring
+    qr = qrcode.QRCode(mask_pattern=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+
+    operators = []
+    for row_index, row in enumerate(matrix):
+        start = None
+        for col_index, dark in enumerate(row + [False]):
+            if dark and start is None:
+                start = col_index
+            elif not dark and start is not None:
+                operators.append(f"{start} {row_index} {col_index - start} 1 re")
+                start = None
+    operators.append("f")
+
+    module = size / len(matrix)
+    c.saveState()
+    c.translate(x, y + size)
+    c.scale(module, -module)
+    c.addLiteral("\n".join(operators))
+    c.restoreState()
+
+
+def render_qrcode_pdf(
+    output,
+    labels: Iterable[tuple[str, str]],
+    on_page: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Render `(code, link)` labels into a PDF written to `output`, 4 per row.
+    `on_page` is called with the number of labels drawn so far each time a page
+    is finished. Returns the number of labels drawn.
+    """
+    c = canvas.Canvas(output, pagesize=A4, pageCompression=1)
 
     width, height = A4
 
@@ -162,70 +387,43 @@ def generate_qrcode_pdf(verify_codes):
 
     c.setFont("Helvetica-Bold", font_size)
 
-    for vc in verify_codes:
-        if not vc.attachment.url:
-            continue
-
-        try:
-            r = requests.get(vc.attachment.url, timeout=10)
-
-            if r.status_code != 200:
-                continue
-
-            if not r.headers.get(
-                "Content-Type", ""
-            ).startswith("image/"):
-                continue
-
-            image = ImageReader(BytesIO(r.content))
-
-            # Draw QR
-            c.drawImage(
-                image,
-                x,
-                y,
-                qr_size,
-                qr_size,
-                preserveAspectRatio=True,
-                mask="auto",
-            )
-
-            # Draw code below QR
-            code = getattr(vc, "code", "")
-
-            text_y = y - 4 * mm
-
-            c.drawCentredString(
-                x + (qr_size / 2),
-                text_y,
-                code,
-            )
+    for code, link in labels:
+        # New page
+        if count and count % (cols * rows) == 0:
+            c.showPage()
+            if on_page:
+                on_page(count)
 
-            count += 1
+            c.setFont("Helvetica-Bold", font_size)
 
-            # Next column
-            if count % cols != 0:
-                x += qr_size + gap_x
+            x = x_start
+            y = y_start
 
-            else:
-                # Next row
-                x = x_start
-                y -= block_height
+        # Draw QR
+        draw_qrcode(c, link, x, y, qr_size)
 
-            # New page
-            if count % (cols * rows) == 0:
-                c.showPage()
+        # Draw code below QR
+        c.drawCentredString(x + (qr_size / 2), y - 4 * mm, code)
 
-                c.setFont("Helvetica-Bold", font_size)
+        count += 1
 
-                x = x_start
-                y = y_start
-
-        except Exception:
-            continue
+        # Next column
+        if count % cols != 0:
+            x += qr_size + gap_x
+        else:
+            # Next row
+            x = x_start
+            y -= block_height
 
     c.save()
+    if on_page:
+        on_page(count)
+    return count
 
+
+def generate_qrcode_pdf(labels: Iterable[tuple[str, str]]) -> HttpResponse:
+    buffer = BytesIO()
+    render_qrcode_pdf(buffer, labels)
     buffer.seek(0)
 
     response = HttpResponse(
@@ -233,9 +431,7 @@ def generate_qrcode_pdf(verify_codes):
         content_type="application/pdf",
     )
 
-    response[
-        "Content-Disposition"
-    ] = 'attachment; filename="qr_codes.pdf"'
+    response["Content-Disposition"] = 'attachment; filename="qr_codes.pdf"'
 
     return response
 
@@ -396,19 +592,7 @@ VERIFY_QR_TEMPLATE = """
         <div class="divider"></div>
 
         <div class="product">
-            {% if product.image %}
-                <img src="{{ product.image }}" alt="Ảnh sản phẩm">
-            {% endif %}
-
-            <h3>{{ product.name }}</h3>
-
-            {% if product.brand %}
-                <div class="meta">Thương hiệu: {{ product.brand }}</div>
-            {% endif %}
-
-            {% if product.description %}
-                <div class="meta">Mô tả: {{ product.description }}</div>
-            {% endif %}
+            {{ product_card }}
 
             <div class="badge
                 {% if status == 'AUTHENTIC' %}green
@@ -430,33 +614,58 @@ VERIFY_QR_TEMPLATE = """
 """
 
 
-def get_ip_location(ip: str):
-    try:
-        res = requests.get(
-            f"http://ip-api.com/json/{ip}",
-            timeout=2,
+VERIFY_PRODUCT_CARD_TEMPLATE = """
+            {% if product.image %}
+                <img src="{{ product.image }}" alt="Ảnh sản phẩm">
+            {% endif %}
+
+            <h3>{{ product.name }}</h3>
+
+            {% if product.brand %}
+                <div class="meta">Thương hiệu: {{ product.brand }}</div>
+            {% endif %}
+
+            {% if product.description %}
+                <div class="meta">Mô tả: {{ product.description }}</div>
+            {% endif %}
+"""
+
+
+@lru_cache(maxsize=None)
+def get_compiled_template(source: str) -> Template:
+    """
+    Parse a template source once per process; rendering a compiled `Template`
+    skips lexing and parsing the (large) inline HTML on every request.
+    """
+    return Template(source)
+
+
+def render_verify_product_card(product) -> str:
+    """
+    The product card only depends on the product, its main image and its brand,
+    so it is rendered once per version of those and then read from cache.
+    """
+    cache_key = build_verify_product_card_cache_key(product)
+    html = cache.get(cache_key)
+    if html is None:
+        html = get_compiled_template(VERIFY_PRODUCT_CARD_TEMPLATE).render(
+            Context({"product": product})
         )
-        res.raise_for_status()
-        data = res.json()
-
-        if data.get("status") == "success":
-            return {
-                "ip_address": ip,
-                "isp": data.get("isp"),
-                "organization": data.get("org"),
-                "asn": data.get("as"),
-                "country": data.get("country"),
-                "country_code": data.get("countryCode"),
-                "region": data.get("region"),
-                "region_name": data.get("regionName"),
-                "city": data.get("city"),
-                "zip_code": data.get("zip"),
-                "latitude": data.get("lat"),
-                "longitude": data.get("lon"),
-                "timezone": data.get("timezone"),
-            }
-
-    except Exception:
-        pass
-
-    return None
+        cache.set(cache_key, html, VERIFY_PRODUCT_CARD_CACHE_TTL)
+    return mark_safe(html)
+
+
+def render_verify_page(result: dict) -> str:
+    context = dict(result)
+    product = context.get("product")
+    context["product_card"] = render_verify_product_card(product) if product else ""
+    return get_compiled_template(VERIFY_QR_TEMPLATE).render(Context(context))
+
+
+def get_ip_location(ip: str):
+    """
+    Geolocate `ip` through the configured providers (see `product.geolocation`).
+    Results are LRU cached, so a copy is returned.
+    """
+    location = lookup_ip_location(ip)
+    return dict(location) if location else None
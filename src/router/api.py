@@ -12,6 +12,16 @@ from router.exception import get_handlers
 logger = logging.getLogger("django")
 
 
+def build_success_envelope(data, status=None) -> dict:
+    return {  # Custom response always has status 200
+        "data": data,
+        "message_code": "SUCCESS",
+        "message": "Success",
+        "error_code": status if (status != 200) else 0,
+        "current_time": datetime.now(),
+    }
+
+
 class BaseAPI(NinjaExtraAPI):
     def __init__(self, *args, **kwargs) -> None:
         kwargs.setdefault("title", os.getenv("PRODUCT_NAME", ""))
@@ -26,13 +36,7 @@ class BaseAPI(NinjaExtraAPI):
     def create_response(self, request, data, *, status=None, temporal_response=None):
         return super().create_response(
             request,
-            {  # Custom response always has status 200
-                "data": data,
-                "message_code": "SUCCESS",
-                "message": "Success",
-                "error_code": status if (status != 200) else 0,
-                "current_time": datetime.now(),
-            },
+            build_success_envelope(data, status=status),
             status=200,
             temporal_response=temporal_response,
         )
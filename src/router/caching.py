@@ -0,0 +1,76 @@
+import json
+import zlib
+from functools import lru_cache
+from typing import Any, Callable
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from ninja.responses import NinjaJSONEncoder
+from pydantic import TypeAdapter
+
+from router.api import build_success_envelope
+
+
+# Payloads above this size are zlib-compressed before going to Redis
+RESPONSE_CACHE_COMPRESS_MIN_BYTES = 2048
+
+_RAW = b"r"
+_COMPRESSED = b"z"
+
+
+@lru_cache(maxsize=None)
+def get_type_adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def render_data(schema: Any, data: Any) -> bytes:
+    """
+    Validate `data` against the response schema and render it to JSON, the same
+    way Ninja renders the `data` field of a normal response.
+    """
+    adapter = get_type_adapter(schema)
+    validated = adapter.validate_python(data, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated), cls=NinjaJSONEncoder).encode()
+
+
+def pack(body: bytes) -> bytes:
+    if len(body) >= RESPONSE_CACHE_COMPRESS_MIN_BYTES:
+        return _COMPRESSED + zlib.compress(body)
+    return _RAW + body
+
+
+def unpack(blob: bytes) -> bytes:
+    if blob[:1] == _COMPRESSED:
+        return zlib.decompress(blob[1:])
+    return blob[1:]
+
+
+def build_json_response(body: bytes) -> HttpResponse:
+    """Splice a pre-rendered `data` payload into the standard success envelope."""
+    envelope = build_success_envelope(None, status=200)
+    envelope.pop("data")
+    rest = json.dumps(envelope, cls=NinjaJSONEncoder).encode()
+    return HttpResponse(
+        b'{"data":' + body + b"," + rest[1:],
+        content_type="application/json; charset=utf-8",
+    )
+
+
+def cached_json_response(
+    cache_key: str,
+    schema: Any,
+    get_data: Callable[[], Any],
+    timeout: int,
+) -> HttpResponse:
+    """
+    Serve a GET endpoint from pre-rendered JSON bytes in the cache. A hit costs
+    one cache GET and a byte copy, no ORM or schema work; a miss renders
+    `get_data()` with `schema` and stores the bytes.
+    """
+    blob = cache.get(cache_key)
+    if blob is not None:
+        return build_json_response(unpack(blob))
+
+    body = render_data(schema, get_data())
+    cache.set(cache_key, pack(body), timeout=timeout)
+    return build_json_response(body)
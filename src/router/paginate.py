@@ -1,24 +1,79 @@
+import base64
+import binascii
+import json
 from collections import OrderedDict
-from typing import Any, Generic, List, Type, TypeVar
+from datetime import datetime
+from functools import reduce
+from http import HTTPStatus
+from typing import Any, Generic, List, Literal, Optional, Type, TypeVar
 
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.core.paginator import Paginator
-from django.db.models import QuerySet
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from django.db.models.constants import LOOKUP_SEP
 from django.http import HttpRequest
+from django.utils import timezone
 from ninja import Schema
 from ninja.pagination import PaginationBase
 from ninja_extra.pagination import paginate
 from pydantic import BaseModel
 
+from router.exception import APIException
+
 
 T = TypeVar("T")
 
 
+class InvalidCursor(APIException):
+    error_code = HTTPStatus.BAD_REQUEST
+    message_code = "INVALID_CURSOR"
+    message = "Cursor không hợp lệ"
+
+
 class PaginatedResponseSchema(BaseModel, Generic[T]):
     content: List[T]
-    current_page: int
+    current_page: Optional[int] = None
     page_size: int
-    total_rows: int
-    total_pages: int
+    total_rows: Optional[int] = None
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """
+    Keep datetimes to the microsecond: `DjangoJSONEncoder` cuts them to
+    milliseconds, and a rounded key would repeat or skip rows on the next page.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(field: str, value: Any, uid: Any, direction: str) -> str:
+    raw = json.dumps(
+        {"f": field, "k": value, "u": uid, "d": direction},
+        cls=CursorJSONEncoder,
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor
+
+    if not isinstance(data, dict) or not {"f", "k", "u", "d"} <= data.keys():
+        raise InvalidCursor
+    if data["d"] not in ("next", "prev"):
+        raise InvalidCursor
+    return data
 
 
 class Pagination(PaginationBase):
@@ -29,6 +84,12 @@ class Pagination(PaginationBase):
     class Input(Schema):
         page_size: int = 50
         page: int = 1
+        mode: Literal["page", "cursor"] = "page"
+        cursor: Optional[str] = None
+
+        @property
+        def is_cursor_mode(self) -> bool:
+            return self.mode == "cursor" or bool(self.cursor)
 
     def paginate_queryset(
         self,
@@ -37,6 +98,16 @@ class Pagination(PaginationBase):
         request: HttpRequest,
         **params: Any,
     ):
+        return self.get_page(queryset, pagination)
+
+    def get_page(self, queryset: QuerySet[Any, Any], pagination: Input):
+        """
+        Build the page payload. Services that cache whole pages call this directly
+        instead of going through `@paginate`.
+        """
+        if pagination.is_cursor_mode and isinstance(queryset, QuerySet):
+            return self.paginate_by_cursor(queryset, pagination)
+
         paginator = Paginator(queryset, pagination.page_size)
 
         total_pages = paginator.num_pages
@@ -61,6 +132,103 @@ class Pagination(PaginationBase):
             ]
         )
 
+    @staticmethod
+    def get_keyset_field(queryset: QuerySet) -> tuple[str, bool]:
+        """
+        Return the leading sort field of `queryset` and whether it is descending.
+        The primary key is always appended as tie-breaker, so only the first
+        ordering term is used as the keyset.
+        """
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        field = ordering[0] if ordering else "pk"
+        if not isinstance(field, str) or field == "?":
+            raise InvalidCursor
+        return field.lstrip("-"), field.startswith("-")
+
+    @staticmethod
+    def get_keyset_value(item: Any, field: str) -> Any:
+        return reduce(getattr, field.split("__"), item)
+
+    @staticmethod
+    def to_keyset_value(queryset: QuerySet, field: str, value: Any) -> Any:
+        """
+        Turn a decoded cursor key back into a value of `field`, e.g. an aware
+        datetime for `created_at`. Annotations (`rank`, `rating_average`) are
+        coerced through their `output_field`.
+        """
+        model, model_field = queryset.model, None
+        try:
+            if field in queryset.query.annotations:
+                model_field = queryset.query.annotations[field].output_field
+            else:
+                for name in field.split(LOOKUP_SEP):
+                    model_field = model._meta.get_field(name)
+                    model = model_field.related_model
+            value = model_field.to_python(value)
+        except (FieldDoesNotExist, ValidationError, AttributeError):
+            raise InvalidCursor
+        if isinstance(value, datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value, timezone.get_current_timezone())
+        return value
+
+    def paginate_by_cursor(self, queryset: QuerySet, pagination: Input):
+        """
+        Keyset pagination: seek with `(field, pk) > (value, uid)` on an index
+        instead of `COUNT(*)` + `OFFSET`.
+        """
+        field, descending = self.get_keyset_field(queryset)
+
+        cursor = decode_cursor(pagination.cursor) if pagination.cursor else None
+        if cursor and cursor["f"] != field:
+            raise InvalidCursor
+        backwards = bool(cursor) and cursor["d"] == "prev"
+
+        sign = "-" if descending != backwards else ""
+        if field == "pk":
+            queryset = queryset.order_by(f"{sign}pk")
+        else:
+            queryset = queryset.order_by(f"{sign}{field}", f"{sign}pk")
+
+        if cursor:
+            lookup = "lt" if sign else "gt"
+            seek = Q(**{f"pk__{lookup}": cursor["u"]})
+            if field != "pk":
+                key = self.to_keyset_value(queryset, field, cursor["k"])
+                # `(field, pk) < (key, uid)` spelled with an OR, which PostgreSQL
+                # cannot use as an index range; the redundant inclusive bound on
+                # `field` gives the `(field, uid)` index one to scan.
+                seek = Q(**{f"{field}__{lookup}e": key}) & (
+                    Q(**{f"{field}__{lookup}": key}) | (Q(**{field: key}) & seek)
+                )
+            queryset = queryset.filter(seek)
+
+        content = list(queryset[: pagination.page_size + 1])
+        has_more = len(content) > pagination.page_size
+        content = content[: pagination.page_size]
+        if backwards:
+            content.reverse()
+
+        def to_cursor(item: Any, direction: str) -> str:
+            return encode_cursor(
+                field, self.get_keyset_value(item, field), item.pk, direction
+            )
+
+        next_cursor = prev_cursor = None
+        if content:
+            if has_more or backwards:
+                next_cursor = to_cursor(content[-1], "next")
+            if cursor and (has_more or not backwards):
+                prev_cursor = to_cursor(content[0], "prev")
+
+        return OrderedDict(
+            [
+                ("content", content),
+                ("page_size", pagination.page_size),
+                ("next_cursor", next_cursor),
+                ("prev_cursor", prev_cursor),
+            ]
+        )
+
     @classmethod
     def get_response_schema(cls, response_schema: Type[Schema]):
         return PaginatedResponseSchema[response_schema]  # type: ignore
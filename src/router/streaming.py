@@ -0,0 +1,71 @@
+import os
+from typing import IO, AsyncIterator, Callable, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+END = object()
+
+
+async def iter_async(chunks: Iterable):
+    """
+    Yield from a blocking iterator (e.g. built from a database cursor), pulling
+    each chunk on the request's sync thread. Under ASGI, Django buffers a sync
+    `StreamingHttpResponse` iterator in full before sending it; an async one is
+    sent as it is produced.
+    """
+    iterator = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(iterator, END)) is not END:
+        yield chunk
+
+
+async def iter_file(
+    file: IO[bytes],
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    on_finish: Optional[Callable[[], object]] = None,
+):
+    """
+    Read `file` in chunks off the event loop, then close it. `on_finish` runs
+    on the request's sync thread once the last chunk has been handed to the
+    server; it does not run when the client disconnects before that.
+    """
+    try:
+        while chunk := await sync_to_async(file.read)(chunk_size):
+            yield chunk
+        if on_finish:
+            await sync_to_async(on_finish)()
+    finally:
+        await sync_to_async(file.close)()
+
+
+def stream_attachment(
+    content: AsyncIterator, filename: str, content_type: str
+) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment=True, filename=filename
+    )
+    return response
+
+
+def stream_file(
+    file: IO[bytes],
+    filename: str,
+    content_type: str,
+    on_finish: Optional[Callable[[], object]] = None,
+):
+    """
+    Download response for a (temporary) file, streamed chunk by chunk.
+    """
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    response = stream_attachment(
+        iter_file(file, on_finish=on_finish), filename, content_type
+    )
+    response["Content-Length"] = str(size)
+    return response